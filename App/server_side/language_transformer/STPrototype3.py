@@ -2,17 +2,30 @@
 
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from typing import List, Dict, Tuple, Optional, Union
 import json
+import copy
 import sys
 import os
 import re
 import psycopg2
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
 from loguru import logger
+
+# File locks coordinate catalog snapshots between worker processes; without
+# fcntl (Windows) every process simply builds its own snapshot
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 import random  # Import random module for random selection
 import time 
+import threading
+import hashlib
+import queue
+import shutil
+from contextlib import contextmanager
+from concurrent.futures import Future
 
 # Setup logger
 logger.remove()
@@ -151,572 +164,2427 @@ def find_and_load_laptops_json():
     logger.error("No valid JSON file with laptop data found")
     return []
 
-class LaptopRecommendationBot:
-    def __init__(self, laptop_data: List[Dict] = None):
+def format_laptop_description(laptop: Dict) -> str:
+    """
+    Create a detailed description string from laptop specifications
+    """
+    tables = laptop.get('tables', [])
+    details = {}
+
+    # Extract relevant information from nested structure
+    for table in tables:
+        title = table.get('title', '')
+        data = table.get('data', {})
+
+        if isinstance(data, dict):
+            if title == 'Product Details':
+                details.update(data)
+            elif title == 'Specs':
+                details.update(data)
+            elif title == 'Screen':
+                for key, value in data.items():
+                    details[f"Screen {key}"] = value
+            elif title == 'Features':
+                for key, value in data.items():
+                    details[f"Feature {key}"] = value
+            elif title == 'Ports':
+                for key, value in data.items():
+                    if value:  # Only include ports that are present
+                        details[f"Has {key}"] = value
+            elif title == 'Misc':
+                details.update(data)
+
+    # Build the description with available information
+    brand = details.get('Brand', '')
+    name = details.get('Name', '')
+    description = f"{brand} {name}"
+
+    # Add processor info
+    processor_brand = details.get('Processor Brand', '')
+    processor_name = details.get('Processor Name', '')
+    if processor_brand and processor_name:
+        description += f" with {processor_brand} {processor_name} processor"
+
+    # Add memory
+    memory = details.get('Memory Installed', '')
+    if memory:
+        description += f", {memory} RAM"
+
+    # Add storage
+    storage = details.get('Storage', '')
+    if storage:
+        description += f", {storage} storage"
+
+    # Add screen info
+    screen_size = details.get('Screen Size', '')
+    screen_resolution = details.get('Screen Resolution', '')
+    if screen_size or screen_resolution:
+        screen_info = ""
+        if screen_size:
+            screen_info += f"{screen_size}"
+        if screen_resolution:
+            if screen_info:
+                screen_info += f" {screen_resolution}"
+            else:
+                screen_info = screen_resolution
+        description += f", {screen_info} display"
+
+    # Add screen refresh rate if available
+    refresh_rate = details.get('Screen Refresh Rate', '')
+    if refresh_rate:
+        description += f" with {refresh_rate} refresh rate"
+
+    # Add graphics card
+    graphics = details.get('Graphics Card', '')
+    if graphics:
+        description += f", {graphics} graphics"
+
+    # Add operating system
+    os = details.get('Operating System', '')
+    if os:
+        description += f", {os}"
+
+    # Add battery life
+    battery_life = details.get('Battery Life', '')
+    if battery_life:
+        description += f", {battery_life} battery life"
+
+    # Add weight information
+    weight = details.get('Weight', '')
+    if weight:
+        description += f", weighing {weight}"
+
+    # Add key features
+    features = []
+    for key, value in details.items():
+        if key.startswith('Feature ') and value is True:
+            feature_name = key.replace('Feature ', '')
+            features.append(feature_name)
+
+    if features:
+        description += f". Features include: {', '.join(features)}"
+
+    # Add ports information
+    ports = []
+    for key, value in details.items():
+        if key.startswith('Has ') and value is True:
+            port_name = key.replace('Has ', '')
+            ports.append(port_name)
+
+    if ports:
+        description += f". Ports include: {', '.join(ports)}"
+
+    return description
+
+def extract_price_range(laptop: Dict) -> Tuple[Optional[float], Optional[str]]:
+    """
+    Extract the lowest price from a laptop's price table with improved robustness
+    Returns: (price_value, price_string)
+    """
+    price_value = None
+    price_string = None
+
+    # First look in Prices table
+    for table in laptop.get('tables', []):
+        if table.get('title') == 'Prices' and 'data' in table:
+            prices_data = table['data']
+            if isinstance(prices_data, list) and prices_data:
+                # Find the lowest price
+                lowest_price = None
+                lowest_price_str = None
+
+                for price_entry in prices_data:
+                    price_str = price_entry.get('price', '')
+                    if price_str and price_str != 'N/A':
+                        # Clean and convert price string to float
+                        clean_price = re.sub(r'[^0-9.]', '', price_str.replace(',', ''))
+                        try:
+                            price_val = float(clean_price)
+                            if lowest_price is None or price_val < lowest_price:
+                                lowest_price = price_val
+                                lowest_price_str = price_str
+                        except ValueError:
+                            continue
+
+                price_value = lowest_price
+                price_string = lowest_price_str
+
+    # If no price found in Prices table look for price in Product Details or other tables
+    if price_value is None:
+        for table in laptop.get('tables', []):
+            data = table.get('data', {})
+            if isinstance(data, dict):
+                # Check for common price field names
+                for field in ['Price', 'price', 'Cost', 'cost', 'MSRP', 'msrp', 'RRP', 'rrp']:
+                    if field in data and data[field]:
+                        price_str = str(data[field])
+                        if price_str and price_str != 'N/A':
+                            # Clean and convert price string to float
+                            clean_price = re.sub(r'[^0-9.]', '', price_str.replace(',', ''))
+                            try:
+                                price_value = float(clean_price)
+                                price_string = price_str
+                                break
+                            except ValueError:
+                                continue
+
+    return (price_value, price_string)
+
+# Boolean catalog columns and the table/field they are read from
+FEATURE_COLUMNS = {
+    'touchscreen': ('Screen', 'Touchscreen'),
+    'backlit_keyboard': ('Features', 'Backlit Keyboard'),
+    'numeric_keyboard': ('Features', 'Numeric Keyboard'),
+    'bluetooth': ('Features', 'Bluetooth'),
+}
+PORT_COLUMNS = {
+    'usb_c': ('Ports', 'USB Type-C'),
+    'hdmi': ('Ports', 'HDMI'),
+    'ethernet': ('Ports', 'Ethernet (RJ45)'),
+    'thunderbolt': ('Ports', 'Thunderbolt'),
+    'display_port': ('Ports', 'Display Port'),
+}
+
+def _parse_number(text) -> Optional[float]:
+    """Return the first number in a spec string, or None"""
+    match = re.search(r'(\d+(\.\d+)?)', str(text)) if text is not None else None
+    return float(match.group(1)) if match else None
+
+def _parse_capacity_gb(text) -> Optional[float]:
+    """Parse a memory or storage string such as '16 GB' or '512GB SSD, 1 TB HDD' into GB"""
+    if not text:
+        return None
+    total = None
+    for amount, unit in re.findall(r'(\d+(?:\.\d+)?)\s*(TB|GB|MB)', str(text), re.IGNORECASE):
+        value = float(amount) * {'TB': 1024.0, 'GB': 1.0, 'MB': 1 / 1024.0}[unit.upper()]
+        total = value if total is None else total + value
+    return total if total is not None else _parse_number(text)
+
+def _parse_weight_kg(text) -> Optional[float]:
+    """Parse a weight string such as '1.32 kg', '1320 g' or '3.5 lbs' into kilograms"""
+    value = _parse_number(text)
+    if value is None:
+        return None
+    unit = str(text).lower()
+    if re.search(r'\d\s*(lb|lbs|pounds)\b', unit):
+        return value * 0.4536
+    if re.search(r'\d\s*g\b', unit):
+        return value / 1000.0
+    return value
+
+# Performance tiers stored per laptop in the catalog (0 means no spec information)
+PERFORMANCE_TIERS = {'basic': 1, 'medium': 2, 'high': 3}
+PERFORMANCE_LEVEL_NAMES = {tier: level for level, tier in PERFORMANCE_TIERS.items()}
+
+# Processor and graphics card patterns per tier, checked from the highest tier down
+CPU_TIER_PATTERNS = [
+    (PERFORMANCE_TIERS['high'], re.compile(r'(?<![a-z])i[79](?!\d)|core (?:ultra )?[79]\b|ryzen (?:ai )?(?:hx )?[79]\b|'
+                                           r'\bm\d+ (?:pro|max|ultra)\b|snapdragon x elite|xeon', re.IGNORECASE)),
+    (PERFORMANCE_TIERS['medium'], re.compile(r'(?<![a-z])i5(?!\d)|core (?:ultra )?5\b|ryzen (?:ai )?5\b|'
+                                             r'apple m\d+\b|snapdragon x plus', re.IGNORECASE)),
+]
+GPU_TIER_PATTERNS = [
+    (PERFORMANCE_TIERS['high'], re.compile(r'rtx|radeon rx|quadro', re.IGNORECASE)),
+    (PERFORMANCE_TIERS['medium'], re.compile(r'gtx', re.IGNORECASE)),
+]
+
+# Installed memory (GB) needed to reach a tier on its own
+RAM_TIER_THRESHOLDS = [
+    (PERFORMANCE_TIERS['high'], 32),
+    (PERFORMANCE_TIERS['medium'], 16),
+]
+
+def classify_performance_tier(cpu: str, gpu: str, ram_gb: Optional[float]) -> int:
+    """
+    Classify a laptop into a performance tier from its processor, graphics card and memory
+    The strongest component decides; laptops with specs that match no tier are basic.
+    Returns 0 if there is no spec information at all.
+    """
+    if not cpu and not gpu and ram_gb is None:
+        return 0
+    
+    tier = PERFORMANCE_TIERS['basic']
+    for text, patterns in ((cpu, CPU_TIER_PATTERNS), (gpu, GPU_TIER_PATTERNS)):
+        if text:
+            for pattern_tier, pattern in patterns:
+                if pattern.search(text):
+                    tier = max(tier, pattern_tier)
+                    break
+    
+    if ram_gb is not None:
+        for threshold_tier, threshold in RAM_TIER_THRESHOLDS:
+            if ram_gb >= threshold:
+                tier = max(tier, threshold_tier)
+                break
+    
+    return tier
+
+# Number of set bits in every possible byte, for counting packed bitmaps
+_BYTE_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+class BitmapIndex:
+    """
+    Packed bitmaps over catalog rows, one per boolean feature or port attribute
+
+    Any combination of attributes resolves with a few byte-wise ANDs, and the
+    same bitmaps give facet counts by popcount.
+    """
+    def __init__(self, flags: Dict[str, np.ndarray], count: int):
+        self.count = count
+        self.bitmaps = {name: np.packbits(column) for name, column in flags.items()}
+        self._all = np.packbits(np.ones(count, dtype=bool))
+
+    @classmethod
+    def from_bitmaps(cls, bitmaps: Dict[str, np.ndarray], count: int) -> 'BitmapIndex':
+        """Wrap already packed bitmaps, such as arrays attached from a catalog snapshot"""
+        index = cls({}, count)
+        index.bitmaps = dict(bitmaps)
+        return index
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.bitmaps
+
+    def intersect(self, names) -> np.ndarray:
+        """Packed bitmap of the rows that have every one of the named attributes"""
+        result = self._all.copy()
+        for name in names:
+            np.bitwise_and(result, self.bitmaps[name], out=result)
+        return result
+
+    def to_mask(self, bitmap: np.ndarray) -> np.ndarray:
+        """Unpack a bitmap into a boolean row mask"""
+        return np.unpackbits(bitmap, count=self.count).astype(bool)
+
+    def from_mask(self, mask: np.ndarray) -> np.ndarray:
+        """Pack a boolean row mask into a bitmap"""
+        return np.packbits(mask)
+
+    @staticmethod
+    def cardinality(bitmap: np.ndarray) -> int:
+        """Number of rows set in a bitmap"""
+        return int(_BYTE_POPCOUNT[bitmap].sum())
+
+    def facet_counts(self, within: np.ndarray = None) -> Dict[str, int]:
         """
-        Initialize the chatbot with laptop data and load the sentence transformer model
-        
-        Args:
-            laptop_data: List of dictionaries containing laptop information (optional)
+        Count the rows having each attribute, optionally restricted to a bitmap of candidate rows
         """
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Try to load laptops either from provided data, database, or JSON file
-        if laptop_data:
-            self.laptops = laptop_data
-            logger.info(f"Using provided laptop data with {len(self.laptops)} records")
-        else:
-            # First try database connection
-            self.laptops = self.load_from_database()
-            
-            # If database loading failed, try loading from JSON
-            if not self.laptops:
-                logger.warning("Database loading failed. Attempting to load from JSON file")
-                json_data = find_and_load_laptops_json()
-                if json_data:
-                    self.laptops = json_data
-                    logger.info(f"Successfully loaded {len(self.laptops)} laptops from JSON file")
+        counts = {}
+        for name, bitmap in self.bitmaps.items():
+            if within is not None:
+                bitmap = bitmap & within
+            counts[name] = self.cardinality(bitmap)
+        return counts
+
+class CatalogColumns:
+    """
+    Typed column arrays for a list of laptops, one row per laptop
+
+    Numeric columns hold NaN where a value is missing. Brands are stored as
+    codes into brand_names (lowercased), and feature and port flags as
+    boolean arrays, so filters can be evaluated as NumPy masks.
+    """
+    def __init__(self, laptops: List[Dict]):
+        count = len(laptops)
+        self.count = count
+        self.price = np.full(count, np.nan)
+        self.screen_size = np.full(count, np.nan)
+        self.ram_gb = np.full(count, np.nan)
+        self.storage_gb = np.full(count, np.nan)
+        self.refresh_hz = np.full(count, np.nan)
+        self.weight_kg = np.full(count, np.nan)
+        self.brand_codes = np.zeros(count, dtype=np.int32)
+        self.brand_names = []
+        self.flags = {name: np.zeros(count, dtype=bool) for name in list(FEATURE_COLUMNS) + list(PORT_COLUMNS)}
+        self.performance_tier = np.zeros(count, dtype=np.int8)
+        
+        brand_code_of = {}
+        flag_sources = {**FEATURE_COLUMNS, **PORT_COLUMNS}
+        for row, laptop in enumerate(laptops):
+            price_value, _ = extract_price_range(laptop)
+            if price_value is not None:
+                self.price[row] = price_value
+            
+            brand = ''
+            cpu = ''
+            gpu = ''
+            for table in laptop.get('tables', []):
+                title = table.get('title')
+                data = table.get('data')
+                if not isinstance(data, dict):
+                    continue
+                
+                if title == 'Product Details':
+                    brand = brand or (data.get('Brand') or '').lower()
+                    self._set(self.weight_kg, row, _parse_weight_kg(data.get('Weight')))
+                elif title == 'Screen':
+                    self._set(self.screen_size, row, _parse_number(data.get('Size')))
+                    self._set(self.refresh_hz, row, _parse_number(data.get('Refresh Rate')))
+                elif title in ('Specs', 'Misc'):
+                    self._set(self.ram_gb, row, _parse_capacity_gb(data.get('Memory Installed') or data.get('RAM')))
+                    self._set(self.storage_gb, row, _parse_capacity_gb(data.get('Storage')))
+                    cpu = cpu or f"{data.get('Processor Brand') or ''} {data.get('Processor Name') or ''}".strip()
+                    gpu = gpu or data.get('Graphics Card') or ''
+                
+                for name, (flag_title, field) in flag_sources.items():
+                    if title == flag_title and data.get(field) is True:
+                        self.flags[name][row] = True
+            
+            ram_gb = None if np.isnan(self.ram_gb[row]) else float(self.ram_gb[row])
+            self.performance_tier[row] = classify_performance_tier(cpu, gpu, ram_gb)
+            
+            if brand not in brand_code_of:
+                brand_code_of[brand] = len(self.brand_names)
+                self.brand_names.append(brand)
+            self.brand_codes[row] = brand_code_of[brand]
+
+    NUMERIC_COLUMNS = ('price', 'screen_size', 'ram_gb', 'storage_gb', 'refresh_hz', 'weight_kg',
+                       'brand_codes', 'performance_tier')
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Every column as a named array, for publishing in a catalog snapshot
+        """
+        arrays = {f"columns.{name}": getattr(self, name) for name in self.NUMERIC_COLUMNS}
+        arrays['columns.brand_names'] = np.array(self.brand_names, dtype=str)
+        arrays.update({f"flags.{name}": column for name, column in self.flags.items()})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'CatalogColumns':
+        """
+        Rebuild the columns from to_arrays() output without parsing any laptops
+        """
+        columns = cls([])
+        for name in cls.NUMERIC_COLUMNS:
+            setattr(columns, name, arrays[f"columns.{name}"])
+        columns.count = len(columns.price)
+        columns.brand_names = arrays['columns.brand_names'].tolist()
+        columns.flags = {name[len('flags.'):]: column for name, column in arrays.items() if name.startswith('flags.')}
+        return columns
+
+    @classmethod
+    def concatenate(cls, first: 'CatalogColumns', second: 'CatalogColumns') -> 'CatalogColumns':
+        """
+        Columns of the rows of first followed by the rows of second
+        """
+        columns = cls([])
+        columns.brand_names = list(first.brand_names)
+        code_of = {name: code for code, name in enumerate(columns.brand_names)}
+        remap = np.zeros(len(second.brand_names), dtype=np.int32)
+        for code, name in enumerate(second.brand_names):
+            if name not in code_of:
+                code_of[name] = len(columns.brand_names)
+                columns.brand_names.append(name)
+            remap[code] = code_of[name]
+        
+        for name in cls.NUMERIC_COLUMNS:
+            setattr(columns, name, np.concatenate([getattr(first, name), getattr(second, name)]))
+        columns.brand_codes = np.concatenate([first.brand_codes, remap[second.brand_codes]]).astype(np.int32)
+        columns.flags = {name: np.concatenate([column, second.flags[name]]) for name, column in first.flags.items()}
+        columns.count = first.count + second.count
+        return columns
+
+    @staticmethod
+    def _set(column: np.ndarray, row: int, value: Optional[float]):
+        # Keep the first value found for a laptop, like the table scans did
+        if value is not None and np.isnan(column[row]):
+            column[row] = value
+
+    def brand_mask(self, matches) -> np.ndarray:
+        """
+        Boolean row mask of laptops whose (non-empty) lowercased brand satisfies matches(brand)
+        """
+        matching_codes = np.array([bool(name) and matches(name) for name in self.brand_names], dtype=bool)
+        if not len(matching_codes):
+            return np.zeros(self.count, dtype=bool)
+        return matching_codes[self.brand_codes]
+
+def get_key_specs(laptop: Dict) -> Dict:
+    """
+    Extract key specifications from a laptop for quick comparison
+    """
+    key_specs = {}
+
+    # Processor
+    for table in laptop.get('tables', []):
+        if table.get('title') == 'Specs' and 'data' in table:
+            processor_brand = table['data'].get('Processor Brand', '')
+            processor_name = table['data'].get('Processor Name', '')
+            if processor_brand and processor_name:
+                key_specs['Processor'] = f"{processor_brand} {processor_name}"
+
+            # Graphics
+            graphics = table['data'].get('Graphics Card', '')
+            if graphics:
+                key_specs['Graphics'] = graphics
+
+            # RAM
+            memory = table['data'].get('Memory Installed', '')
+            if memory:
+                key_specs['RAM'] = memory
+
+            # Storage
+            storage = table['data'].get('Storage', '')
+            if storage:
+                key_specs['Storage'] = storage
+
+    # Screen
+    for table in laptop.get('tables', []):
+        if table.get('title') == 'Screen' and 'data' in table:
+            screen_size = table['data'].get('Size', '')
+            screen_resolution = table['data'].get('Resolution', '')
+            if screen_size:
+                key_specs['Screen'] = screen_size
+                if screen_resolution:
+                    key_specs['Screen'] += f" {screen_resolution}"
+
+            refresh_rate = table['data'].get('Refresh Rate', '')
+            if refresh_rate:
+                key_specs['Refresh Rate'] = refresh_rate
+
+    # Battery
+    for table in laptop.get('tables', []):
+        if (table.get('title') == 'Features' or table.get('title') == 'Misc') and 'data' in table:
+            battery = table['data'].get('Battery Life', '')
+            if battery:
+                key_specs['Battery'] = battery
+
+    # Weight
+    for table in laptop.get('tables', []):
+        if table.get('title') == 'Product Details' and 'data' in table:
+            weight = table['data'].get('Weight', '')
+            if weight:
+                key_specs['Weight'] = weight
+
+    return key_specs
+
+def get_brand_and_name(laptop: Dict) -> Tuple[str, str]:
+    """Return a laptop's brand and model name from its Product Details table"""
+    for table in laptop.get('tables', []):
+        if table.get('title') == 'Product Details' and 'data' in table:
+            return table['data'].get('Brand', ''), table['data'].get('Name', '')
+    return "", ""
+
+def get_laptop_name(laptop: Dict) -> str:
+    """Helper to get a laptop's full name (brand + name)"""
+    brand, name = get_brand_and_name(laptop)
+    return f"{brand} {name}".strip()
+
+def get_laptop_id(laptop: Dict) -> str:
+    """
+    Stable id of a laptop: "model_id:config_id" for database rows, otherwise a hash
+    of the laptop's contents so JSON data keeps the same ids across reloads
+    """
+    if laptop.get('id') is not None:
+        return str(laptop['id'])
+    return hashlib.sha1(json.dumps(laptop, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+class LaptopRecord:
+    """
+    Derived values for one catalog entry, computed once when the catalog loads
+    """
+    __slots__ = ('laptop_id', 'brand', 'name', 'display_name', 'description', 'price_value', 'price_string', 'key_specs')
+
+    def __init__(self, laptop: Dict):
+        self.laptop_id = get_laptop_id(laptop)
+        self.brand, self.name = get_brand_and_name(laptop)
+        self.display_name = f"{self.brand} {self.name}".strip()
+        self.description = format_laptop_description(laptop)
+        self.price_value, self.price_string = extract_price_range(laptop)
+        self.key_specs = get_key_specs(laptop)
+
+# Facets offered for browsing the catalog: (facet, table title, field in that table)
+FACET_FIELDS = (
+    ("brands", "Product Details", "Brand"),
+    ("screen_sizes", "Screen", "Size"),
+    ("processors", "Specs", "Processor Name"),
+    ("graphics_cards", "Specs", "Graphics Card"),
+    ("ram_options", "Misc", "Memory Installed"),
+    ("storage_options", "Specs", "Storage"),
+    ("operating_systems", "Misc", "Operating System"),
+)
+SPECIAL_FEATURES = ["touchscreen", "backlit_keyboard", "numeric_keyboard", "bluetooth"]
+PORT_FEATURES = ["usb_c", "hdmi", "ethernet", "thunderbolt", "display_port"]
+
+def build_laptop_facets(laptops: List[Dict]) -> Dict:
+    """
+    Distinct values of every facet across the laptops, with how many laptops have each value
+
+    Returns:
+        Dictionary of sorted value lists per facet, the fixed feature and port lists,
+        and a "counts" dictionary mapping each facet to {value: count}
+    """
+    counters = {facet: defaultdict(int) for facet, _, _ in FACET_FIELDS}
+    _count_facets(counters, laptops, 1)
+    return _facets_from_counters(counters)
+
+def patch_laptop_facets(facets: Dict, added: List[Dict], removed: List[Dict]) -> Dict:
+    """
+    Facets after adding and removing some laptops, derived from earlier build_laptop_facets() output
+    """
+    counters = {facet: defaultdict(int, facets["counts"].get(facet, {})) for facet, _, _ in FACET_FIELDS}
+    _count_facets(counters, removed, -1)
+    _count_facets(counters, added, 1)
+    return _facets_from_counters(counters)
+
+def _count_facets(counters: Dict[str, Dict], laptops: List[Dict], step: int):
+    fields_by_table = defaultdict(list)
+    for facet, title, field in FACET_FIELDS:
+        fields_by_table[title].append((facet, field))
+    
+    for laptop in laptops:
+        for table in laptop.get('tables', []):
+            data = table.get('data', {})
+            if not isinstance(data, dict):
+                continue
+            for facet, field in fields_by_table.get(table.get('title', ''), ()):
+                value = data.get(field)
+                if value:
+                    counters[facet][value] += step
+
+def _facets_from_counters(counters: Dict[str, Dict]) -> Dict:
+    facets = {}
+    counts = {}
+    for facet, counter in counters.items():
+        present = [value for value, count in counter.items() if count > 0]
+        try:
+            values = sorted(present)
+        except TypeError:
+            # Mixed value types, e.g. numeric sizes next to text
+            values = sorted(present, key=str)
+        facets[facet] = values
+        counts[facet] = {value: counter[value] for value in values}
+    
+    facets["special_features"] = list(SPECIAL_FEATURES)
+    facets["ports"] = list(PORT_FEATURES)
+    facets["counts"] = counts
+    return facets
+
+def top_k_similar(embeddings: np.ndarray, queries: np.ndarray, k: int,
+                  candidates: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rank rows of a normalized embedding matrix by dot product with normalized query vectors
+    
+    Args:
+        embeddings: (n, d) matrix of normalized row vectors
+        queries: one (d,) query vector or a (q, d) matrix of query vectors
+        k: Number of best rows to return per query
+        candidates: Optional array of row indices to restrict the ranking to
+    
+    Returns:
+        (rows, scores) best first, shaped (k,) for one query or (q, k) for several
+    """
+    single = np.ndim(queries) == 1
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    matrix = embeddings if candidates is None else embeddings[candidates]
+    scores = queries @ matrix.T
+    
+    k = min(k, scores.shape[1])
+    if k == 0:
+        top = np.zeros((len(queries), 0), dtype=np.int64)
+    elif k < scores.shape[1]:
+        # O(n) selection of the k best, then only those k get sorted
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(k), (len(queries), k))
+    
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    
+    rows = top if candidates is None else np.asarray(candidates)[top]
+    if single:
+        return rows[0], top_scores[0]
+    return rows, top_scores
+
+# Candidate sets sparser than 1 in this many rows are scored directly instead of
+# walking a precomputed use case ranking
+RANKING_WALK_MIN_DENSITY = 64
+
+def first_k_in_ranking(ranking: np.ndarray, mask: np.ndarray, k: int, block_size: int = 256) -> np.ndarray:
+    """
+    Return the positions in a ranking of the first k rows that pass a boolean mask
+    The ranking is checked in blocks, so typical requests stop after a few hundred rows.
+    """
+    positions = []
+    for start in range(0, len(ranking), block_size):
+        hits = np.flatnonzero(mask[ranking[start:start + block_size]])
+        positions.extend((start + hits[:k - len(positions)]).tolist())
+        if len(positions) >= k:
+            break
+    return np.array(positions, dtype=np.int64)
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Directory for the persistent laptop embedding cache, kept beside this file by default
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(current_dir, "embedding_cache"))
+
+def description_hash(description: str) -> bytes:
+    """Stable key for a laptop description in the embedding cache"""
+    return hashlib.sha1(description.encode('utf-8')).hexdigest().encode('ascii')
+
+def catalog_version(laptops: List[Dict], model_name: str = MODEL_NAME) -> str:
+    """
+    Content hash of the laptop data and model, used to tell catalog builds apart
+    """
+    digest = hashlib.sha1(model_name.encode('utf-8'))
+    for laptop in laptops:
+        digest.update(json.dumps(laptop, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def catalog_delta_version(base_version: str, added: List[Dict], removed_ids: List[str]) -> str:
+    """
+    Version of a catalog derived from another one by adding and removing laptops
+    """
+    digest = hashlib.sha1(base_version.encode('utf-8'))
+    digest.update(json.dumps(sorted(removed_ids)).encode('utf-8'))
+    for laptop in added:
+        digest.update(json.dumps(laptop, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+class EmbeddingCache:
+    """
+    Persistent store of normalized laptop description embeddings for one model
+
+    The description hashes and the float32 embedding matrix are written one
+    after the other into a single file, so replacing the cache is one atomic
+    rename and a reader never pairs vectors with keys from another write. The
+    matrix is memory mapped on load, so a restart only has to encode
+    descriptions that are new or have changed.
+    """
+    def __init__(self, model_name: str, directory: str = EMBEDDING_CACHE_DIR):
+        self.model_name = model_name
+        self.directory = directory
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.path = os.path.join(directory, f"{safe_name}.embeddings")
+
+    def _load(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Memory map the cached vectors and keys, or return (None, None) if there is no usable cache
+        """
+        if not os.path.exists(self.path):
+            return None, None
+        try:
+            with open(self.path, 'rb') as f:
+                keys = np.lib.format.read_array(f)
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
                 else:
-                    logger.error("Failed to load laptop data from any source")
-                    self.laptops = []
-        
-        self.conversation_state = "initial"
-        self.user_preferences = {}
-        self.last_recommendations = []  # Store last recommendations for reference
-        
-        # Add new variables for storing top similar laptops and search criteria
-        self.top_similar_laptops = []  # Store the top 15 most similar laptops
-        self.last_search_criteria = {}  # Store the last search criteria to detect repeats
-        
-        # Expanded predefined questions for gathering user preferences
-        self.questions = {
-            "initial": "What kind of laptop are you looking for? Please describe your needs in detail.",
-            "purpose": "What will you primarily use the laptop for (e.g., gaming, work, studies, design)?",
-            "size": "Do you have a preferred screen size (e.g., 13\", 14\", 15.6\", 16\", 17\")? You can also say small, medium, or large.",
-            "budget": "What's your approximate budget range? This helps me find laptops that fit your price expectations.",
-            "brand": "Do you have any preferred brands? You can also tell me if there are brands you want to exclude.",
-            "features": "Are there any specific features you need (e.g., touchscreen, backlit keyboard, long battery life)?",
-            "performance": "How important is performance to you (e.g., high, medium, basic needs)?",
-            "ports": "Do you need any specific ports (e.g., HDMI, Ethernet, USB-C, Thunderbolt)?",
-            "storage": "What are your storage requirements (e.g., SSD size, additional storage)?",
-            "graphics": "Do you need a dedicated graphics card? If so, for what purposes?"
-        }
-        
-        # Create embeddings for predefined features and use cases
-        self.feature_embeddings = self._create_feature_embeddings()
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+                offset = f.tell()
+            vectors = np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                                order='F' if fortran_order else 'C')
+            if vectors.ndim != 2 or len(vectors) != len(keys):
+                logger.warning("Embedding cache file is inconsistent, ignoring the cache")
+                return None, None
+            return vectors, keys
+        except Exception as e:
+            logger.error(f"Error loading embedding cache: {e}")
+            return None, None
 
-    def load_from_database(self, limit=10000) -> List[Dict]:
+    def _save(self, vectors: np.ndarray, keys: np.ndarray):
         """
-        Load laptop data from PostgreSQL database using the connection pool or direct connection
-        
-        Args:
-            limit: Maximum number of laptops to load (default: 10000)
-        
-        Returns:
-            List of dictionaries containing laptop information in the same format as the JSON
+        Write the keys and vectors to a temporary file and rename it over the cache in one step
         """
-        conn = None
-        cur = None
-        
-        # Try to use connection pool first if available
-        if HAS_DB_MODULE:
-            try:
-                logger.info(f"Loading up to {limit} laptops from database using connection pool")
-                conn, cur = get_db_connection()
-                if not conn or not cur:
-                    raise Exception("Failed to get database connection from pool")
-                
-                logger.info("Connection successful")
-            except Exception as e:
-                logger.error(f"Connection pool error: {e}")
-                conn, cur = None, None
-        
-        # Try direct connection if pool connection failed
-        if not conn or not cur:
-            try:
-                logger.info("Connection pool failed or not available. Trying direct connection")
-                conn, cur = direct_db_connection()
-                if not conn or not cur:
-                    raise Exception("Failed to establish direct database connection")
-            except Exception as e:
-                logger.error(f"Direct connection error: {e}")
-                return []  # Return empty list if all connection attempts failed
-        
         try:
-            # Get laptop models with limit
-            logger.info("Querying laptop_models table")
-            cur.execute(f"""
-                SELECT model_id, brand, model_name, image_url
-                FROM laptop_models
-                LIMIT {limit}
-            """)
-            
-            laptop_models = cur.fetchall()
-            if not laptop_models:
-                logger.error("No laptop models found in database")
-                return []
-            
-            logger.info(f"Found {len(laptop_models)} laptop models")
-            
-            # Create a list to store all laptop data
-            laptops = []
-            
-            # Process each laptop model
-            for laptop_model in laptop_models:
-                model_id = laptop_model[0]  # Access by index since not using RealDictCursor
-                
-                # Create a laptop entry
-                laptop = {'tables': []}
-                
-                # Add product details
-                product_details = {
-                    'Brand': laptop_model[1],  # brand
-                    'Name': laptop_model[2],   # model_name
-                    'image': laptop_model[3]   # image_url
-                }
-                
-                laptop['tables'].append({
-                    'title': 'Product Details',
-                    'data': product_details
-                })
-                
-                # Get configuration details
-                cur.execute("""
-                    SELECT config_id, price, weight, battery_life, memory_installed, operating_system, 
-                           processor, graphics_card
-                    FROM laptop_configurations
-                    WHERE model_id = %s
-                """, (model_id,))
-                
-                configs = cur.fetchall()
-                if not configs:
-                    # Skip laptops without configurations
-                    continue
-                
-                # Use the first configuration (most laptops will only have one)
-                config = configs[0]
-                config_id = config[0]  # config_id
-                
-                # Add weight to product details
-                if config[2]:  # weight
-                    product_details['Weight'] = config[2]
-                
-                # Add misc info
-                misc_data = {}
-                if config[4]:  # memory_installed
-                    misc_data['Memory Installed'] = config[4]
-                if config[5]:  # operating_system
-                    misc_data['Operating System'] = config[5]
-                if config[3]:  # battery_life
-                    misc_data['Battery Life'] = config[3]
-                
-                if misc_data:
-                    laptop['tables'].append({
-                        'title': 'Misc',
-                        'data': misc_data
-                    })
-                
-                # Add price info
-                if config[1]:  # price
-                    price_data = [
-                        {
-                            'shop_url': '',  # No shop URL in this schema
-                            'price': f"£{config[1]}"
-                        }
-                    ]
-                    
-                    laptop['tables'].append({
-                        'title': 'Prices',
-                        'data': price_data
-                    })
-                
-                # Get processor info if available
-                if config[6]:  # processor
-                    processor_model = config[6]
-                    cur.execute("""
-                        SELECT brand, model
-                        FROM processors
-                        WHERE model = %s
-                    """, (processor_model,))
-                    
-                    processor = cur.fetchone()
-                    if processor:
-                        processor_data = {
-                            'Processor Brand': processor[0],  # brand
-                            'Processor Name': processor[1]    # model
-                        }
-                        
-                        # Add to Specs table
-                        specs_data = {}
-                        specs_data.update(processor_data)
-                
-                # Get graphics card info
-                if config[7]:  # graphics_card
-                    graphics_model = config[7]
-                    cur.execute("""
-                        SELECT brand, model
-                        FROM graphics_cards
-                        WHERE model = %s
-                    """, (graphics_model,))
-                    
-                    graphics = cur.fetchone()
-                    if graphics:
-                        # Add to specs data
-                        if 'specs_data' not in locals():
-                            specs_data = {}
-                        specs_data['Graphics Card'] = f"{graphics[0]} {graphics[1]}"  # brand model
-                
-                # Get storage info
-                cur.execute("""
-                    SELECT storage_type, capacity
-                    FROM configuration_storage
-                    WHERE config_id = %s
-                """, (config_id,))
-                
-                storages = cur.fetchall()
-                if storages:
-                    # Combine all storage entries into one string
-                    storage_strings = []
-                    for storage in storages:
-                        storage_strings.append(f"{storage[1]} {storage[0]}")  # capacity storage_type
-                    
-                    if storage_strings:
-                        # Add to specs data
-                        if 'specs_data' not in locals():
-                            specs_data = {}
-                        specs_data['Storage'] = ", ".join(storage_strings)
-                
-                # Add specs table if we have data
-                if 'specs_data' in locals() and specs_data:
-                    laptop['tables'].append({
-                        'title': 'Specs',
-                        'data': specs_data
-                    })
-                
-                # Get screen info
-                cur.execute("""
-                    SELECT size, resolution, touchscreen, refresh_rate
-                    FROM screens
-                    WHERE config_id = %s
-                """, (config_id,))
-                
-                screen = cur.fetchone()
-                if screen:
-                    screen_data = {}
-                    if screen[0]:  # size
-                        screen_data['Size'] = screen[0]
-                    if screen[1]:  # resolution
-                        screen_data['Resolution'] = screen[1]
-                    if screen[2] is not None:  # touchscreen
-                        screen_data['Touchscreen'] = bool(screen[2])
-                    if screen[3]:  # refresh_rate
-                        screen_data['Refresh Rate'] = screen[3]
-                    
-                    if screen_data:
-                        laptop['tables'].append({
-                            'title': 'Screen',
-                            'data': screen_data
-                        })
-                
-                # Get features
-                cur.execute("""
-                    SELECT backlit_keyboard, numeric_keyboard, bluetooth
-                    FROM features
-                    WHERE config_id = %s
-                """, (config_id,))
-                
-                features = cur.fetchone()
-                if features:
-                    feature_data = {}
-                    if features[0] is not None:  # backlit_keyboard
-                        feature_data['Backlit Keyboard'] = bool(features[0])
-                    if features[1] is not None:  # numeric_keyboard
-                        feature_data['Numeric Keyboard'] = bool(features[1])
-                    if features[2] is not None:  # bluetooth
-                        feature_data['Bluetooth'] = bool(features[2])
-                    
-                    if feature_data:
-                        laptop['tables'].append({
-                            'title': 'Features',
-                            'data': feature_data
-                        })
-                
-                # Get ports
-                cur.execute("""
-                    SELECT ethernet, hdmi, usb_type_c, thunderbolt, display_port
-                    FROM ports
-                    WHERE config_id = %s
-                """, (config_id,))
-                
-                ports = cur.fetchone()
-                if ports:
-                    port_data = {}
-                    if ports[0] is not None:  # ethernet
-                        port_data['Ethernet (RJ45)'] = bool(ports[0])
-                    if ports[1] is not None:  # hdmi
-                        port_data['HDMI'] = bool(ports[1])
-                    if ports[2] is not None:  # usb_type_c
-                        port_data['USB Type-C'] = bool(ports[2])
-                    if ports[3] is not None:  # thunderbolt
-                        port_data['Thunderbolt'] = bool(ports[3])
-                    if ports[4] is not None:  # display_port
-                        port_data['Display Port'] = bool(ports[4])
-                    
-                    if port_data:
-                        laptop['tables'].append({
-                            'title': 'Ports',
-                            'data': port_data
-                        })
-                
-                # Add this laptop to the list
-                laptops.append(laptop)
-            
-            logger.info(f"Successfully loaded {len(laptops)} laptops from database")
-            return laptops
-            
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.lib.format.write_array(f, keys)
+                np.lib.format.write_array(f, vectors)
+            os.replace(tmp_path, self.path)
+            logger.info(f"Saved {len(keys)} embeddings to {self.directory}")
         except Exception as e:
-            logger.error(f"Error loading data from database: {str(e)}")
-            return []
-        finally:
-            # Always close/release the connection properly
-            if HAS_DB_MODULE and conn and cur:
-                try:
-                    release_db_connection(conn, cur)
-                    logger.info("Released database connection back to pool")
-                except Exception as e:
-                    logger.error(f"Error releasing database connection: {str(e)}")
-            elif conn:
-                if cur:
-                    cur.close()
-                conn.close()
-                logger.info("Closed direct database connection")
+            logger.error(f"Error saving embedding cache: {e}")
+
+    def encode(self, model: SentenceTransformer, descriptions: List[str]) -> np.ndarray:
+        """
+        Return normalized float32 embeddings for the descriptions, encoding only cache misses
+        """
+        keys = np.array([description_hash(d) for d in descriptions], dtype='S40')
+        cached_vectors, cached_keys = self._load()
+        
+        # Warm restart on an unchanged catalog: serve the memory mapped matrix directly
+        if cached_keys is not None and np.array_equal(cached_keys, keys):
+            logger.info(f"Loaded all {len(keys)} laptop embeddings from cache")
+            return cached_vectors
+        
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if cached_keys is not None:
+            row_by_key = {key: row for row, key in enumerate(cached_keys.tolist())}
+            rows = np.array([row_by_key.get(key, -1) for key in keys.tolist()], dtype=np.int64)
+        
+        missing = np.flatnonzero(rows < 0)
+        dimension = cached_vectors.shape[1] if cached_vectors is not None else None
+        new_vectors = None
+        if len(missing):
+            logger.info(f"Encoding {len(missing)} of {len(keys)} laptop descriptions not found in the embedding cache")
+            new_vectors = model.encode([descriptions[i] for i in missing], batch_size=64, convert_to_numpy=True,
+                                       normalize_embeddings=True, show_progress_bar=False)
+            new_vectors = np.asarray(new_vectors, dtype=np.float32)
+            if dimension is not None and new_vectors.shape[1] != dimension:
+                # The model changed shape under the same name; the old cache is useless
+                logger.warning("Embedding dimension changed, discarding the embedding cache")
+                return self.encode_all(model, descriptions)
+            dimension = new_vectors.shape[1]
+        
+        embeddings = np.empty((len(keys), dimension), dtype=np.float32)
+        found = rows >= 0
+        if found.any():
+            embeddings[found] = cached_vectors[rows[found]]
+        if new_vectors is not None:
+            embeddings[missing] = new_vectors
+            # Keep the cache in step with the current catalog
+            self._save(embeddings, keys)
+        return embeddings
+
+    def store(self, descriptions: List[str], embeddings: np.ndarray):
+        """
+        Replace the cache with embeddings that were computed elsewhere
+        """
+        self._save(np.ascontiguousarray(embeddings, dtype=np.float32),
+                   np.array([description_hash(d) for d in descriptions], dtype='S40'))
+
+    def encode_all(self, model: SentenceTransformer, descriptions: List[str]) -> np.ndarray:
+        """
+        Encode every description and replace the cache with the result
+        """
+        embeddings = model.encode(descriptions, batch_size=64, convert_to_numpy=True,
+                                  normalize_embeddings=True, show_progress_bar=False)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self._save(embeddings, np.array([description_hash(d) for d in descriptions], dtype='S40'))
+        return embeddings
+
+def _is_word_boundary(text: str, index: int) -> bool:
+    """Same test as the regex \\b: a word character on exactly one side of the index"""
+    before = index > 0 and (text[index - 1].isalnum() or text[index - 1] == '_')
+    after = index < len(text) and (text[index].isalnum() or text[index] == '_')
+    return before != after
+
+class KeywordScan:
+    """
+    Every vocabulary hit found in one message, grouped by (group, label)
+    """
+    __slots__ = ('source', 'text', 'spans', 'entries')
+
+    def __init__(self, source: str, text: str):
+        self.source = source
+        self.text = text
+        self.spans = defaultdict(list)
+        self.entries = defaultdict(set)
+
+    def has(self, group: str, label: str) -> bool:
+        """True if any term of the label occurs in the message"""
+        return (group, label) in self.spans
+
+    def count(self, group: str, label: str) -> int:
+        """Number of occurrences of the label's terms"""
+        return len(self.spans.get((group, label), ()))
+
+    def distinct(self, group: str, label: str) -> int:
+        """Number of different terms of the label that occur"""
+        return len(self.entries.get((group, label), ()))
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over every preference vocabulary
+
+    Terms are added under a (group, label) pair and matched case-insensitively,
+    either anywhere in the text or only between word boundaries. One pass over
+    a message finds every term of every vocabulary.
+    """
+    def __init__(self):
+        self.entries = []
+        self.labels = defaultdict(list)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+    def add(self, group: str, label: str, terms: List[str], word_bounded: bool = False):
+        """
+        Register the terms of one label; a term may be listed twice to count twice
+        """
+        if label not in self.labels[group]:
+            self.labels[group].append(label)
+        for term in terms:
+            term = term.lower()
+            entry = len(self.entries)
+            self.entries.append((group, label, len(term), word_bounded))
+            state = 0
+            for char in term:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].append(entry)
+
+    def build(self) -> 'KeywordMatcher':
+        """
+        Compute the failure links; call once after every term has been added
+        """
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        return self
+
+    def scan(self, source: str) -> KeywordScan:
+        """
+        Find every vocabulary term in the lowercased message in a single pass
+        """
+        text = source.lower()
+        result = KeywordScan(source, text)
+        goto, fail, output, entries = self._goto, self._fail, self._output, self.entries
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for entry in output[state]:
+                group, label, length, word_bounded = entries[entry]
+                start = index + 1 - length
+                if word_bounded and not (_is_word_boundary(text, start) and _is_word_boundary(text, index + 1)):
+                    continue
+                result.spans[(group, label)].append((start, index + 1))
+                result.entries[(group, label)].add(entry)
+        return result
+
+# Keyword fallback for use case detection, matched as whole words and counted
+USE_CASE_KEYWORDS = {
+    "gaming": ["gaming", "game", "play", "fps", "aaa", "shooter", "mmo", "rpg", "esports", "stream"],
+    "business": ["business", "work", "office", "professional", "meetings", "presentation", "teams", "zoom"],
+    "student": ["student", "school", "college", "university", "education", "study", "homework", "notes"],
+    "design": ["design", "creative", "art", "photo", "video", "editing", "creator", "adobe", "illustrator", "photoshop"],
+    "programming": ["programming", "coding", "development", "software", "code", "developer", "programming", "ide"],
+    "portable": ["portable", "light", "travel", "thin", "lightweight", "carry", "commute", "mobility"],
+    "entertainment": ["entertainment", "media", "movies", "streaming", "netflix", "videos", "watch", "content"],
+    "content_creation": ["content", "creator", "youtube", "stream", "render", "production", "vlog"],
+    "budget": ["budget", "cheap", "affordable", "inexpensive", "economical", "low cost", "value"],
+    "premium": ["premium", "high-end", "luxury", "best", "top", "flagship", "expensive"],
+    "workstation": ["workstation", "cad", "engineering", "simulation", "data science", "virtualization"],
+    "ultrabook": ["ultrabook", "ultraportable", "thin and light", "premium build", "sleek"]
+}
+
+COMMON_BRANDS = [
+    "dell", "lenovo", "hp", "asus", "acer", "apple", "msi",
+    "samsung", "microsoft", "lg", "razer", "toshiba", "alienware",
+    "huawei", "sony", "fujitsu", "gigabyte", "chuwi"
+]
+
+# A brand anywhere after one of these on the same line is blacklisted
+NEGATIVE_TRIGGERS = {
+    "no": ["no "],
+    "not": ["not "],
+    "don't": ["don't like ", "don't want "],
+    "avoid": ["avoid "],
+    "exclude": ["exclude "],
+    "blacklist": ["blacklist "],
+    "hate": ["hate "],
+    "dislike": ["dislike "]
+}
+
+# A brand directly after one of these is blacklisted, even without a space after it
+NEGATIVE_PREFIXES = ["no", "not", "don't want", "don't like", "avoid", "exclude", "blacklist", "hate", "dislike"]
+
+# Performance hints in free text, counted once per distinct term
+PERFORMANCE_KEYWORDS = {
+    "high": ["high performance", "powerful", "fast", "gaming", "rendering",
+             "video editing", "3d modeling", "simulation", "high-end", "top spec",
+             "best performance", "fastest", "i7", "i9", "ryzen 7", "ryzen 9"],
+    "medium": ["medium performance", "balanced", "mid-range", "moderate",
+               "good performance", "decent", "i5", "ryzen 5"],
+    "basic": ["basic", "budget", "entry level", "simple tasks", "browsing",
+              "office work", "light use", "casual", "everyday", "i3", "celeron"]
+}
+
+# Feature and port mentions, matched as whole words
+FEATURE_KEYWORDS = {
+    "touchscreen": ["touch", "touchscreen"],
+    "backlit_keyboard": ["backlit", "lit keyboard", "keyboard lighting"],
+    "numeric_keyboard": ["numeric", "numpad", "number pad", "keypad"],
+    "bluetooth": ["bluetooth"]
+}
+
+PORT_KEYWORDS = {
+    "usb_c": ["usb-c", "usb c", "type-c", "type c"],
+    "hdmi": ["hdmi"],
+    "ethernet": ["ethernet", "lan", "rj45", "network port"],
+    "thunderbolt": ["thunderbolt"],
+    "display_port": ["displayport", "display port"]
+}
+
+# Descriptive screen sizes, checked in this order
+SIZE_KEYWORDS = {
+    "small": ["small", "compact", "portable"],
+    "medium": ["medium", "standard"],
+    "large": ["large", "big", "desktop replacement"]
+}
+
+# Answers to the guided questions, matched anywhere in the text
+PURPOSE_KEYWORDS = {
+    "gaming": ["gaming", "game", "play", "fps", "gamer"],
+    "business": ["business", "work", "office", "professional"],
+    "student": ["student", "school", "college", "university", "education", "study"],
+    "design": ["design", "creative", "art", "photo", "video", "editing", "creator", "adobe"],
+    "programming": ["programming", "coding", "development", "software", "code", "developer"]
+}
+
+SIZE_ANSWERS = {"small": [11, 12, 13, 14], "medium": [15, 15.6], "large": [16, 17, 17.3]}
+
+PERFORMANCE_ANSWERS = {
+    "high": ["high", "powerful", "gaming", "top", "best"],
+    "medium": ["medium", "mid", "balanced", "moderate"]
+}
+
+CONVERSATION_PHRASES = {
+    "restart": ["restart", "start over", "new search", "new recommendation"],
+    "skip_budget": ["don't know", "not sure", "any budget", "doesn't matter", "don't care", "skip"],
+    "any_brand": ["no", "none", "any", "no preference", "doesn't matter"],
+    "exclude": ["exclude", "blacklist", "no more", "don't show", "don't want"],
+    "more": ["more", "additional", "other", "alternative", "show more"],
+    "smaller": ["smaller", "more portable", "lighter", "portable"],
+    "larger": ["larger", "bigger screen", "larger display"],
+    "gaming": ["gaming", "games", "play games"],
+    "business": ["business", "work", "office", "professional"],
+    "ignore_price": ["ignore price", "don't care about price", "forget the price", "remove price",
+                     "price doesn't matter", "no price limit"],
+    "cheaper": ["cheaper", "less expensive", "lower price", "budget", "affordable", "cost less"],
+    "pricier": ["expensive", "higher price", "premium", "better", "high-end", "higher budget",
+                "more expensive", "higher quality"]
+}
+
+def build_preference_matcher() -> KeywordMatcher:
+    """
+    Compile every keyword vocabulary used by the chatbot into one matcher
+    """
+    matcher = KeywordMatcher()
+    for use_case, words in USE_CASE_KEYWORDS.items():
+        matcher.add('use_case', use_case, words, word_bounded=True)
+    for brand in COMMON_BRANDS:
+        matcher.add('brand', brand, [brand], word_bounded=True)
+        matcher.add('negated_brand', brand, [f"{prefix} {brand}" for prefix in NEGATIVE_PREFIXES])
+    for trigger, terms in NEGATIVE_TRIGGERS.items():
+        matcher.add('negation', trigger, terms)
+    for level, terms in PERFORMANCE_KEYWORDS.items():
+        matcher.add('performance', level, terms)
+    for feature, terms in FEATURE_KEYWORDS.items():
+        matcher.add('feature', feature, terms, word_bounded=True)
+    matcher.add('feature', 'battery_life', ["battery"])
+    for port, terms in PORT_KEYWORDS.items():
+        matcher.add('port', port, terms, word_bounded=True)
+    for size, terms in SIZE_KEYWORDS.items():
+        matcher.add('size', size, terms, word_bounded=True)
+    for purpose, terms in PURPOSE_KEYWORDS.items():
+        matcher.add('purpose', purpose, terms)
+    for size in SIZE_ANSWERS:
+        matcher.add('size_answer', size, [size])
+    for level, terms in PERFORMANCE_ANSWERS.items():
+        matcher.add('performance_answer', level, terms)
+    for phrase, terms in CONVERSATION_PHRASES.items():
+        matcher.add('phrase', phrase, terms)
+    return matcher.build()
+
+PREFERENCE_MATCHER = build_preference_matcher()
+
+# Numeric patterns that the keyword matcher cannot express
+BATTERY_HOURS_PATTERN = re.compile(r'last\w*\s+\d+\s+hours')
+SIZE_VALUE_PATTERN = re.compile(r'(\d+(\.\d+)?)["\s]*(?:inch|"|inches)?')
+SIZE_RANGE_PATTERN = re.compile(r'(\d+(\.\d+)?)\s*-\s*(\d+(\.\d+)?)["\s]*(?:inch|"|inches)?')
+BUDGET_MENTION_PATTERN = re.compile(r'\b(?:budget|price|cost|spend|around|under|below|max)\b[^.]*?(\d[\d,.]*)', re.IGNORECASE)
+BUDGET_RANGE_PATTERN = re.compile(r'(\d+)\s*-\s*(\d+)')
+BUDGET_BETWEEN_PATTERN = re.compile(r'between\s+(\d+)\s+and\s+(\d+)')
+BUDGET_FROM_TO_PATTERN = re.compile(r'from\s+(\d+)\s+to\s+(\d+)')
+BUDGET_UNDER_PATTERN = re.compile(r'(?:under|less than|below|max|maximum|no more than)\s+(\d+)')
+BUDGET_OVER_PATTERN = re.compile(r'(?:over|more than|above|min|minimum|at least)\s+(\d+)')
+BUDGET_AROUND_PATTERN = re.compile(r'(?:around|about|approximately|roughly|circa)\s+(\d+)')
+BUDGET_NUMBER_PATTERN = re.compile(r'(\d+)(?:\s*(?:pounds|pound|gbp))?')
+
+# Micro-batching of user message encodes: a batch closes when it is full or when
+# the first queued text has waited this long
+ENCODER_BATCH_SIZE = int(os.getenv("ENCODER_BATCH_SIZE", "32"))
+ENCODER_BATCH_WAIT_MS = float(os.getenv("ENCODER_BATCH_WAIT_MS", "5"))
+
+class BatchEncoder:
+    """
+    Shared encoding service that groups texts from concurrent sessions into one forward pass
+
+    Callers block on a future for their own vector while a single worker thread
+    collects queued texts for a short window and encodes them together.
+    """
+    def __init__(self, model: SentenceTransformer, max_batch_size: int = ENCODER_BATCH_SIZE,
+                 max_wait_ms: float = ENCODER_BATCH_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.batches = 0
+        self.texts = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="batch-encoder", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue a text for encoding and return a future for its normalized embedding
+        """
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> np.ndarray:
+        """
+        Encode one text through the shared batch and wait for its normalized embedding
+        """
+        return self.submit(text).result()
+
+    def _collect_batch(self) -> List[Tuple[str, Future]]:
+        """
+        Block for the first queued text, then gather more until the batch is full or the window closes
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # The window is over, but take anything that is already waiting
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """
+        Worker loop: encode each collected batch and resolve its futures
+        """
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                            normalize_embeddings=True, show_progress_bar=False)
+                vectors = np.asarray(vectors, dtype=np.float32)
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                logger.error(f"Error encoding batch of {len(texts)} texts: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.texts += len(texts)
+
+class LRUCache:
+    """
+    Thread-safe bounded mapping that evicts the least recently used entry
+
+    Shared by every session in the process; hits and misses are counted so the
+    hit rate can be monitored.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Current size and hit/miss counters"""
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+def normalize_message(user_input: str) -> str:
+    """
+    Canonical form of a message for caching: lowercase, with runs of spaces collapsed on each line
+    """
+    lines = (" ".join(line.split()) for line in user_input.lower().strip().splitlines())
+    return "\n".join(line for line in lines if line)
+
+# Parsed preferences and query embeddings of recent opening messages, keyed by
+# (model name, normalized text) and shared across sessions
+PREFERENCE_CACHE_SIZE = int(os.getenv("PREFERENCE_CACHE_SIZE", "4096"))
+preference_cache = LRUCache(PREFERENCE_CACHE_SIZE)
+
+# Ranked top rows per search, keyed by (catalog version, search criteria hash) and
+# shared across sessions; a rebuilt catalog gets a new version, so stale entries
+# are never hit and simply age out
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "2048"))
+recommendation_cache = LRUCache(RECOMMENDATION_CACHE_SIZE)
+
+# Directory where catalog snapshots are published for every worker process to attach to
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", os.path.join(current_dir, "catalog_snapshots"))
+CATALOG_SNAPSHOTS_KEPT = 3
+
+class CatalogSnapshot:
+    """
+    Immutable arrays of one catalog version, published once as memory mapped .npy files
+
+    The first process to build a catalog version writes its columns, bitmaps,
+    embeddings and rankings; every other worker attaches to the same files
+    read-only, so the pages are shared through the OS page cache instead of
+    being rebuilt and copied per process. A version derived by a delta also
+    stores the delta itself, so other workers can derive the same version.
+    The version workers should serve is recorded in the CURRENT file.
+    """
+    CURRENT_FILE = "CURRENT"
+    DELTA_FILE = "delta.json"
+
+    def __init__(self, version: str, directory: str = CATALOG_SNAPSHOT_DIR):
+        self.version = version
+        self.directory = directory
+        self.path = os.path.join(directory, version)
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold an exclusive lock on this version while checking for or building the snapshot
+        """
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{self.version}.lock"), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Attach to the published arrays read-only, or return None if this version has no snapshot
+        """
+        if not os.path.isdir(self.path):
+            return None
+        try:
+            arrays = {}
+            for file_name in os.listdir(self.path):
+                if file_name.endswith('.npy'):
+                    arrays[file_name[:-len('.npy')]] = np.load(os.path.join(self.path, file_name), mmap_mode='r')
+            logger.info(f"Attached to catalog snapshot {self.version} with {len(arrays)} arrays")
+            return arrays
+        except Exception as e:
+            logger.error(f"Error loading catalog snapshot {self.version}: {e}")
+            return None
+
+    def load_delta(self) -> Optional[Dict]:
+        """
+        Return the delta this version was derived by ({base_version, added, removed_ids}), if any
+        """
+        try:
+            with open(os.path.join(self.path, self.DELTA_FILE), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error loading catalog delta {self.version}: {e}")
+            return None
+
+    def save(self, arrays: Dict[str, np.ndarray], delta: Dict = None) -> bool:
+        """
+        Publish the arrays, and the delta the version was derived by if given;
+        the snapshot directory appears atomically once complete
+        """
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(tmp_path, exist_ok=True)
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+            if delta is not None:
+                with open(os.path.join(tmp_path, self.DELTA_FILE), 'w') as f:
+                    json.dump(delta, f, default=str)
+            os.rename(tmp_path, self.path)
+            logger.info(f"Published catalog snapshot {self.version} to {self.directory}")
+            self.prune()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving catalog snapshot {self.version}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+
+    def publish(self):
+        """
+        Record this version as the one every worker should serve
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, self.CURRENT_FILE)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(self.version)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not publish catalog version {self.version}: {e}")
+
+    @classmethod
+    def published(cls, directory: str = CATALOG_SNAPSHOT_DIR) -> Optional[str]:
+        """
+        Return the version recorded by publish(), or None if there is none
+        """
+        try:
+            with open(os.path.join(directory, cls.CURRENT_FILE), 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def prune(self, keep: int = CATALOG_SNAPSHOTS_KEPT):
+        """
+        Remove all but the newest snapshots; processes still attached keep their mapped pages
+        """
+        try:
+            versions = [entry for entry in os.scandir(self.directory)
+                        if entry.is_dir() and not entry.name.endswith('.tmp') and entry.name != self.version]
+            versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+            for entry in versions[max(0, keep - 1):]:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                lock_path = os.path.join(self.directory, f"{entry.name}.lock")
+                if os.path.exists(lock_path):
+                    os.remove(lock_path)
+                logger.info(f"Removed old catalog snapshot {entry.name}")
+        except OSError as e:
+            logger.warning(f"Could not prune old catalog snapshots: {e}")
+
+# Rows fetched per round trip when streaming the catalog
+CATALOG_FETCH_SIZE = 2000
+
+# One row per laptop model: its first configuration joined with every related table.
+# Storage entries are aggregated per configuration so each model stays one row.
+# {models} selects the models: the first N for a full load, or a list of model ids.
+CATALOG_QUERY_TEMPLATE = """
+    SELECT m.model_id, m.brand, m.model_name, m.image_url,
+           c.config_id, c.price, c.weight, c.battery_life, c.memory_installed, c.operating_system,
+           p.brand, p.model,
+           g.brand, g.model,
+           st.storage,
+           s.size, s.resolution, s.touchscreen, s.refresh_rate,
+           f.backlit_keyboard, f.numeric_keyboard, f.bluetooth,
+           pt.ethernet, pt.hdmi, pt.usb_type_c, pt.thunderbolt, pt.display_port
+    FROM (
+        SELECT model_id, brand, model_name, image_url
+        FROM laptop_models
+        {models}
+    ) m
+    JOIN LATERAL (
+        SELECT config_id, price, weight, battery_life, memory_installed, operating_system,
+               processor, graphics_card
+        FROM laptop_configurations
+        WHERE model_id = m.model_id
+        ORDER BY config_id
+        LIMIT 1
+    ) c ON TRUE
+    LEFT JOIN processors p ON p.model = c.processor
+    LEFT JOIN graphics_cards g ON g.model = c.graphics_card
+    LEFT JOIN LATERAL (
+        SELECT string_agg(capacity || ' ' || storage_type, ', ' ORDER BY storage_type) AS storage
+        FROM configuration_storage
+        WHERE config_id = c.config_id
+    ) st ON TRUE
+    LEFT JOIN screens s ON s.config_id = c.config_id
+    LEFT JOIN features f ON f.config_id = c.config_id
+    LEFT JOIN ports pt ON pt.config_id = c.config_id
+    ORDER BY m.model_id
+"""
+CATALOG_QUERY = CATALOG_QUERY_TEMPLATE.format(models="ORDER BY model_id LIMIT %s")
+CATALOG_MODELS_QUERY = CATALOG_QUERY_TEMPLATE.format(models="WHERE model_id = ANY(%s)")
+
+def laptop_from_catalog_row(row: tuple) -> Dict:
+    """
+    Build a laptop entry in the JSON 'tables' format from one CATALOG_QUERY row
+    """
+    (model_id, brand, model_name, image_url,
+     config_id, price, weight, battery_life, memory, operating_system,
+     processor_brand, processor_model,
+     graphics_brand, graphics_model,
+     storage,
+     screen_size, resolution, touchscreen, refresh_rate,
+     backlit_keyboard, numeric_keyboard, bluetooth,
+     ethernet, hdmi, usb_type_c, thunderbolt, display_port) = row
+
+    laptop = {'id': f"{model_id}:{config_id}", 'tables': []}
+
+    # Add product details
+    product_details = {
+        'Brand': brand,
+        'Name': model_name,
+        'image': image_url
+    }
+    if weight:
+        product_details['Weight'] = weight
+    laptop['tables'].append({'title': 'Product Details', 'data': product_details})
+
+    # Add misc info
+    misc_data = {}
+    if memory:
+        misc_data['Memory Installed'] = memory
+    if operating_system:
+        misc_data['Operating System'] = operating_system
+    if battery_life:
+        misc_data['Battery Life'] = battery_life
+    if misc_data:
+        laptop['tables'].append({'title': 'Misc', 'data': misc_data})
+
+    # Add price info
+    if price:
+        laptop['tables'].append({
+            'title': 'Prices',
+            'data': [{'shop_url': '', 'price': f"£{price}"}]  # No shop URL in this schema
+        })
+
+    # Add processor, graphics card and storage to the specs table
+    specs_data = {}
+    if processor_model is not None:
+        specs_data['Processor Brand'] = processor_brand
+        specs_data['Processor Name'] = processor_model
+    if graphics_model is not None:
+        specs_data['Graphics Card'] = f"{graphics_brand} {graphics_model}"
+    if storage:
+        specs_data['Storage'] = storage
+    if specs_data:
+        laptop['tables'].append({'title': 'Specs', 'data': specs_data})
+
+    # Add screen info
+    screen_data = {}
+    if screen_size:
+        screen_data['Size'] = screen_size
+    if resolution:
+        screen_data['Resolution'] = resolution
+    if touchscreen is not None:
+        screen_data['Touchscreen'] = bool(touchscreen)
+    if refresh_rate:
+        screen_data['Refresh Rate'] = refresh_rate
+    if screen_data:
+        laptop['tables'].append({'title': 'Screen', 'data': screen_data})
+
+    # Add features
+    feature_data = {}
+    if backlit_keyboard is not None:
+        feature_data['Backlit Keyboard'] = bool(backlit_keyboard)
+    if numeric_keyboard is not None:
+        feature_data['Numeric Keyboard'] = bool(numeric_keyboard)
+    if bluetooth is not None:
+        feature_data['Bluetooth'] = bool(bluetooth)
+    if feature_data:
+        laptop['tables'].append({'title': 'Features', 'data': feature_data})
+
+    # Add ports
+    port_data = {}
+    if ethernet is not None:
+        port_data['Ethernet (RJ45)'] = bool(ethernet)
+    if hdmi is not None:
+        port_data['HDMI'] = bool(hdmi)
+    if usb_type_c is not None:
+        port_data['USB Type-C'] = bool(usb_type_c)
+    if thunderbolt is not None:
+        port_data['Thunderbolt'] = bool(thunderbolt)
+    if display_port is not None:
+        port_data['Display Port'] = bool(display_port)
+    if port_data:
+        laptop['tables'].append({'title': 'Ports', 'data': port_data})
+
+    return laptop
+
+def query_catalog(query: str, params: tuple) -> Optional[List[Dict]]:
+    """
+    Run a catalog query using the connection pool or a direct connection
+
+    Returns:
+        List of laptops in the same format as the JSON, or None if the database could not be queried
+    """
+    conn = None
+    cur = None
+
+    # Try to use connection pool first if available
+    if HAS_DB_MODULE:
+        try:
+            logger.info("Querying laptop catalog using connection pool")
+            conn, cur = get_db_connection()
+            if not conn or not cur:
+                raise Exception("Failed to get database connection from pool")
+
+            logger.info("Connection successful")
+        except Exception as e:
+            logger.error(f"Connection pool error: {e}")
+            conn, cur = None, None
+
+    # Try direct connection if pool connection failed
+    if not conn or not cur:
+        try:
+            logger.info("Connection pool failed or not available. Trying direct connection")
+            conn, cur = direct_db_connection()
+            if not conn or not cur:
+                raise Exception("Failed to establish direct database connection")
+        except Exception as e:
+            logger.error(f"Direct connection error: {e}")
+            return None  # All connection attempts failed
+
+    try:
+        # Run the catalog query set-based in one go, streamed through a server-side cursor
+        logger.info("Querying laptop catalog")
+        catalog_cur = conn.cursor(name="laptop_catalog_load")
+        catalog_cur.itersize = CATALOG_FETCH_SIZE
+        try:
+            catalog_cur.execute(query, params)
+            return [laptop_from_catalog_row(row) for row in catalog_cur]
+        finally:
+            catalog_cur.close()
+            # End the read transaction the named cursor needed
+            conn.rollback()
+
+    except Exception as e:
+        logger.error(f"Error loading data from database: {str(e)}")
+        return None
+    finally:
+        # Always close/release the connection properly
+        if HAS_DB_MODULE and conn and cur:
+            try:
+                release_db_connection(conn, cur)
+                logger.info("Released database connection back to pool")
+            except Exception as e:
+                logger.error(f"Error releasing database connection: {str(e)}")
+        elif conn:
+            if cur:
+                cur.close()
+            conn.close()
+            logger.info("Closed direct database connection")
+
+def load_laptops_from_database(limit=10000) -> List[Dict]:
+    """
+    Load laptop data from PostgreSQL database using the connection pool or direct connection
+
+    Args:
+        limit: Maximum number of laptops to load (default: 10000)
+
+    Returns:
+        List of dictionaries containing laptop information in the same format as the JSON
+    """
+    logger.info(f"Loading up to {limit} laptops from database")
+    laptops = query_catalog(CATALOG_QUERY, (limit,))
+    if not laptops:
+        logger.error("No laptop models found in database")
+        return []
+
+    logger.info(f"Successfully loaded {len(laptops)} laptops from database")
+    return laptops
+
+def load_models_from_database(model_ids: List[int]) -> Optional[List[Dict]]:
+    """
+    Load the catalog entries of some laptop models, one per model that still has a configuration
+
+    Returns:
+        List of laptops, or None if the database could not be queried
+    """
+    logger.info(f"Loading {len(model_ids)} laptop models from database")
+    return query_catalog(CATALOG_MODELS_QUERY, (list(model_ids),))
+
+# Connectivity probe and row counts in a single round trip
+DATABASE_STATUS_QUERY = """
+    SELECT (SELECT COUNT(*) FROM laptop_models), (SELECT COUNT(*) FROM laptop_configurations)
+"""
+# Seconds a status check is reused, so frequent probes cost at most one query per interval
+DATABASE_STATUS_TTL = float(os.getenv("DATABASE_STATUS_TTL", "5"))
+_database_status = {"checked_at": 0.0, "result": None}
+_database_status_lock = threading.Lock()
+
+def check_database_status() -> Dict:
+    """
+    Check the connection pool with one cheap query, reusing the result for DATABASE_STATUS_TTL seconds
+
+    Returns:
+        Dictionary with 'connected', and 'laptop_models', 'laptop_configurations' and
+        'latency_ms' when the query succeeded, or 'error' when it did not
+    """
+    with _database_status_lock:
+        if _database_status["result"] is not None and time.time() - _database_status["checked_at"] < DATABASE_STATUS_TTL:
+            return dict(_database_status["result"])
+        
+        if not HAS_DB_MODULE:
+            result = {"connected": False, "error": "Database connection pool is not available"}
+        else:
+            conn, cur = None, None
+            try:
+                started = time.perf_counter()
+                conn, cur = get_db_connection()
+                if not conn or not cur:
+                    raise Exception("Failed to get database connection from pool")
+                cur.execute(DATABASE_STATUS_QUERY)
+                model_count, config_count = cur.fetchone()
+                conn.rollback()
+                result = {
+                    "connected": True,
+                    "laptop_models": model_count,
+                    "laptop_configurations": config_count,
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 2)
+                }
+            except Exception as e:
+                logger.error(f"Database status check failed: {e}")
+                result = {"connected": False, "error": str(e)}
+            finally:
+                if conn and cur:
+                    release_db_connection(conn, cur)
+        
+        _database_status.update(checked_at=time.time(), result=result)
+        return dict(result)
+
+class LaptopCatalog:
+    """
+    Read-only laptop catalog shared by every chatbot session in the process
+
+    Holds the sentence transformer, the laptop data and the use case embeddings,
+    which are expensive to build and never change during a conversation.
+    Sessions keep only their own conversation state on top of it.
+    """
+    def __init__(self, laptop_data: List[Dict] = None, limit: int = 10000, encoder: BatchEncoder = None):
+        """
+        Load the sentence transformer model and the laptop data
+
+        Args:
+            laptop_data: List of dictionaries containing laptop information (optional)
+            limit: Maximum number of laptops to load from the database (default: 10000)
+            encoder: Encoder of an earlier catalog to reuse instead of loading the model again (optional)
+        """
+        self.model_name = MODEL_NAME
+        if encoder is not None:
+            self.encoder = encoder
+            self.model = encoder.model
+        else:
+            self.model = SentenceTransformer(self.model_name)
+            self.encoder = BatchEncoder(self.model)
+        
+        # Try to load laptops either from provided data, database, or JSON file
+        if laptop_data:
+            self.laptops = laptop_data
+            self.data_source = "provided"
+            logger.info(f"Using provided laptop data with {len(self.laptops)} records")
+        else:
+            # First try database connection
+            self.laptops = load_laptops_from_database(limit)
+            self.data_source = "database"
+            
+            # If database loading failed, try loading from JSON
+            if not self.laptops:
+                logger.warning("Database loading failed. Attempting to load from JSON file")
+                json_data = find_and_load_laptops_json()
+                if json_data:
+                    self.laptops = json_data
+                    self.data_source = "json_fallback"
+                    logger.info(f"Successfully loaded {len(self.laptops)} laptops from JSON file")
+                else:
+                    logger.error("Failed to load laptop data from any source")
+                    self.laptops = []
+                    self.data_source = "none"
+        
+        self.loaded_at = time.time()
+        self.version = catalog_version(self.laptops, self.model_name)
+        logger.info(f"Catalog version {self.version} with {len(self.laptops)} laptops")
+        
+        # Create embeddings for predefined features and use cases
+        self.feature_embeddings = self._create_feature_embeddings()
+        self.use_case_names = list(self.feature_embeddings)
+        self.use_case_matrix = np.stack([self.feature_embeddings[name] for name in self.use_case_names])
+        
+        self._row_by_id = {id(laptop): row for row, laptop in enumerate(self.laptops)}
+        self.records = [LaptopRecord(laptop) for laptop in self.laptops]
+        self.descriptions = [record.description for record in self.records]
+        
+        # Recommendations carry laptop ids, which map straight back to catalog rows.
+        # Identical JSON entries would hash alike, so repeats get the row appended.
+        self._row_by_laptop_id = {}
+        for row, record in enumerate(self.records):
+            if record.laptop_id in self._row_by_laptop_id:
+                record.laptop_id = f"{record.laptop_id}-{row}"
+            self._row_by_laptop_id[record.laptop_id] = row
+        
+        # Laptops removed by a later delta are tombstoned here instead of renumbering rows
+        self.live = np.ones(len(self.laptops), dtype=bool)
+        self.live_rows = np.arange(len(self.laptops))
+        self.row_compatible_versions = frozenset()
+        
+        self._index_names()
+        self.facets = build_laptop_facets(self.laptops)
+        
+        # Columns, embeddings and rankings are built once per catalog version and
+        # shared with the other worker processes through a memory mapped snapshot
+        snapshot = CatalogSnapshot(self.version)
+        with snapshot.lock():
+            arrays = snapshot.load()
+            if arrays is None or not self._attach_arrays(arrays):
+                arrays = self._build_arrays()
+                if snapshot.save(arrays):
+                    arrays = snapshot.load() or arrays
+                self._attach_arrays(arrays)
+
+    def _index_names(self):
+        # Detail lookups by brand and name; the first live laptop wins if several share a name
+        self._row_by_name = {}
+        for row in self.live_rows:
+            record = self.records[row]
+            self._row_by_name.setdefault(self._name_key(record.brand, record.name), int(row))
+
+    @property
+    def live_count(self) -> int:
+        """Number of laptops that have not been removed"""
+        return len(self.live_rows)
+
+    @property
+    def tombstone_ratio(self) -> float:
+        """Share of rows held by removed laptops"""
+        return 1 - self.live_count / len(self.laptops) if self.laptops else 0.0
+
+    def laptop_ids(self) -> List[str]:
+        """Ids of every laptop that has not been removed"""
+        return list(self._row_by_laptop_id)
+
+    def with_changes(self, added: List[Dict], removed_ids: List[str]) -> 'LaptopCatalog':
+        """
+        Derive the next catalog version from this one without rebuilding it
+
+        Removed laptops are tombstoned, so every row keeps its number and saved
+        conversations stay valid, and added laptops are appended. Only the added
+        descriptions are encoded; columns, bitmaps, rankings, facets and lookups
+        are extended from this catalog's rather than rebuilt. The new arrays are
+        published as a snapshot together with the delta, so another worker
+        deriving the same version from the same base attaches to them.
+
+        Args:
+            added: Laptops to append, in the same format as the catalog's laptops
+            removed_ids: Ids of laptops to remove; unknown ids are ignored
+        """
+        removed_rows = sorted({self._row_by_laptop_id[laptop_id] for laptop_id in removed_ids
+                               if laptop_id in self._row_by_laptop_id})
+        removed_ids = [self.records[row].laptop_id for row in removed_rows]
+        
+        catalog = LaptopCatalog.__new__(LaptopCatalog)
+        catalog.model_name = self.model_name
+        catalog.model = self.model
+        catalog.encoder = self.encoder
+        catalog.data_source = self.data_source
+        catalog.feature_embeddings = self.feature_embeddings
+        catalog.use_case_names = self.use_case_names
+        catalog.use_case_matrix = self.use_case_matrix
+        
+        base_count = len(self.laptops)
+        catalog.laptops = self.laptops + list(added)
+        catalog.loaded_at = time.time()
+        catalog.version = catalog_delta_version(self.version, added, removed_ids)
+        catalog.row_compatible_versions = self.row_compatible_versions | {self.version}
+        logger.info(f"Catalog version {catalog.version} from {self.version}: "
+                    f"{len(added)} laptops added, {len(removed_rows)} removed")
+        
+        new_records = [LaptopRecord(laptop) for laptop in added]
+        catalog.records = self.records + new_records
+        catalog.descriptions = self.descriptions + [record.description for record in new_records]
+        
+        catalog.live = np.concatenate([self.live, np.ones(len(added), dtype=bool)])
+        catalog.live[removed_rows] = False
+        catalog.live_rows = np.flatnonzero(catalog.live)
+        new_rows = np.arange(base_count, len(catalog.laptops))
+        
+        # Patch the lookups: drop removed laptops, then add the new ones
+        catalog._row_by_id = dict(self._row_by_id)
+        catalog._row_by_laptop_id = dict(self._row_by_laptop_id)
+        for row in removed_rows:
+            catalog._row_by_id.pop(id(self.laptops[row]), None)
+            catalog._row_by_laptop_id.pop(self.records[row].laptop_id, None)
+        for row, record in zip(new_rows.tolist(), new_records):
+            catalog._row_by_id[id(catalog.laptops[row])] = row
+            if record.laptop_id in catalog._row_by_laptop_id:
+                record.laptop_id = f"{record.laptop_id}-{row}"
+            catalog._row_by_laptop_id[record.laptop_id] = row
+        catalog._index_names()
+        catalog.facets = patch_laptop_facets(self.facets, added, [self.laptops[row] for row in removed_rows])
+        
+        # The arrays of the new version are derived once and published with the delta,
+        # so other workers deriving the same version attach to them instead of encoding again
+        snapshot = CatalogSnapshot(catalog.version)
+        with snapshot.lock():
+            arrays = snapshot.load()
+            if arrays is None or not catalog._attach_arrays(arrays):
+                arrays = self._changed_arrays(catalog, added, new_rows)
+                delta = {'base_version': self.version, 'added': list(added), 'removed_ids': removed_ids}
+                if snapshot.save(arrays, delta):
+                    arrays = snapshot.load() or arrays
+                catalog._attach_arrays(arrays)
+        return catalog
+
+    def _changed_arrays(self, catalog: 'LaptopCatalog', added: List[Dict], new_rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Build the arrays of a catalog derived from this one by with_changes() by extending this catalog's
+        """
+        # Tombstoned rows are cleared from every bitmap so feature filters never return them
+        columns = CatalogColumns.concatenate(self.columns, CatalogColumns(added))
+        arrays = columns.to_arrays()
+        bitmaps = BitmapIndex({name: column & catalog.live for name, column in columns.flags.items()}, columns.count)
+        arrays.update({f"bitmaps.{name}": bitmap for name, bitmap in bitmaps.bitmaps.items()})
+        
+        # Encode only the added descriptions, and keep the embedding cache in step for restarts.
+        # The cache holds just the live laptops, so tombstoned rows are not carried along
+        embeddings = self.embeddings
+        if added:
+            new_embeddings = self.model.encode(catalog.descriptions[len(self.laptops):], batch_size=64,
+                                               convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+            embeddings = np.concatenate([self.embeddings, np.asarray(new_embeddings, dtype=np.float32)])
+            EmbeddingCache(self.model_name).store([catalog.descriptions[row] for row in catalog.live_rows],
+                                                  embeddings[catalog.live_rows])
+        arrays['embeddings'] = embeddings
+        
+        # Drop removed rows from each use case ranking and merge the new rows into it by score
+        rankings, ranking_scores = [], []
+        for name in self.use_case_names:
+            ranking = self.use_case_rankings[name]
+            scores = self.use_case_ranking_scores[name]
+            keep = catalog.live[ranking]
+            ranking, scores = ranking[keep], scores[keep]
+            
+            new_scores = (embeddings[new_rows] @ self.feature_embeddings[name]).astype(np.float32)
+            order = np.argsort(-new_scores, kind='stable')
+            positions = np.searchsorted(-scores, -new_scores[order], side='right')
+            rankings.append(np.insert(ranking, positions, new_rows[order].astype(ranking.dtype)))
+            ranking_scores.append(np.insert(scores, positions, new_scores[order]))
+        arrays['use_case_names'] = np.array(self.use_case_names, dtype=str)
+        arrays['use_case_rankings'] = np.stack(rankings)
+        arrays['use_case_ranking_scores'] = np.stack(ranking_scores)
+        return arrays
+
+    def _build_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Build every immutable array of the catalog: columns, bitmaps, embeddings and rankings
+        """
+        # Normalize the nested tables once into typed columns for filtering
+        columns = CatalogColumns(self.laptops)
+        arrays = columns.to_arrays()
+        arrays.update({f"bitmaps.{name}": bitmap
+                       for name, bitmap in BitmapIndex(columns.flags, columns.count).bitmaps.items()})
+        
+        # Embed every laptop description once so requests only index rows
+        self.embeddings = self._create_laptop_embeddings(self.descriptions)
+        arrays['embeddings'] = self.embeddings
+        
+        # The use case queries are fixed, so rank the whole catalog for each of them once
+        rankings, ranking_scores = self._create_use_case_rankings()
+        arrays['use_case_names'] = np.array(self.use_case_names, dtype=str)
+        arrays['use_case_rankings'] = np.stack([rankings[name] for name in self.use_case_names])
+        arrays['use_case_ranking_scores'] = np.stack([ranking_scores[name] for name in self.use_case_names])
+        return arrays
+
+    def _attach_arrays(self, arrays: Dict[str, np.ndarray]) -> bool:
+        """
+        Point the catalog at a set of built or snapshot arrays
+        Returns False if the arrays do not fit this catalog, so they have to be rebuilt
+        """
+        try:
+            if (arrays['use_case_names'].tolist() != self.use_case_names
+                    or len(arrays['embeddings']) != len(self.laptops)):
+                logger.warning(f"Catalog snapshot {self.version} does not match this catalog")
+                return False
+            self.columns = CatalogColumns.from_arrays(arrays)
+            self.bitmaps = BitmapIndex.from_bitmaps(
+                {name[len('bitmaps.'):]: bitmap for name, bitmap in arrays.items() if name.startswith('bitmaps.')},
+                self.columns.count)
+            self.embeddings = arrays['embeddings']
+            self.use_case_rankings = {name: arrays['use_case_rankings'][i] for i, name in enumerate(self.use_case_names)}
+            self.use_case_ranking_scores = {name: arrays['use_case_ranking_scores'][i]
+                                            for i, name in enumerate(self.use_case_names)}
+            return True
+        except KeyError as e:
+            logger.warning(f"Catalog snapshot {self.version} is missing {e}")
+            return False
+
+    def _create_feature_embeddings(self) -> Dict[str, np.ndarray]:
+        """
+        Create embeddings for predefined features and use cases with enhanced descriptions
+        """
+        features = {
+            "gaming": """high-performance gaming laptop with dedicated graphics card for AAA games, 
+                     high refresh rate display, powerful processor, gaming aesthetics, RGB lighting,
+                     excellent cooling, high-end GPU for modern games, gaming laptop, NVIDIA RTX,
+                     AMD Radeon, fast storage for game loading, 16GB+ RAM""",
+            
+            "business": """professional laptop with good battery life, 
+                       portable design, windows professional, business laptop, work laptop,
+                       productivity features, professional appearance, office work, MS Office,
+                       video conferencing, business travel, reliable connectivity""",
+            
+            "student": """affordable laptop for students with good battery life, 
+                      portable, sufficient storage for documents, budget-friendly,
+                      college laptop, university laptop, school laptop, student laptop,
+                      education laptop, studying, homework, assignments, note-taking""",
+            
+            "design": """laptop for designers with high-resolution display, color accuracy, 
+                     powerful graphics capabilities, creative work, graphic design,
+                     photo editing, video editing, art creation, design laptop, creative laptop,
+                     Adobe Creative Suite, color calibration, pen support""",
+            
+            "programming": """laptop for coding with good processor, sufficient RAM, 
+                         comfortable keyboard and display, development laptop, coding laptop,
+                         software engineering, programming laptop, computer science,
+                         software development, web development, app development, multitasking""",
+            
+            "portable": """lightweight laptop with long battery life, 
+                       compact size, good build quality, travel laptop, thin and light,
+                       ultraportable, mobility, on-the-go, commuting, travel, under 1.5kg weight""",
+            
+            "entertainment": """laptop for media consumption with high-quality display, 
+                           good speakers, immersive experience, movie watching, music, streaming,
+                           content consumption, entertainment laptop, multimedia laptop, HDR support""",
+            
+            "content_creation": """powerful laptop for content creators, video editing, 
+                             rendering, 3D modeling, animation, high-performance processor,
+                             professional graphics, large display, content creation laptop, YouTube""",
+            
+            "budget": """affordable laptop with good value, basic performance,
+                    economical, budget-friendly, cost-effective, entry-level laptop,
+                    inexpensive laptop, low-cost computing, basic tasks, under £700""",
+            
+            "premium": """high-end laptop with premium build quality, top specifications,
+                     luxury design, excellent display, premium materials, flagship laptop,
+                     premium laptop, high-performance, top-tier device, premium price tag""",
+                     
+            "workstation": """professional workstation laptop with powerful CPU and GPU,
+                         CAD software, engineering applications, scientific computing,
+                         virtualization, data analysis, simulation, reliable performance""",
+                         
+            "ultrabook": """ultra-thin laptop with premium design, lightweight portability,
+                      fast SSD storage, modern connectivity, long battery life,
+                      high-resolution display, metal chassis, elegant appearance"""
+        }
+        
+        # Normalized so a dot product with another normalized vector is the cosine similarity
+        return {key: self.model.encode(desc, normalize_embeddings=True).astype(np.float32)
+                for key, desc in features.items()}
+
+    def _create_laptop_embeddings(self, descriptions: List[str]) -> np.ndarray:
+        """
+        Encode laptop descriptions into a single normalized float32 matrix
+        """
+        if not descriptions:
+            dimension = len(next(iter(self.feature_embeddings.values())))
+            return np.zeros((0, dimension), dtype=np.float32)
+        
+        return EmbeddingCache(self.model_name).encode(self.model, descriptions)
+
+    def performance_level(self, laptop: Dict) -> Optional[str]:
+        """
+        Return 'high', 'medium' or 'basic' for a laptop, or None if its specs are unknown
+        """
+        row = self.row_of(laptop)
+        if row is not None:
+            tier = int(self.columns.performance_tier[row])
+        else:
+            tier = int(CatalogColumns([laptop]).performance_tier[0])
+        return PERFORMANCE_LEVEL_NAMES.get(tier)
+
+    def _create_use_case_rankings(self) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """
+        Order every catalog row by similarity to each use case, best first
+        Returns ({use_case: rows}, {use_case: scores aligned with rows})
+        """
+        rows, scores = top_k_similar(self.embeddings, self.use_case_matrix, len(self.laptops))
+        rankings = {name: rows[i].astype(np.int32) for i, name in enumerate(self.use_case_names)}
+        ranking_scores = {name: scores[i].astype(np.float32) for i, name in enumerate(self.use_case_names)}
+        return rankings, ranking_scores
+
+    def top_rows_for_use_case(self, use_case: str, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the k candidate rows most similar to a use case, with their scores, best first
+        """
+        if use_case not in self.use_case_rankings:
+            use_case = 'student'
+        
+        # A sparse candidate set would make the ranking walk long; score it directly instead
+        if len(rows) * RANKING_WALK_MIN_DENSITY < len(self.laptops):
+            return top_k_similar(self.embeddings, self.feature_embeddings[use_case], k, candidates=rows)
+        
+        candidate_mask = np.zeros(len(self.laptops), dtype=bool)
+        candidate_mask[rows] = True
+        ranking = self.use_case_rankings[use_case]
+        positions = first_k_in_ranking(ranking, candidate_mask, k)
+        return ranking[positions], self.use_case_ranking_scores[use_case][positions]
+
+    def record_of(self, laptop: Dict) -> Optional[LaptopRecord]:
+        """
+        Return the precomputed record of a laptop, or None if it is not part of this catalog
+        """
+        row = self._row_by_id.get(id(laptop))
+        return self.records[row] if row is not None else None
+
+    def row_of(self, laptop: Dict) -> Optional[int]:
+        """
+        Return the catalog row of a laptop dictionary, or None if it is not part of this catalog
+        """
+        return self._row_by_id.get(id(laptop))
+
+    def row_for_id(self, laptop_id: str) -> Optional[int]:
+        """
+        Return the catalog row of a laptop id, or None if no laptop has it
+        """
+        return self._row_by_laptop_id.get(laptop_id)
+
+    @staticmethod
+    def _name_key(brand: str, name: str) -> Tuple[str, str]:
+        return (brand or "").strip().lower(), (name or "").strip().lower()
+
+    def row_for_name(self, brand: str, name: str) -> Optional[int]:
+        """
+        Return the catalog row of a laptop by brand and model name, ignoring case
+        """
+        return self._row_by_name.get(self._name_key(brand, name))
+
+    def by_id(self, laptop_id: str) -> Optional[Dict]:
+        """
+        Return the laptop with the given id, or None if no laptop has it
+        """
+        row = self._row_by_laptop_id.get(laptop_id)
+        return self.laptops[row] if row is not None else None
+
+# Catalog versions kept for sessions pinned to them, including the current one
+CATALOG_VERSIONS_KEPT = int(os.getenv("CATALOG_VERSIONS_KEPT", "2"))
+
+# Share of tombstoned rows beyond which a delta rebuilds the catalog instead
+CATALOG_TOMBSTONE_LIMIT = float(os.getenv("CATALOG_TOMBSTONE_LIMIT", "0.25"))
+
+# Seconds between checks for a catalog version published by another worker; 0 disables them
+CATALOG_SYNC_SECONDS = float(os.getenv("CATALOG_SYNC_SECONDS", "10"))
+
+class CatalogManager:
+    """
+    Owns the catalog served to new sessions and rebuilds it without downtime
+
+    A reload builds a complete new catalog (columns, indexes, embeddings and
+    facets) next to the current one and then swaps a single reference, so
+    requests already running keep the catalog object they started with.
+    Recent versions stay available for sessions pinned to them. Each worker
+    process has its own manager; rebuilt versions are shared through snapshots.
+    The worker that builds a version publishes it, and the others follow with
+    sync(): deltas are derived again from the snapshot, attaching to its
+    arrays, and other versions are rebuilt from the data source.
+    """
+    def __init__(self, limit: int = 10000, versions_kept: int = CATALOG_VERSIONS_KEPT):
+        self.limit = limit
+        self.versions_kept = max(1, versions_kept)
+        self.reloads = 0
+        self.last_reload_at = None
+        self.last_reload_error = None
+        self._current = None
+        self._synced_version = None  # Last published version sync() acted on
+        self._versions = OrderedDict()  # version -> catalog, oldest first
+        self._lock = threading.Lock()  # Guards the first build and swaps
+        self._reload_lock = threading.Lock()  # One rebuild at a time
+        self._schedule_stop = threading.Event()
+        self._schedule_thread = None
+
+    def current(self) -> LaptopCatalog:
+        """
+        Return the catalog new sessions should use, building it on first use
+        """
+        catalog = self._current
+        if catalog is None:
+            with self._lock:
+                # Another thread may have built it while we were waiting
+                if self._current is None:
+                    logger.info("Building shared laptop catalog")
+                    self._install(LaptopCatalog(limit=self.limit))
+                    logger.info(f"Shared laptop catalog ready with {len(self._current.laptops)} laptops")
+                    if self._current.laptops:
+                        CatalogSnapshot(self._current.version).publish()
+                catalog = self._current
+        return catalog
+
+    def peek(self) -> Optional[LaptopCatalog]:
+        """
+        Return the current catalog if it has been built, without building it
+        """
+        return self._current
+
+    def catalog_for(self, version: Optional[str]) -> Optional[LaptopCatalog]:
+        """
+        Return the catalog of a pinned version while it is kept, otherwise the current one
+        A session saved by another worker may be pinned to a delta that worker just published;
+        that is derived here from its snapshot. Never builds a catalog; None if none has been built yet.
+        """
+        if version:
+            catalog = self._versions.get(version)
+            if catalog is None and self._current is not None and self.sync(rebuild=False):
+                catalog = self._versions.get(version)
+            if catalog is not None:
+                return catalog
+        return self._current
+
+    def _install(self, catalog: LaptopCatalog):
+        # Caller holds the lock; the assignment is the swap
+        self._versions.pop(catalog.version, None)
+        self._versions[catalog.version] = catalog
+        self._current = catalog
+        while len(self._versions) > self.versions_kept:
+            old_version, _ = self._versions.popitem(last=False)
+            logger.info(f"Released catalog version {old_version}")
+
+    def reload(self, laptop_data: List[Dict] = None) -> bool:
+        """
+        Build a new catalog from the data source and swap it in if its version changed
+
+        Args:
+            laptop_data: Laptop data to build from instead of the database (optional)
+
+        Returns:
+            True if a new version is now current
+        """
+        with self._reload_lock:
+            try:
+                return self._rebuild(laptop_data)
+            except Exception as e:
+                self.last_reload_error = str(e)
+                logger.error(f"Catalog reload failed: {e}")
+                return False
+
+    def _rebuild(self, laptop_data: List[Dict] = None) -> bool:
+        # Caller holds the reload lock
+        previous = self._current
+        if previous is None:
+            # Nothing is served yet (the startup build failed), so this is the first build
+            self.current()
+            self.last_reload_at = time.time()
+            self.last_reload_error = None
+            return True
+        logger.info(f"Reloading catalog, currently version {previous.version}")
+        catalog = LaptopCatalog(laptop_data, limit=self.limit, encoder=previous.encoder)
+        self.last_reload_at = time.time()
+        self.last_reload_error = None
+        
+        if catalog.version == previous.version:
+            logger.info(f"Catalog unchanged at version {catalog.version}")
+            return False
+        if not catalog.laptops:
+            self.last_reload_error = "Reload produced an empty catalog"
+            logger.warning("Reload produced an empty catalog, keeping the current one")
+            return False
+        if laptop_data is None and previous.data_source == "database" and catalog.data_source != "database":
+            # The database query failed and LaptopCatalog fell back to the JSON file, whose
+            # laptops have different ids; keep serving the database catalog instead
+            self.last_reload_error = f"Database unavailable, reload fell back to {catalog.data_source}"
+            logger.warning(f"Reload fell back to {catalog.data_source}, keeping database catalog {previous.version}")
+            return False
+        return self._swap(catalog)
+
+    def _swap(self, catalog: LaptopCatalog, publish: bool = True) -> bool:
+        with self._lock:
+            self._install(catalog)
+        self.reloads += 1
+        logger.info(f"Swapped in catalog version {catalog.version} with {catalog.live_count} laptops")
+        if publish:
+            CatalogSnapshot(catalog.version).publish()
+        return True
+
+    def sync(self, rebuild: bool = True) -> bool:
+        """
+        Move to the catalog version another worker published, if this worker does not serve it yet
+
+        Args:
+            rebuild: Rebuild from the data source if the version cannot be derived from a
+                     published delta; without it only the cheap derivation is tried
+
+        Returns:
+            True if a new version is now current
+        """
+        published = CatalogSnapshot.published()
+        if (published is None or self._current is None or published in self._versions
+                or published == self._synced_version):
+            return False
+        
+        # A reload in progress here publishes its own version when it finishes
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            catalog = self._replay(published)
+            if catalog is not None:
+                self._synced_version = published
+                logger.info(f"Following catalog version {published} published by another worker")
+                return self._swap(catalog, publish=False)
+            if not rebuild:
+                return False
+            
+            # Not a delta of a version this worker has, so build it the way the publisher did
+            self._synced_version = published
+            logger.info(f"Rebuilding the catalog to follow version {published} published by another worker")
+            return self._rebuild()
+        except Exception as e:
+            self.last_reload_error = str(e)
+            logger.error(f"Following catalog version {published} failed: {e}")
+            return False
+        finally:
+            self._reload_lock.release()
+
+    def _replay(self, version: str) -> Optional[LaptopCatalog]:
+        # Caller holds the reload lock. Walk the published deltas back to a version this
+        # worker has, then derive each one in turn; None if the chain is broken.
+        deltas = []
+        while version not in self._versions:
+            delta = CatalogSnapshot(version).load_delta()
+            if delta is None or len(deltas) >= CATALOG_SNAPSHOTS_KEPT:
+                return None
+            deltas.append((version, delta))
+            version = delta['base_version']
+        
+        catalog = self._versions[version]
+        for version, delta in reversed(deltas):
+            catalog = catalog.with_changes(delta['added'], delta['removed_ids'])
+            if catalog.version != version:
+                logger.warning(f"Derived catalog version {catalog.version} instead of {version}")
+                return None
+        return catalog
+
+    def apply_model_changes(self, model_ids: List[int]) -> bool:
+        """
+        Bring the catalog up to date with changes the database made to some laptop models
+
+        Only those models are queried. Each one's catalog entry is kept, replaced
+        or removed through LaptopCatalog.with_changes(), so a nightly scrape costs
+        the changed laptops rather than the whole catalog. Catalogs that did not
+        come from the database, or that hold too many tombstones, are rebuilt.
+
+        Returns:
+            True if a new version is now current
+        """
+        with self._reload_lock:
+            try:
+                previous = self.current()
+                if previous.data_source != "database" or previous.tombstone_ratio > CATALOG_TOMBSTONE_LIMIT:
+                    logger.info(f"Rebuilding the {previous.data_source} catalog instead of applying model changes")
+                    return self._rebuild()
+                
+                changed = {str(model_id) for model_id in model_ids}
+                laptops = load_models_from_database(sorted(int(model_id) for model_id in changed))
+                if laptops is None:
+                    raise Exception("Could not load the changed models from the database")
+                
+                # Database laptops have one catalog entry per model, with id "model_id:config_id"
+                current_ids = {}
+                for laptop_id in previous.laptop_ids():
+                    model_id = laptop_id.split(':', 1)[0]
+                    if model_id in changed:
+                        current_ids[model_id] = laptop_id
+                loaded = {laptop['id'].split(':', 1)[0]: laptop for laptop in laptops}
+                
+                added, removed_ids = [], []
+                for model_id in sorted(changed):
+                    old_id, laptop = current_ids.get(model_id), loaded.get(model_id)
+                    if old_id is not None and laptop is not None and previous.by_id(old_id) == laptop:
+                        continue
+                    if old_id is not None:
+                        removed_ids.append(old_id)
+                    if laptop is not None:
+                        added.append(laptop)
+                
+                self.last_reload_at = time.time()
+                self.last_reload_error = None
+                if not added and not removed_ids:
+                    logger.info(f"Catalog unchanged at version {previous.version}")
+                    return False
+                return self._swap(previous.with_changes(added, removed_ids))
+            except Exception as e:
+                self.last_reload_error = str(e)
+                logger.error(f"Applying catalog changes failed: {e}")
+                return False
+
+    def apply_model_changes_in_background(self, model_ids: List[int]):
+        """
+        Apply model changes on a background thread, after any reload that is already running
+        """
+        threading.Thread(target=self.apply_model_changes, args=(list(model_ids),),
+                         name="catalog-changes", daemon=True).start()
+
+    def reload_in_background(self) -> bool:
+        """
+        Start a reload on a background thread
+
+        Returns:
+            False if a reload is already running
+        """
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, name="catalog-reload", daemon=True).start()
+        return True
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_lock.locked()
+
+    def start_schedule(self, interval_seconds: float, sync_seconds: float = CATALOG_SYNC_SECONDS):
+        """
+        Reload the catalog every interval_seconds, and follow versions other workers
+        publish every sync_seconds, until stop_schedule() is called
+        """
+        if (interval_seconds <= 0 and sync_seconds <= 0) or self._schedule_thread is not None:
+            return
+        
+        def run():
+            next_reload = time.monotonic() + interval_seconds if interval_seconds > 0 else None
+            while True:
+                # Wake for the next sync check or the next reload, whichever comes first
+                timeout = sync_seconds if sync_seconds > 0 else None
+                if next_reload is not None:
+                    remaining = max(0.0, next_reload - time.monotonic())
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                if self._schedule_stop.wait(timeout):
+                    break
+                if next_reload is not None and time.monotonic() >= next_reload:
+                    self.reload()
+                    next_reload = time.monotonic() + interval_seconds
+                elif sync_seconds > 0:
+                    self.sync()
+        
+        self._schedule_stop.clear()
+        self._schedule_thread = threading.Thread(target=run, name="catalog-schedule", daemon=True)
+        self._schedule_thread.start()
+        if interval_seconds > 0:
+            logger.info(f"Reloading the catalog every {interval_seconds:.0f} seconds")
+        if sync_seconds > 0:
+            logger.info(f"Checking for catalog versions published by other workers every {sync_seconds:.0f} seconds")
+
+    def stop_schedule(self):
+        self._schedule_stop.set()
+        self._schedule_thread = None
+
+    def stats(self) -> Dict:
+        """
+        Current version, the versions kept and the reload history
+        """
+        catalog = self._current
+        return {
+            "catalog_version": catalog.version if catalog is not None else None,
+            "published_version": CatalogSnapshot.published(),
+            "versions_kept": list(self._versions),
+            "reloads": self.reloads,
+            "reloading": self.reloading,
+            "last_reload_at": self.last_reload_at,
+            "last_reload_error": self.last_reload_error
+        }
+
+# The catalogs shared by all sessions in this process
+catalog_manager = CatalogManager()
+
+def get_shared_catalog() -> LaptopCatalog:
+    """
+    Return the process-wide laptop catalog, building it on first use
+    """
+    return catalog_manager.current()
+
+def peek_shared_catalog() -> Optional[LaptopCatalog]:
+    """
+    Return the shared catalog if it has been built, without building it
+    """
+    return catalog_manager.peek()
+
+# Steps of the guided conversation, in order
+CONVERSATION_STATES = ("initial", "purpose", "size", "budget", "brand", "features", "performance", "refine")
+
+class LaptopRecommendationBot:
+    # Expanded predefined questions for gathering user preferences
+    questions = {
+        "initial": "What kind of laptop are you looking for? Please describe your needs in detail.",
+        "purpose": "What will you primarily use the laptop for (e.g., gaming, work, studies, design)?",
+        "size": "Do you have a preferred screen size (e.g., 13\", 14\", 15.6\", 16\", 17\")? You can also say small, medium, or large.",
+        "budget": "What's your approximate budget range? This helps me find laptops that fit your price expectations.",
+        "brand": "Do you have any preferred brands? You can also tell me if there are brands you want to exclude.",
+        "features": "Are there any specific features you need (e.g., touchscreen, backlit keyboard, long battery life)?",
+        "performance": "How important is performance to you (e.g., high, medium, basic needs)?",
+        "ports": "Do you need any specific ports (e.g., HDMI, Ethernet, USB-C, Thunderbolt)?",
+        "storage": "What are your storage requirements (e.g., SSD size, additional storage)?",
+        "graphics": "Do you need a dedicated graphics card? If so, for what purposes?"
+    }
 
-    def _create_feature_embeddings(self) -> Dict[str, np.ndarray]:
+    def __init__(self, laptop_data: List[Dict] = None, catalog: LaptopCatalog = None):
         """
-        Create embeddings for predefined features and use cases with enhanced descriptions
+        Initialize the chatbot on top of a laptop catalog
+        
+        Args:
+            laptop_data: List of dictionaries containing laptop information (optional)
+            catalog: Catalog to use instead of the shared one (optional)
         """
-        features = {
-            "gaming": """high-performance gaming laptop with dedicated graphics card for AAA games, 
-                     high refresh rate display, powerful processor, gaming aesthetics, RGB lighting,
-                     excellent cooling, high-end GPU for modern games, gaming laptop, NVIDIA RTX,
-                     AMD Radeon, fast storage for game loading, 16GB+ RAM""",
-            
-            "business": """professional laptop with good battery life, 
-                       portable design, windows professional, business laptop, work laptop,
-                       productivity features, professional appearance, office work, MS Office,
-                       video conferencing, business travel, reliable connectivity""",
-            
-            "student": """affordable laptop for students with good battery life, 
-                      portable, sufficient storage for documents, budget-friendly,
-                      college laptop, university laptop, school laptop, student laptop,
-                      education laptop, studying, homework, assignments, note-taking""",
-            
-            "design": """laptop for designers with high-resolution display, color accuracy, 
-                     powerful graphics capabilities, creative work, graphic design,
-                     photo editing, video editing, art creation, design laptop, creative laptop,
-                     Adobe Creative Suite, color calibration, pen support""",
-            
-            "programming": """laptop for coding with good processor, sufficient RAM, 
-                         comfortable keyboard and display, development laptop, coding laptop,
-                         software engineering, programming laptop, computer science,
-                         software development, web development, app development, multitasking""",
-            
-            "portable": """lightweight laptop with long battery life, 
-                       compact size, good build quality, travel laptop, thin and light,
-                       ultraportable, mobility, on-the-go, commuting, travel, under 1.5kg weight""",
-            
-            "entertainment": """laptop for media consumption with high-quality display, 
-                           good speakers, immersive experience, movie watching, music, streaming,
-                           content consumption, entertainment laptop, multimedia laptop, HDR support""",
-            
-            "content_creation": """powerful laptop for content creators, video editing, 
-                             rendering, 3D modeling, animation, high-performance processor,
-                             professional graphics, large display, content creation laptop, YouTube""",
-            
-            "budget": """affordable laptop with good value, basic performance,
-                    economical, budget-friendly, cost-effective, entry-level laptop,
-                    inexpensive laptop, low-cost computing, basic tasks, under £700""",
-            
-            "premium": """high-end laptop with premium build quality, top specifications,
-                     luxury design, excellent display, premium materials, flagship laptop,
-                     premium laptop, high-performance, top-tier device, premium price tag""",
-                     
-            "workstation": """professional workstation laptop with powerful CPU and GPU,
-                         CAD software, engineering applications, scientific computing,
-                         virtualization, data analysis, simulation, reliable performance""",
-                         
-            "ultrabook": """ultra-thin laptop with premium design, lightweight portability,
-                      fast SSD storage, modern connectivity, long battery life,
-                      high-resolution display, metal chassis, elegant appearance"""
-        }
+        # Sessions share one catalog unless they bring their own data
+        if catalog is None:
+            catalog = LaptopCatalog(laptop_data) if laptop_data else get_shared_catalog()
+        self.catalog = catalog
         
-        return {key: self.model.encode(desc) for key, desc in features.items()}
+        self.conversation_state = "initial"
+        self.user_preferences = {}
+        self.last_selection = []  # Positions in the top rows of the last recommendations shown
+        
+        # Add new variables for storing top similar laptops and search criteria
+        self.top_similar_rows = np.empty(0, dtype=np.int64)  # Catalog rows of the top 15 most similar laptops
+        self.top_similar_scores = np.empty(0, dtype=np.float32)
+        self.last_search_criteria = {}  # Store the last search criteria to detect repeats
+        self._last_scan = None  # Keyword scan of the message being processed
+
+    @property
+    def model(self) -> SentenceTransformer:
+        return self.catalog.model
+
+    @property
+    def laptops(self) -> List[Dict]:
+        return self.catalog.laptops
+
+    @property
+    def feature_embeddings(self) -> Dict[str, np.ndarray]:
+        return self.catalog.feature_embeddings
+
+    def load_from_database(self, limit=10000) -> List[Dict]:
+        """
+        Load laptop data from PostgreSQL database (see load_laptops_from_database)
+        """
+        return load_laptops_from_database(limit)
 
     def _format_laptop_description(self, laptop: Dict) -> str:
         """
         Create a detailed description string from laptop specifications
         """
-        tables = laptop.get('tables', [])
-        details = {}
-        
-        # Extract relevant information from nested structure
-        for table in tables:
-            title = table.get('title', '')
-            data = table.get('data', {})
-            
-            if isinstance(data, dict):
-                if title == 'Product Details':
-                    details.update(data)
-                elif title == 'Specs':
-                    details.update(data)
-                elif title == 'Screen':
-                    for key, value in data.items():
-                        details[f"Screen {key}"] = value
-                elif title == 'Features':
-                    for key, value in data.items():
-                        details[f"Feature {key}"] = value
-                elif title == 'Ports':
-                    for key, value in data.items():
-                        if value:  # Only include ports that are present
-                            details[f"Has {key}"] = value
-                elif title == 'Misc':
-                    details.update(data)
-        
-        # Build the description with available information
-        brand = details.get('Brand', '')
-        name = details.get('Name', '')
-        description = f"{brand} {name}"
-        
-        # Add processor info
-        processor_brand = details.get('Processor Brand', '')
-        processor_name = details.get('Processor Name', '')
-        if processor_brand and processor_name:
-            description += f" with {processor_brand} {processor_name} processor"
-        
-        # Add memory
-        memory = details.get('Memory Installed', '')
-        if memory:
-            description += f", {memory} RAM"
-        
-        # Add storage
-        storage = details.get('Storage', '')
-        if storage:
-            description += f", {storage} storage"
-        
-        # Add screen info
-        screen_size = details.get('Screen Size', '')
-        screen_resolution = details.get('Screen Resolution', '')
-        if screen_size or screen_resolution:
-            screen_info = ""
-            if screen_size:
-                screen_info += f"{screen_size}"
-            if screen_resolution:
-                if screen_info:
-                    screen_info += f" {screen_resolution}"
-                else:
-                    screen_info = screen_resolution
-            description += f", {screen_info} display"
-        
-        # Add screen refresh rate if available
-        refresh_rate = details.get('Screen Refresh Rate', '')
-        if refresh_rate:
-            description += f" with {refresh_rate} refresh rate"
-        
-        # Add graphics card
-        graphics = details.get('Graphics Card', '')
-        if graphics:
-            description += f", {graphics} graphics"
-        
-        # Add operating system
-        os = details.get('Operating System', '')
-        if os:
-            description += f", {os}"
-        
-        # Add battery life
-        battery_life = details.get('Battery Life', '')
-        if battery_life:
-            description += f", {battery_life} battery life"
-        
-        # Add weight information
-        weight = details.get('Weight', '')
-        if weight:
-            description += f", weighing {weight}"
-        
-        # Add key features
-        features = []
-        for key, value in details.items():
-            if key.startswith('Feature ') and value is True:
-                feature_name = key.replace('Feature ', '')
-                features.append(feature_name)
-        
-        if features:
-            description += f". Features include: {', '.join(features)}"
-        
-        # Add ports information
-        ports = []
-        for key, value in details.items():
-            if key.startswith('Has ') and value is True:
-                port_name = key.replace('Has ', '')
-                ports.append(port_name)
-        
-        if ports:
-            description += f". Ports include: {', '.join(ports)}"
-        
-        return description
+        record = self.catalog.record_of(laptop)
+        return record.description if record else format_laptop_description(laptop)
 
     def _extract_price_range(self, laptop: Dict) -> Tuple[Optional[float], Optional[str]]:
         """
         Extract the lowest price from a laptop's price table with improved robustness
         Returns: (price_value, price_string)
         """
-        price_value = None
-        price_string = None
-        
-        # First look in Prices table
-        for table in laptop.get('tables', []):
-            if table.get('title') == 'Prices' and 'data' in table:
-                prices_data = table['data']
-                if isinstance(prices_data, list) and prices_data:
-                    # Find the lowest price
-                    lowest_price = None
-                    lowest_price_str = None
-                    
-                    for price_entry in prices_data:
-                        price_str = price_entry.get('price', '')
-                        if price_str and price_str != 'N/A':
-                            # Clean and convert price string to float
-                            clean_price = re.sub(r'[^0-9.]', '', price_str.replace(',', ''))
-                            try:
-                                price_val = float(clean_price)
-                                if lowest_price is None or price_val < lowest_price:
-                                    lowest_price = price_val
-                                    lowest_price_str = price_str
-                            except ValueError:
-                                continue
-                    
-                    price_value = lowest_price
-                    price_string = lowest_price_str
-        
-        # If no price found in Prices table look for price in Product Details or other tables
-        if price_value is None:
-            for table in laptop.get('tables', []):
-                data = table.get('data', {})
-                if isinstance(data, dict):
-                    # Check for common price field names
-                    for field in ['Price', 'price', 'Cost', 'cost', 'MSRP', 'msrp', 'RRP', 'rrp']:
-                        if field in data and data[field]:
-                            price_str = str(data[field])
-                            if price_str and price_str != 'N/A':
-                                # Clean and convert price string to float
-                                clean_price = re.sub(r'[^0-9.]', '', price_str.replace(',', ''))
-                                try:
-                                    price_value = float(clean_price)
-                                    price_string = price_str
-                                    break
-                                except ValueError:
-                                    continue
-        
-        return (price_value, price_string)
+        record = self.catalog.record_of(laptop)
+        return (record.price_value, record.price_string) if record else extract_price_range(laptop)
 
     def _enhanced_parse_budget_range(self, budget_input: str) -> Tuple[Optional[float], Optional[float]]:
         """
@@ -727,9 +2595,9 @@ class LaptopRecommendationBot:
         cleaned_input = budget_input.replace('£', '').replace('$', '').replace('€', '').replace(',', '').lower()
         
         # Look for range patterns like "500-1000" or "between 500 and 1000"
-        range_match = re.search(r'(\d+)\s*-\s*(\d+)', cleaned_input)
-        between_match = re.search(r'between\s+(\d+)\s+and\s+(\d+)', cleaned_input)
-        from_to_match = re.search(r'from\s+(\d+)\s+to\s+(\d+)', cleaned_input)
+        range_match = BUDGET_RANGE_PATTERN.search(cleaned_input)
+        between_match = BUDGET_BETWEEN_PATTERN.search(cleaned_input)
+        from_to_match = BUDGET_FROM_TO_PATTERN.search(cleaned_input)
         
         if range_match:
             return (float(range_match.group(1)), float(range_match.group(2)))
@@ -739,24 +2607,24 @@ class LaptopRecommendationBot:
             return (float(from_to_match.group(1)), float(from_to_match.group(2)))
         
         # Look for "under X" or "less than X" patterns
-        under_match = re.search(r'(?:under|less than|below|max|maximum|no more than)\s+(\d+)', cleaned_input)
+        under_match = BUDGET_UNDER_PATTERN.search(cleaned_input)
         if under_match:
             return (None, float(under_match.group(1)))
         
         # Look for "over X" or "more than X" patterns
-        over_match = re.search(r'(?:over|more than|above|min|minimum|at least)\s+(\d+)', cleaned_input)
+        over_match = BUDGET_OVER_PATTERN.search(cleaned_input)
         if over_match:
             return (float(over_match.group(1)), None)
         
         # Look for "around X" patterns
-        around_match = re.search(r'(?:around|about|approximately|roughly|circa)\s+(\d+)', cleaned_input)
+        around_match = BUDGET_AROUND_PATTERN.search(cleaned_input)
         if around_match:
             budget = float(around_match.group(1))
             # Give a wider 30% range for "around"
             return (budget * 0.7, budget * 1.3)
         
         # Look for "X pounds" or just a number
-        number_match = re.search(r'(\d+)(?:\s*(?:pounds|pound|gbp))?', cleaned_input)
+        number_match = BUDGET_NUMBER_PATTERN.search(cleaned_input)
         if number_match:
             budget = float(number_match.group(1))
             # Assume 20% flexibility around the stated budget
@@ -786,11 +2654,18 @@ class LaptopRecommendationBot:
         """
         Filter laptops based on user preferences
         """
-        if not filters:
-            return self.laptops
+        rows = self._filter_rows(filters) if filters else self.catalog.live_rows
+        return [self.laptops[row] for row in rows]
 
-        filtered_laptops = self.laptops
-        logger.info(f"Starting filtering with {len(filtered_laptops)} laptops")
+    def _filter_rows(self, filters: Dict) -> np.ndarray:
+        """
+        Evaluate the filters as one boolean mask over the catalog columns
+        Returns the matching catalog rows in catalog order
+        """
+        columns = self.catalog.columns
+        # Removed laptops never pass
+        mask = self.catalog.live.copy()
+        logger.info(f"Starting filtering with {self.catalog.live_count} laptops")
         
         # Filter by screen size
         if 'size' in filters and filters['size']:
@@ -808,310 +2683,90 @@ class LaptopRecommendationBot:
                     continue
             
             if size_values:
-                min_size = min(size_values)
-                max_size = max(size_values)
-                
-                size_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Screen' and 'data' in table:
-                            size_str = table['data'].get('Size', '')
-                            if size_str:
-                                try:
-                                    # Extract just the numeric part
-                                    laptop_size = float(re.search(r'(\d+(\.\d+)?)', size_str).group(1))
-                                    if min_size <= laptop_size <= max_size:
-                                        size_filtered.append(laptop)
-                                        break
-                                except (ValueError, AttributeError):
-                                    continue
-                filtered_laptops = size_filtered
-                logger.info(f"After size filtering: {len(filtered_laptops)} laptops")
+                # NaN sizes compare False, so laptops without a size drop out
+                mask &= (columns.screen_size >= min(size_values)) & (columns.screen_size <= max(size_values))
+                logger.info(f"After size filtering: {np.count_nonzero(mask)} laptops")
         
         # Filter by brand
         if 'brand' in filters and filters['brand']:
-            brand_filtered = []
             brand_names = [b.lower() for b in filters['brand']]
-            
-            for laptop in filtered_laptops:
-                for table in laptop.get('tables', []):
-                    if table.get('title') == 'Product Details' and 'data' in table:
-                        brand = table['data'].get('Brand', '').lower()
-                        if brand and any(b in brand for b in brand_names):
-                            brand_filtered.append(laptop)
-                            break
-            filtered_laptops = brand_filtered
-            logger.info(f"After brand filtering: {len(filtered_laptops)} laptops")
+            mask &= columns.brand_mask(lambda brand: any(b in brand for b in brand_names))
+            logger.info(f"After brand filtering: {np.count_nonzero(mask)} laptops")
         
         # Filter out blacklisted brands
         if 'blacklisted_brands' in filters and filters['blacklisted_brands']:
-            blacklist_filtered = []
-            blacklisted_brand_names = [b.lower() for b in filters['blacklisted_brands']]
-            
-            for laptop in filtered_laptops:
-                exclude_laptop = False
-                for table in laptop.get('tables', []):
-                    if table.get('title') == 'Product Details' and 'data' in table:
-                        brand = table['data'].get('Brand', '').lower()
-                        if brand and any(b == brand for b in blacklisted_brand_names):
-                            exclude_laptop = True
-                            break
-                
-                if not exclude_laptop:
-                    blacklist_filtered.append(laptop)
-            
-            filtered_laptops = blacklist_filtered
-            logger.info(f"After blacklist filtering: {len(filtered_laptops)} laptops")
+            blacklisted_brand_names = {b.lower() for b in filters['blacklisted_brands']}
+            mask &= ~columns.brand_mask(lambda brand: brand in blacklisted_brand_names)
+            logger.info(f"After blacklist filtering: {np.count_nonzero(mask)} laptops")
         
-        # Filter by budget - IMPROVED VERSION
+        # Filter by budget
         if 'budget' in filters and (filters['budget'][0] is not None or filters['budget'][1] is not None):
             min_budget, max_budget = filters['budget']
+            has_price = ~np.isnan(columns.price)
             
-            # Separate laptops with and without prices
-            laptops_with_price = []
-            laptops_without_price = []
-            
-            for laptop in filtered_laptops:
-                price_value, _ = self._extract_price_range(laptop)
-                
-                if price_value is not None:
-                    # Only add laptops that meet the budget criteria
-                    if (min_budget is None or price_value >= min_budget) and \
-                       (max_budget is None or price_value <= max_budget):
-                        laptops_with_price.append(laptop)
-                else:
-                    laptops_without_price.append(laptop)
+            in_range = mask & has_price
+            if min_budget is not None:
+                in_range &= columns.price >= min_budget
+            if max_budget is not None:
+                in_range &= columns.price <= max_budget
             
             # If we have laptops with prices that meet criteria, use those
-            if laptops_with_price:
-                filtered_laptops = laptops_with_price
-                logger.info(f"After budget filtering: {len(filtered_laptops)} laptops with prices in range")
+            if in_range.any():
+                mask = in_range
+                logger.info(f"After budget filtering: {np.count_nonzero(mask)} laptops with prices in range")
             else:
                 # If no laptops with prices in range, include some laptops without prices
                 # to avoid empty results, but limit to a reasonable number
-                filtered_laptops = laptops_without_price[:min(50, len(laptops_without_price))]
-                logger.info(f"No laptops with prices in range. Using {len(filtered_laptops)} laptops without price info")
-        
-        # Filter by features
-        if 'features' in filters:
-            features = filters['features']
-            
-            # Filter by touchscreen
-            if 'touchscreen' in features:
-                feature_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Screen' and 'data' in table:
-                            touchscreen = table['data'].get('Touchscreen')
-                            if touchscreen is True:
-                                feature_filtered.append(laptop)
-                                break
-                filtered_laptops = feature_filtered
-                logger.info(f"After touchscreen filtering: {len(filtered_laptops)} laptops")
-            
-            # Filter by backlit keyboard
-            if 'backlit_keyboard' in features:
-                feature_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Features' and 'data' in table:
-                            backlit = table['data'].get('Backlit Keyboard')
-                            if backlit is True:
-                                feature_filtered.append(laptop)
-                                break
-                filtered_laptops = feature_filtered
-                logger.info(f"After backlit keyboard filtering: {len(filtered_laptops)} laptops")
-            
-            # Filter by numeric keyboard
-            if 'numeric_keyboard' in features:
-                feature_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Features' and 'data' in table:
-                            numeric = table['data'].get('Numeric Keyboard')
-                            if numeric is True:
-                                feature_filtered.append(laptop)
-                                break
-                filtered_laptops = feature_filtered
-                logger.info(f"After numeric keyboard filtering: {len(filtered_laptops)} laptops")
-            
-            # Filter by bluetooth
-            if 'bluetooth' in features:
-                feature_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Features' and 'data' in table:
-                            bluetooth = table['data'].get('Bluetooth')
-                            if bluetooth is True:
-                                feature_filtered.append(laptop)
-                                break
-                filtered_laptops = feature_filtered
-                logger.info(f"After bluetooth filtering: {len(filtered_laptops)} laptops")
-        
-        # Filter by ports
-        if 'ports' in filters:
-            ports = filters['ports']
-            
-            # Filter by USB-C
-            if 'usb_c' in ports:
-                ports_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Ports' and 'data' in table:
-                            usb_c = table['data'].get('USB Type-C')
-                            if usb_c is True:
-                                ports_filtered.append(laptop)
-                                break
-                filtered_laptops = ports_filtered
-                logger.info(f"After USB-C filtering: {len(filtered_laptops)} laptops")
-            
-            # Filter by HDMI
-            if 'hdmi' in ports:
-                ports_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Ports' and 'data' in table:
-                            hdmi = table['data'].get('HDMI')
-                            if hdmi is True:
-                                ports_filtered.append(laptop)
-                                break
-                filtered_laptops = ports_filtered
-                logger.info(f"After HDMI filtering: {len(filtered_laptops)} laptops")
-            
-            # Filter by Ethernet
-            if 'ethernet' in ports:
-                ports_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Ports' and 'data' in table:
-                            ethernet = table['data'].get('Ethernet (RJ45)')
-                            if ethernet is True:
-                                ports_filtered.append(laptop)
-                                break
-                filtered_laptops = ports_filtered
-                logger.info(f"After Ethernet filtering: {len(filtered_laptops)} laptops")
-            
-            # Filter by Thunderbolt
-            if 'thunderbolt' in ports:
-                ports_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Ports' and 'data' in table:
-                            thunderbolt = table['data'].get('Thunderbolt')
-                            if thunderbolt is True:
-                                ports_filtered.append(laptop)
-                                break
-                filtered_laptops = ports_filtered
-                logger.info(f"After Thunderbolt filtering: {len(filtered_laptops)} laptops")
-            
-            # Filter by Display Port
-            if 'display_port' in ports:
-                ports_filtered = []
-                for laptop in filtered_laptops:
-                    for table in laptop.get('tables', []):
-                        if table.get('title') == 'Ports' and 'data' in table:
-                            display_port = table['data'].get('Display Port')
-                            if display_port is True:
-                                ports_filtered.append(laptop)
-                                break
-                filtered_laptops = ports_filtered
-                logger.info(f"After Display Port filtering: {len(filtered_laptops)} laptops")
-        
-        # Filter by performance level
-        if 'performance' in filters:
+                without_price = np.flatnonzero(mask & ~has_price)[:50]
+                mask = np.zeros(columns.count, dtype=bool)
+                mask[without_price] = True
+                logger.info(f"No laptops with prices in range. Using {len(without_price)} laptops without price info")
+        
+        # Filter by features and ports with one AND over their bitmaps
+        required = [name for group in ('features', 'ports') if group in filters
+                    for name in filters[group] if name in self.catalog.bitmaps]
+        if required:
+            bitmaps = self.catalog.bitmaps
+            mask &= bitmaps.to_mask(bitmaps.intersect(required))
+            logger.info(f"After {', '.join(required)} filtering: {np.count_nonzero(mask)} laptops")
+        
+        # Filter by performance level using the precomputed tier column. The level
+        # is a minimum: a laptop from a higher tier also covers basic or medium needs
+        if 'performance' in filters and filters['performance'] in PERFORMANCE_TIERS:
             perf_level = filters['performance']
+            performance_mask = mask & (columns.performance_tier >= PERFORMANCE_TIERS[perf_level])
             
-            if perf_level == 'high':
-                # Look for high-end processors and GPUs
-                performance_filtered = []
-                high_end_patterns = [
-                    r'i7', r'i9', r'Ryzen 7', r'Ryzen 9', 
-                    r'RTX', r'Radeon RX', r'Quadro', 
-                    r'32GB', r'64GB'
-                ]
-                
-                for laptop in filtered_laptops:
-                    laptop_desc = self._format_laptop_description(laptop)
-                    if any(re.search(pattern, laptop_desc, re.IGNORECASE) for pattern in high_end_patterns):
-                        performance_filtered.append(laptop)
-                
-                filtered_laptops = performance_filtered if performance_filtered else filtered_laptops
-                logger.info(f"After high performance filtering: {len(filtered_laptops)} laptops")
-            
-            elif perf_level == 'medium':
-                # Look for mid-range processors and GPUs
-                performance_filtered = []
-                mid_range_patterns = [
-                    r'i5', r'Ryzen 5', 
-                    r'GTX', r'Radeon', 
-                    r'16GB'
-                ]
-                
-                for laptop in filtered_laptops:
-                    laptop_desc = self._format_laptop_description(laptop)
-                    if any(re.search(pattern, laptop_desc, re.IGNORECASE) for pattern in mid_range_patterns):
-                        performance_filtered.append(laptop)
-                
-                filtered_laptops = performance_filtered if performance_filtered else filtered_laptops
-                logger.info(f"After medium performance filtering: {len(filtered_laptops)} laptops")
-            
-            elif perf_level == 'basic':
-                # Look for entry-level processors and integrated graphics
-                performance_filtered = []
-                basic_patterns = [
-                    r'i3', r'Celeron', r'Pentium', r'Ryzen 3', r'A\d+', 
-                    r'UHD Graphics', r'Intel Graphics', r'AMD Graphics', 
-                    r'4GB', r'8GB'
-                ]
-                
-                for laptop in filtered_laptops:
-                    laptop_desc = self._format_laptop_description(laptop)
-                    if any(re.search(pattern, laptop_desc, re.IGNORECASE) for pattern in basic_patterns):
-                        performance_filtered.append(laptop)
-                
-                filtered_laptops = performance_filtered if performance_filtered else filtered_laptops
-                logger.info(f"After basic performance filtering: {len(filtered_laptops)} laptops")
+            # Only apply the performance filter if something matches it
+            if performance_mask.any():
+                mask = performance_mask
+            logger.info(f"After {perf_level} performance filtering: {np.count_nonzero(mask)} laptops")
+        
+        rows = np.flatnonzero(mask)
         
         # If no laptops left after filtering, return a small portion of the original dataset
-        if not filtered_laptops and self.laptops:
+        if not len(rows) and self.catalog.live_count:
             logger.warning("No laptops left after filtering, returning a subset of all laptops")
-            return self.laptops[:min(5, len(self.laptops))]
+            return self.catalog.live_rows[:5]
         
-        return filtered_laptops
+        return rows
 
-    def _get_laptop_embeddings(self, laptops: List[Dict]) -> List[np.ndarray]:
+    def _get_laptop_rows(self, laptops: List[Dict]) -> np.ndarray:
         """
-        Create embeddings for laptop descriptions
+        Map laptops to their rows in the catalog embedding matrix (-1 if not in the catalog)
         """
-        descriptions = [self._format_laptop_description(laptop) for laptop in laptops]
-        return self.model.encode(descriptions)
+        rows = [self.catalog.row_of(laptop) for laptop in laptops]
+        return np.array([-1 if row is None else row for row in rows], dtype=np.int64)
 
     def _extract_features_from_input(self, user_input: str) -> Dict:
         """
         Extract feature preferences from user input
         Returns a dictionary of features and their values
         """
-        features = {}
-        
-        # Check for touchscreen
-        if re.search(r'\b(?:touch|touchscreen)\b', user_input.lower()):
-            features['touchscreen'] = True
-        
-        # Check for backlit keyboard
-        if re.search(r'\b(?:backlit|lit keyboard|keyboard lighting)\b', user_input.lower()):
-            features['backlit_keyboard'] = True
+        scan = self._scan(user_input)
+        features = {feature: True for feature in PREFERENCE_MATCHER.labels['feature'] if scan.has('feature', feature)}
         
-        # Check for numeric keypad
-        if re.search(r'\b(?:numeric|numpad|number pad|keypad)\b', user_input.lower()):
-            features['numeric_keyboard'] = True
-        
-        # Check for bluetooth
-        if re.search(r'\bbluetooth\b', user_input.lower()):
-            features['bluetooth'] = True
-        
-        # Check for battery life
-        battery_match = re.search(r'(?:battery|battery life|long battery|last\w*\s+\d+\s+hours)', user_input.lower())
-        if battery_match:
+        # Check for battery life stated in hours
+        if 'battery_life' not in features and BATTERY_HOURS_PATTERN.search(scan.text):
             features['battery_life'] = True
         
         return features
@@ -1121,29 +2776,8 @@ class LaptopRecommendationBot:
         Extract port preferences from user input
         Returns a dictionary of ports and their values
         """
-        ports = {}
-        
-        # Check for USB-C
-        if re.search(r'\b(?:usb-c|usb c|type-c|type c)\b', user_input.lower()):
-            ports['usb_c'] = True
-        
-        # Check for HDMI
-        if re.search(r'\bhdmi\b', user_input.lower()):
-            ports['hdmi'] = True
-        
-        # Check for Ethernet
-        if re.search(r'\b(?:ethernet|lan|rj45|network port)\b', user_input.lower()):
-            ports['ethernet'] = True
-        
-        # Check for Thunderbolt
-        if re.search(r'\b(?:thunderbolt)\b', user_input.lower()):
-            ports['thunderbolt'] = True
-        
-        # Check for Display Port
-        if re.search(r'\b(?:displayport|display port)\b', user_input.lower()):
-            ports['display_port'] = True
-        
-        return ports
+        scan = self._scan(user_input)
+        return {port: True for port in PORT_KEYWORDS if scan.has('port', port)}
 
     def _parse_size_preference(self, user_input: str) -> List[Union[int, str]]:
         """
@@ -1151,19 +2785,20 @@ class LaptopRecommendationBot:
         Returns a list of sizes or size ranges
         """
         sizes = []
+        scan = self._scan(user_input)
         
         # Look for size descriptions first
-        if re.search(r'\b(?:small|compact|portable)\b', user_input.lower()):
+        if scan.has('size', 'small'):
             sizes.extend([13, 14])
-        elif re.search(r'\b(?:medium|standard)\b', user_input.lower()):
+        elif scan.has('size', 'medium'):
             sizes.extend([15, 15.6])
-        elif re.search(r'\b(?:large|big|desktop replacement)\b', user_input.lower()):
+        elif scan.has('size', 'large'):
             sizes.extend([16, 17])
         
         # If no descriptive sizes, look for specific measurements
         if not sizes:
             # Extract exact sizes like "13 inch", "15.6\"", etc.
-            size_matches = re.findall(r'(\d+(\.\d+)?)["\s]*(?:inch|"|inches)?', user_input)
+            size_matches = SIZE_VALUE_PATTERN.findall(user_input)
             for match in size_matches:
                 try:
                     sizes.append(float(match[0]))
@@ -1171,7 +2806,7 @@ class LaptopRecommendationBot:
                     continue
             
             # Look for size ranges like "13-15 inch"
-            range_matches = re.findall(r'(\d+(\.\d+)?)\s*-\s*(\d+(\.\d+)?)["\s]*(?:inch|"|inches)?', user_input)
+            range_matches = SIZE_RANGE_PATTERN.findall(user_input)
             for match in range_matches:
                 try:
                     sizes.append(f"{match[0]}-{match[2]}")
@@ -1185,24 +2820,8 @@ class LaptopRecommendationBot:
         Extract brand preferences from user input
         Returns a list of brand names
         """
-        brands = []
-        common_brands = [
-            "dell", "lenovo", "hp", "asus", "acer", "apple", "msi", 
-            "samsung", "microsoft", "lg", "razer", "toshiba", "alienware",
-            "huawei", "sony", "fujitsu", "gigabyte", "chuwi"
-        ]
-        
-        # Convert input to lowercase for case-insensitive comparison
-        user_input_lower = user_input.lower()
-        
-        # Search for brand mentions
-        for brand in common_brands:
-            if brand in user_input_lower:
-                # Verify it's not part of another word
-                if re.search(r'\b' + brand + r'\b', user_input_lower):
-                    brands.append(brand)
-        
-        return brands
+        scan = self._scan(user_input)
+        return [brand for brand in COMMON_BRANDS if scan.has('brand', brand)]
 
     def _extract_blacklisted_brands_from_input(self, user_input: str) -> List[str]:
         """
@@ -1210,44 +2829,31 @@ class LaptopRecommendationBot:
         Returns a list of brand names
         """
         blacklisted_brands = []
-        common_brands = [
-            "dell", "lenovo", "hp", "asus", "acer", "apple", "msi", 
-            "samsung", "microsoft", "lg", "razer", "toshiba", "alienware",
-            "huawei", "sony", "fujitsu", "gigabyte", "chuwi"
-        ]
-        
-        # Convert input to lowercase for case-insensitive comparison
-        user_input_lower = user_input.lower()
-        
-        # Look for negative expressions with brand names
-        negative_patterns = [
-            r"no (.*)",
-            r"not (.*)",
-            r"don't (?:like|want) (.*)",
-            r"avoid (.*)",
-            r"exclude (.*)",
-            r"blacklist (.*)",
-            r"hate (.*)",
-            r"dislike (.*)"
-        ]
-        
-        for pattern in negative_patterns:
-            matches = re.findall(pattern, user_input_lower)
-            for match in matches:
-                # Check if any known brand is in the match
-                for brand in common_brands:
-                    if brand in match and brand not in blacklisted_brands:
-                        # Verify it's not part of another word
-                        if re.search(r'\b' + brand + r'\b', match):
-                            blacklisted_brands.append(brand)
+        scan = self._scan(user_input)
+        text = scan.text
+        
+        # A negative expression covers the rest of its line; only its first occurrence per line counts
+        for trigger in NEGATIVE_TRIGGERS:
+            covered_lines = set()
+            for start, end in sorted(scan.spans.get(('negation', trigger), ())):
+                line_start = text.rfind('\n', 0, start) + 1
+                if line_start in covered_lines:
+                    continue
+                covered_lines.add(line_start)
+                line_end = text.find('\n', end)
+                line_end = len(text) if line_end < 0 else line_end
+                
+                # Check if any known brand is mentioned after it
+                for brand in COMMON_BRANDS:
+                    if brand in blacklisted_brands:
+                        continue
+                    if any(end <= brand_start < line_end for brand_start, _ in scan.spans.get(('brand', brand), ())):
+                        blacklisted_brands.append(brand)
         
         # Also check for direct mentions in patterns like "blacklist dell and hp" or "no dell or hp"
-        for brand in common_brands:
-            negative_prefixes = ["no", "not", "don't want", "don't like", "avoid", "exclude", "blacklist", "hate", "dislike"]
-            for prefix in negative_prefixes:
-                if f"{prefix} {brand}" in user_input_lower or f"{prefix} {brand}," in user_input_lower:
-                    if brand not in blacklisted_brands:
-                        blacklisted_brands.append(brand)
+        for brand in COMMON_BRANDS:
+            if brand not in blacklisted_brands and scan.has('negated_brand', brand):
+                blacklisted_brands.append(brand)
         
         return blacklisted_brands
 
@@ -1256,31 +2862,12 @@ class LaptopRecommendationBot:
         Determine the performance level preference from user input
         Returns: 'high', 'medium', or 'basic'
         """
-        user_input_lower = user_input.lower()
-        
-        # High performance indicators
-        high_perf = [
-            "high performance", "powerful", "fast", "gaming", "rendering",
-            "video editing", "3d modeling", "simulation", "high-end", "top spec",
-            "best performance", "fastest", "i7", "i9", "ryzen 7", "ryzen 9"
-        ]
-        
-        # Medium performance indicators
-        medium_perf = [
-            "medium performance", "balanced", "mid-range", "moderate",
-            "good performance", "decent", "i5", "ryzen 5"
-        ]
+        scan = self._scan(user_input)
         
-        # Basic performance indicators
-        basic_perf = [
-            "basic", "budget", "entry level", "simple tasks", "browsing",
-            "office work", "light use", "casual", "everyday", "i3", "celeron"
-        ]
-        
-        # Count matches for each category
-        high_count = sum(1 for term in high_perf if term in user_input_lower)
-        medium_count = sum(1 for term in medium_perf if term in user_input_lower)
-        basic_count = sum(1 for term in basic_perf if term in user_input_lower)
+        # Count matching indicators for each category
+        high_count = scan.distinct('performance', 'high')
+        medium_count = scan.distinct('performance', 'medium')
+        basic_count = scan.distinct('performance', 'basic')
         
         # Determine the highest matching category
         if high_count > medium_count and high_count > basic_count:
@@ -1294,32 +2881,10 @@ class LaptopRecommendationBot:
         """
         Use keyword matching as a fallback for use case detection
         """
-        user_input = user_input.lower()
-        
-        # Define keywords for each category
-        keywords = {
-            "gaming": ["gaming", "game", "play", "fps", "aaa", "shooter", "mmo", "rpg", "esports", "stream"],
-            "business": ["business", "work", "office", "professional", "meetings", "presentation", "teams", "zoom"],
-            "student": ["student", "school", "college", "university", "education", "study", "homework", "notes"],
-            "design": ["design", "creative", "art", "photo", "video", "editing", "creator", "adobe", "illustrator", "photoshop"],
-            "programming": ["programming", "coding", "development", "software", "code", "developer", "programming", "ide"],
-            "portable": ["portable", "light", "travel", "thin", "lightweight", "carry", "commute", "mobility"],
-            "entertainment": ["entertainment", "media", "movies", "streaming", "netflix", "videos", "watch", "content"],
-            "content_creation": ["content", "creator", "youtube", "stream", "render", "production", "vlog"],
-            "budget": ["budget", "cheap", "affordable", "inexpensive", "economical", "low cost", "value"],
-            "premium": ["premium", "high-end", "luxury", "best", "top", "flagship", "expensive"],
-            "workstation": ["workstation", "cad", "engineering", "simulation", "data science", "virtualization"],
-            "ultrabook": ["ultrabook", "ultraportable", "thin and light", "premium build", "sleek"]
-        }
+        scan = self._scan(user_input)
         
-        # Count keyword matches for each category
-        category_scores = {category: 0 for category in keywords}
-        
-        for category, words in keywords.items():
-            for word in words:
-                # Use word boundary to match whole words
-                matches = len(re.findall(r'\b' + word + r'\b', user_input))
-                category_scores[category] += matches
+        # Count whole word keyword matches for each category
+        category_scores = {category: scan.count('use_case', category) for category in USE_CASE_KEYWORDS}
                 
         # Find the category with the highest score
         if max(category_scores.values()) > 0:
@@ -1328,19 +2893,45 @@ class LaptopRecommendationBot:
         # Default to "student" if no keywords match
         return "student"
 
+    def _scan(self, user_input: str) -> KeywordScan:
+        """
+        Scan a message for every keyword vocabulary once
+        The extractors all look at the same message, so the last scan is reused.
+        """
+        if self._last_scan is None or self._last_scan.source != user_input:
+            self._last_scan = PREFERENCE_MATCHER.scan(user_input)
+        return self._last_scan
+
     def _analyze_preferences(self, user_input: str) -> Dict:
         """
         Analyze user input for all possible preferences in one go
+        Repeated phrasings are served from the shared preference cache without encoding.
+        """
+        message = normalize_message(user_input)
+        cache_key = (self.catalog.model_name, message)
+        cached = preference_cache.get(cache_key)
+        if cached is not None:
+            preferences, _ = cached
+            return copy.deepcopy(preferences)
+        
+        user_embedding = self.catalog.encoder.encode(message)
+        preferences = self._parse_preferences(message, user_embedding)
+        
+        # Sessions update their preferences in place, so the cache keeps its own copy
+        user_embedding.flags.writeable = False
+        preference_cache.put(cache_key, (copy.deepcopy(preferences), user_embedding))
+        return preferences
+
+    def _parse_preferences(self, user_input: str, user_embedding: np.ndarray) -> Dict:
+        """
+        Extract every preference from a message given its query embedding
         """
         preferences = {}
         
         # Extract use case using embeddings first, then keywords as fallback
-        user_embedding = self.model.encode(user_input)
-        similarities = {
-            use_case: cosine_similarity([user_embedding], [emb])[0][0]
-            for use_case, emb in self.feature_embeddings.items()
-        }
-        most_relevant = max(similarities.items(), key=lambda x: x[1])
+        similarities = self.catalog.use_case_matrix @ user_embedding
+        best = int(np.argmax(similarities))
+        most_relevant = (self.catalog.use_case_names[best], float(similarities[best]))
         
         # Use embedding if similarity is high enough, otherwise keyword matching
         if most_relevant[1] < 0.3:  # Threshold for low confidence
@@ -1364,7 +2955,7 @@ class LaptopRecommendationBot:
             preferences['blacklisted_brands'] = blacklisted_brands
         
         # Extract budget range
-        budget_match = re.search(r'\b(?:budget|price|cost|spend|around|under|below|max)\b[^.]*?(\d[\d,.]*)', user_input, re.IGNORECASE)
+        budget_match = BUDGET_MENTION_PATTERN.search(user_input)
         if budget_match:
             budget_input = budget_match.group(0)
             min_budget, max_budget = self._enhanced_parse_budget_range(budget_input)
@@ -1386,31 +2977,27 @@ class LaptopRecommendationBot:
         
         return preferences
 
-    def _handle_price_refinement(self, user_input: str) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    def _handle_price_refinement(self, user_input: str) -> Tuple[Optional[Dict], Optional[str]]:
         """
         Handle user requests to adjust price range during refinement
-        Returns: (filtered_laptops, response_message) or (None, None) if not a price request
+        Returns: (filters, response_message) or (None, None) if not a price request
         """
         price_input = user_input.lower()
+        scan = self._scan(user_input)
         original_min, original_max = self.user_preferences.get('budget', (None, None))
         
         # Handle request to ignore price constraints
-        if any(term in price_input for term in ["ignore price", "don't care about price", 
-                                         "forget the price", "remove price", 
-                                         "price doesn't matter", "no price limit"]):
+        if scan.has('phrase', 'ignore_price'):
             # Remove budget constraint
             if 'budget' in self.user_preferences:
                 del self.user_preferences['budget']
             
             # Apply filters without budget
             filters = {k: v for k, v in self.user_preferences.items() if k != 'budget'}
-            filtered_laptops = self._filter_laptops(filters)
-            
-            return filtered_laptops, "I've removed the price constraints. Here are some options across different price points:"
+            return filters, "I've removed the price constraints. Here are some options across different price points:"
         
         # Handle cheaper request
-        elif any(term in price_input for term in ["cheaper", "less expensive", "lower price", 
-                                          "budget", "affordable", "cost less"]):
+        elif scan.has('phrase', 'cheaper'):
             new_min, new_max = None, None
             
             if original_max is not None:
@@ -1435,17 +3022,13 @@ class LaptopRecommendationBot:
                     filters[key] = value
             filters['budget'] = (new_min, new_max)
             
-            filtered_laptops = self._filter_laptops(filters)
-            
             if new_min is not None:
-                return filtered_laptops, f"Looking for more affordable options between £{new_min:.0f} and £{new_max:.0f}:"
+                return filters, f"Looking for more affordable options between £{new_min:.0f} and £{new_max:.0f}:"
             else:
-                return filtered_laptops, f"Looking for more affordable options under £{new_max:.0f}:"
+                return filters, f"Looking for more affordable options under £{new_max:.0f}:"
         
         # Handle more expensive request
-        elif any(term in price_input for term in ["expensive", "higher price", "premium", 
-                                          "better", "high-end", "higher budget", 
-                                          "more expensive", "higher quality"]):
+        elif scan.has('phrase', 'pricier'):
             new_min, new_max = None, None
             
             if original_min is not None:
@@ -1470,12 +3053,10 @@ class LaptopRecommendationBot:
                     filters[key] = value
             filters['budget'] = (new_min, new_max)
             
-            filtered_laptops = self._filter_laptops(filters)
-            
             if new_max is not None:
-                return filtered_laptops, f"Looking for more premium options between £{new_min:.0f} and £{new_max:.0f}:"
+                return filters, f"Looking for more premium options between £{new_min:.0f} and £{new_max:.0f}:"
             else:
-                return filtered_laptops, f"Looking for more premium options above £{new_min:.0f}:"
+                return filters, f"Looking for more premium options above £{new_min:.0f}:"
         
         # Handle specific price range request
         else:
@@ -1491,14 +3072,12 @@ class LaptopRecommendationBot:
                         filters[key] = value
                 filters['budget'] = (min_budget, max_budget)
                 
-                filtered_laptops = self._filter_laptops(filters)
-                
                 if min_budget is not None and max_budget is not None:
-                    return filtered_laptops, f"Looking for laptops between £{min_budget:.0f} and £{max_budget:.0f}:"
+                    return filters, f"Looking for laptops between £{min_budget:.0f} and £{max_budget:.0f}:"
                 elif min_budget is not None:
-                    return filtered_laptops, f"Looking for laptops above £{min_budget:.0f}:"
+                    return filters, f"Looking for laptops above £{min_budget:.0f}:"
                 else:
-                    return filtered_laptops, f"Looking for laptops under £{max_budget:.0f}:"
+                    return filters, f"Looking for laptops under £{max_budget:.0f}:"
         
         return None, None  # Indicate that this wasn't a price-related query
 
@@ -1523,174 +3102,176 @@ class LaptopRecommendationBot:
         
         return "|".join(hash_components)
 
-    def _get_recommendations(self, laptops: List[Dict], use_case: str, count: int = 3) -> List[Dict]:
+    def _recommend(self, filters: Dict, use_case: str, count: int = 3) -> List[Dict]:
         """
-        Get laptop recommendations based on use case with random selection from top 15
+        Get laptop recommendations for the filters and use case with random selection from the top 15
+        The ranked top 15 is shared by every session searching with the same criteria.
         """
-        if not laptops:
-            return []
-        
-        # Create a hash of the current search criteria
-        current_filters = {}
-        for key, value in self.user_preferences.items():
-            if key not in ['use_case']:  # Use case is handled separately
-                current_filters[key] = value
-        
-        search_hash = self._get_search_criteria_hash(current_filters, use_case)
+        search_hash = self._get_search_criteria_hash(filters, use_case)
+        cache_key = (self.catalog.version, search_hash)
         logger.info(f"Search criteria hash: {search_hash}")
         
-        # Check if this is the same search as before
-        is_same_search = search_hash == self.last_search_criteria.get('hash', '')
-        logger.info(f"Is same search: {is_same_search}")
-        
-        # If it's the same search and we already have the top 15, use those
-        if is_same_search and self.top_similar_laptops:
-            logger.info(f"Using previously computed top {len(self.top_similar_laptops)} laptops")
-            # Pick random laptops from the top 15
-            count = min(count, len(self.top_similar_laptops))
-            if count == 0:
-                return []
-            
-            # Randomly select unique laptops
-            selected_indices = random.sample(range(len(self.top_similar_laptops)), count)
-            recommendations = [self.top_similar_laptops[i] for i in selected_indices]
-            
-            logger.info(f"Randomly selected {count} laptops from previous top {len(self.top_similar_laptops)}")
-            return recommendations
-        
-        # Otherwise, compute the top similar laptops
-        laptop_embeddings = self._get_laptop_embeddings(laptops)
-        use_case_embedding = self.feature_embeddings.get(use_case, self.feature_embeddings['student'])
-        
-        similarities = cosine_similarity([use_case_embedding], laptop_embeddings)[0]
+        ranked = recommendation_cache.get(cache_key)
+        if ranked is None:
+            rows = self._filter_rows(filters) if filters else self.catalog.live_rows
+            ranked = self._rank_rows(rows, use_case)
+            recommendation_cache.put(cache_key, ranked)
+            logger.info(f"Computed new top {len(ranked[0])} laptops")
+        else:
+            logger.info(f"Using shared top {len(ranked[0])} laptops for this search")
         
-        # Get top 15 indices but limit to available laptops
-        top_count = min(15, len(laptops))
-        if top_count == 0:
-            return []
-            
-        top_indices = np.argsort(similarities)[-top_count:][::-1]
+        self._remember_ranking(search_hash, ranked)
+        return self._sample_recommendations(count)
+
+    def _get_recommendations(self, laptops: List[Dict], use_case: str, count: int = 3) -> List[Dict]:
+        """
+        Get laptop recommendations from an explicit list of catalog laptops with random selection from the top 15
+        """
+        rows = self._get_laptop_rows(laptops)
+        if not (rows >= 0).all():
+            logger.warning(f"Ignoring {np.count_nonzero(rows < 0)} laptops that are not in the catalog")
+            rows = rows[rows >= 0]
         
-        # Store the top 15 laptops with their scores for future use
-        self.top_similar_laptops = []
-        for idx in top_indices:
-            laptop = laptops[idx]
-            brand = ""
-            name = ""
-            
-            # Extract brand and name
-            for table in laptop.get('tables', []):
-                if table.get('title') == 'Product Details' and 'data' in table:
-                    brand = table['data'].get('Brand', '')
-                    name = table['data'].get('Name', '')
-                    break
-            
-            if brand and name:
-                # Extract price information
-                price_value, price_string = self._extract_price_range(laptop)
-                
-                # Get key specifications for this laptop
-                key_specs = self._get_key_specs(laptop)
-                
-                self.top_similar_laptops.append({
-                    'brand': brand,
-                    'name': name,
-                    'specs': self._format_laptop_description(laptop),
-                    'price': price_string if price_string else "Price not available",
-                    'key_specs': key_specs,
-                    'similarity_score': similarities[idx]
-                })
-        
-        # Store the search criteria hash
+        self._remember_ranking(None, self._rank_rows(rows, use_case))
+        return self._sample_recommendations(count)
+
+    def _rank_rows(self, rows: np.ndarray, use_case: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank candidate catalog rows for a use case, keeping the top 15 that have a brand and name
+        Returns read-only (rows, scores) arrays, safe to share between sessions
+        """
+        if not len(rows):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        top_rows, top_scores = self.catalog.top_rows_for_use_case(use_case, rows, 15)
+        named = np.array([bool(self.catalog.records[row].brand and self.catalog.records[row].name) for row in top_rows],
+                         dtype=bool)
+        top_rows = np.ascontiguousarray(top_rows[named], dtype=np.int64)
+        top_scores = np.ascontiguousarray(top_scores[named], dtype=np.float32)
+        top_rows.flags.writeable = False
+        top_scores.flags.writeable = False
+        return top_rows, top_scores
+
+    def _remember_ranking(self, search_hash: Optional[str], ranked: Tuple[np.ndarray, np.ndarray]):
+        """
+        Keep the current top rows so that later selections come from the same search
+        """
+        self.top_similar_rows, self.top_similar_scores = ranked
         self.last_search_criteria = {
             'hash': search_hash,
             'timestamp': time.time()  # If we want to expire cached results after some time
         }
-        
-        logger.info(f"Computed new top {len(self.top_similar_laptops)} laptops")
-        
-        # Randomly select from the top 15
-        count = min(count, len(self.top_similar_laptops))
+
+    def _recommendation_from_row(self, row: int, score: float) -> Dict:
+        """
+        Build the recommendation dictionary for a catalog row
+        """
+        record = self.catalog.records[row]
+        return {
+            'laptop_id': record.laptop_id,
+            'brand': record.brand,
+            'name': record.name,
+            'specs': record.description,
+            'price': record.price_string if record.price_string else "Price not available",
+            'key_specs': dict(record.key_specs),
+            'similarity_score': float(score)
+        }
+
+    def _sample_recommendations(self, count: int) -> List[Dict]:
+        """
+        Randomly select unique laptops from the current top rows
+        """
+        count = min(count, len(self.top_similar_rows))
+        self.last_selection = []
         if count == 0:
             return []
-            
-        selected_indices = random.sample(range(len(self.top_similar_laptops)), count)
-        recommendations = [self.top_similar_laptops[i] for i in selected_indices]
         
-        logger.info(f"Randomly selected {count} laptops from new top {len(self.top_similar_laptops)}")
+        selected_indices = random.sample(range(len(self.top_similar_rows)), count)
+        self.last_selection = selected_indices
+        recommendations = [self._recommendation_from_row(self.top_similar_rows[i], self.top_similar_scores[i])
+                           for i in selected_indices]
+        
+        logger.info(f"Randomly selected {count} laptops from top {len(self.top_similar_rows)}")
         return recommendations
 
-    def _get_key_specs(self, laptop: Dict) -> Dict:
+    @property
+    def top_similar_laptops(self) -> List[Dict]:
+        """The current top laptops as recommendation dictionaries"""
+        return [self._recommendation_from_row(row, score)
+                for row, score in zip(self.top_similar_rows, self.top_similar_scores)]
+
+    @property
+    def last_recommendations(self) -> List[Dict]:
+        """The last recommendations shown, rebuilt from the catalog"""
+        return [self._recommendation_from_row(self.top_similar_rows[i], self.top_similar_scores[i])
+                for i in self.last_selection]
+
+    def to_state(self) -> Dict:
         """
-        Extract key specifications from a laptop for quick comparison
+        Compact JSON-serializable conversation state
+        Laptops are referred to only by catalog row, valid for the recorded catalog version.
         """
-        key_specs = {}
-        
-        # Processor
-        for table in laptop.get('tables', []):
-            if table.get('title') == 'Specs' and 'data' in table:
-                processor_brand = table['data'].get('Processor Brand', '')
-                processor_name = table['data'].get('Processor Name', '')
-                if processor_brand and processor_name:
-                    key_specs['Processor'] = f"{processor_brand} {processor_name}"
-                
-                # Graphics
-                graphics = table['data'].get('Graphics Card', '')
-                if graphics:
-                    key_specs['Graphics'] = graphics
-                
-                # RAM
-                memory = table['data'].get('Memory Installed', '')
-                if memory:
-                    key_specs['RAM'] = memory
-                
-                # Storage
-                storage = table['data'].get('Storage', '')
-                if storage:
-                    key_specs['Storage'] = storage
-        
-        # Screen
-        for table in laptop.get('tables', []):
-            if table.get('title') == 'Screen' and 'data' in table:
-                screen_size = table['data'].get('Size', '')
-                screen_resolution = table['data'].get('Resolution', '')
-                if screen_size:
-                    key_specs['Screen'] = screen_size
-                    if screen_resolution:
-                        key_specs['Screen'] += f" {screen_resolution}"
-                
-                refresh_rate = table['data'].get('Refresh Rate', '')
-                if refresh_rate:
-                    key_specs['Refresh Rate'] = refresh_rate
+        return {
+            'conversation_state': self.conversation_state,
+            'user_preferences': self.user_preferences,
+            'catalog_version': self.catalog.version,
+            'search_hash': self.last_search_criteria.get('hash'),
+            'candidate_rows': self.top_similar_rows.tolist(),
+            'candidate_scores': self.top_similar_scores.tolist(),
+            'last_selection': list(self.last_selection)
+        }
+
+    def load_state(self, state: Dict):
+        """
+        Restore a conversation saved by to_state()
+        Candidates from an unrelated catalog version are dropped; the preferences still apply.
+        A version this catalog was derived from by deltas shares its rows, so its candidates
+        are kept apart from laptops removed since.
+        """
+        self.reset_conversation()
+        if not state:
+            return
         
-        # Battery
-        for table in laptop.get('tables', []):
-            if (table.get('title') == 'Features' or table.get('title') == 'Misc') and 'data' in table:
-                battery = table['data'].get('Battery Life', '')
-                if battery:
-                    key_specs['Battery'] = battery
+        conversation_state = state.get('conversation_state')
+        self.conversation_state = conversation_state if conversation_state in CONVERSATION_STATES else "initial"
         
-        # Weight
-        for table in laptop.get('tables', []):
-            if table.get('title') == 'Product Details' and 'data' in table:
-                weight = table['data'].get('Weight', '')
-                if weight:
-                    key_specs['Weight'] = weight
+        # JSON turns the budget tuple into a list
+        self.user_preferences = dict(state.get('user_preferences') or {})
+        if isinstance(self.user_preferences.get('budget'), list):
+            self.user_preferences['budget'] = tuple(self.user_preferences['budget'])
         
-        return key_specs
+        version = state.get('catalog_version')
+        if version != self.catalog.version and version not in self.catalog.row_compatible_versions:
+            return
+        rows = np.array(state.get('candidate_rows') or [], dtype=np.int64)
+        scores = np.array(state.get('candidate_scores') or [], dtype=np.float32)
+        if len(rows) != len(scores) or (len(rows) and (rows.min() < 0 or rows.max() >= len(self.laptops))):
+            logger.warning("Ignoring saved candidates that do not fit the catalog")
+            return
+        selection = [i for i in state.get('last_selection') or [] if 0 <= i < len(rows)]
+        
+        live = self.catalog.live[rows]
+        if not live.all():
+            # Renumber the selection around the removed candidates
+            positions = np.cumsum(live) - 1
+            selection = [int(positions[i]) for i in selection if live[i]]
+            rows, scores = rows[live], scores[live]
+        
+        self.top_similar_rows, self.top_similar_scores = rows, scores
+        self.last_selection = selection
+        self.last_search_criteria = {'hash': state.get('search_hash'), 'timestamp': time.time()}
+
+    def _get_key_specs(self, laptop: Dict) -> Dict:
+        """
+        Extract key specifications from a laptop for quick comparison
+        """
+        record = self.catalog.record_of(laptop)
+        return dict(record.key_specs) if record else get_key_specs(laptop)
 
     def _get_laptop_name(self, laptop: Dict) -> str:
         """Helper to get a laptop's full name (brand + name)"""
-        brand = ""
-        name = ""
-        
-        for table in laptop.get('tables', []):
-            if table.get('title') == 'Product Details' and 'data' in table:
-                brand = table['data'].get('Brand', '')
-                name = table['data'].get('Name', '')
-                break
-        
-        return f"{brand} {name}".strip()
+        record = self.catalog.record_of(laptop)
+        return record.display_name if record else get_laptop_name(laptop)
 
     def process_input(self, user_input: str) -> Dict:
         """
@@ -1703,8 +3284,11 @@ class LaptopRecommendationBot:
             "detected_preferences": {}
         }
 
+        # Scan the message for every keyword vocabulary once
+        scan = self._scan(user_input)
+
         # Check for restart or new search request
-        if any(term in user_input.lower() for term in ["restart", "start over", "new search", "new recommendation"]):
+        if scan.has('phrase', 'restart'):
             self.reset_conversation()
             response["message"] = "Let's start over. " + self.questions["initial"]
             self.conversation_state = "initial"
@@ -1733,11 +3317,9 @@ class LaptopRecommendationBot:
                     if key != 'use_case' and value:
                         filters[key] = value
                 
-                filtered_laptops = self._filter_laptops(filters)
-                recommendations = self._get_recommendations(filtered_laptops, self.user_preferences.get('use_case', 'student'), 3)
+                recommendations = self._recommend(filters, self.user_preferences.get('use_case', 'student'), 3)
                 
                 response["recommendations"] = recommendations
-                self.last_recommendations = recommendations
                 
                 if recommendations:
                     response["message"] += "Here are updated recommendations excluding those brands:"
@@ -1755,7 +3337,7 @@ class LaptopRecommendationBot:
             
             # Provide information about detected preferences
             use_case = self.user_preferences.get('use_case', '')
-            response["detected_preferences"] = preferences
+            response["detected_preferences"] = copy.deepcopy(preferences)
             response["message"] = f"I understand you're looking for a {use_case} laptop."
             
             # Add details about detected preferences
@@ -1785,22 +3367,10 @@ class LaptopRecommendationBot:
             response["next_question"] = self.questions["purpose"]
         
         elif self.conversation_state == "purpose":
-            # Extract purpose from input and update preferences
-            purpose_input = user_input.lower()
-            
-            # Map common keywords to use cases
-            purpose_mapping = {
-                "gaming": ["gaming", "game", "play", "fps", "gamer"],
-                "business": ["business", "work", "office", "professional"],
-                "student": ["student", "school", "college", "university", "education", "study"],
-                "design": ["design", "creative", "art", "photo", "video", "editing", "creator", "adobe"],
-                "programming": ["programming", "coding", "development", "software", "code", "developer"]
-            }
-            
-            # Determine purpose from input
+            # Determine purpose from input, mapping common keywords to use cases
             detected_purpose = None
-            for purpose, keywords in purpose_mapping.items():
-                if any(keyword in purpose_input for keyword in keywords):
+            for purpose in PURPOSE_KEYWORDS:
+                if scan.has('purpose', purpose):
                     detected_purpose = purpose
                     break
             
@@ -1818,15 +3388,11 @@ class LaptopRecommendationBot:
             response["next_question"] = self.questions["size"]
         
         elif self.conversation_state == "size":
-            # Extract screen size preference
-            size_terms = {"small": [11, 12, 13, 14], "medium": [15, 15.6], "large": [16, 17, 17.3]}
-            
-            # Check for size descriptors first
-            size_input = user_input.lower()
+            # Extract screen size preference, checking for size descriptors first
             size_pref = []
             
-            for descriptor, sizes in size_terms.items():
-                if descriptor in size_input:
+            for descriptor, sizes in SIZE_ANSWERS.items():
+                if scan.has('size_answer', descriptor):
                     size_pref.extend(sizes)
                     break
             
@@ -1850,7 +3416,7 @@ class LaptopRecommendationBot:
             budget_input = user_input.lower()
             
             # Check if user is declining to provide a budget
-            if any(term in budget_input for term in ["don't know", "not sure", "any budget", "doesn't matter", "don't care", "skip"]):
+            if scan.has('phrase', 'skip_budget'):
                 response["message"] = "No problem. I'll show you options across different price points."
                 # Move to next question
                 self.conversation_state = "brand"
@@ -1884,7 +3450,7 @@ class LaptopRecommendationBot:
         
         elif self.conversation_state == "brand":
             # First check if user is saying they have no preference
-            if any(term in user_input.lower() for term in ["no", "none", "any", "no preference", "doesn't matter"]):
+            if scan.has('phrase', 'any_brand'):
                 response["message"] = "Got it, I won't filter by brand."
             else:
                 # Extract both preferred and blacklisted brands
@@ -1943,10 +3509,10 @@ class LaptopRecommendationBot:
         
         elif self.conversation_state == "performance":
             # Extract performance level
-            if any(term in user_input.lower() for term in ["high", "powerful", "gaming", "top", "best"]):
+            if scan.has('performance_answer', 'high'):
                 self.user_preferences['performance'] = "high"
                 response["message"] = "I'll look for high-performance laptops with powerful processors and graphics."
-            elif any(term in user_input.lower() for term in ["medium", "mid", "balanced", "moderate"]):
+            elif scan.has('performance_answer', 'medium'):
                 self.user_preferences['performance'] = "medium"
                 response["message"] = "I'll look for mid-range laptops with good balanced performance."
             else:
@@ -1977,46 +3543,31 @@ class LaptopRecommendationBot:
             if 'performance' in self.user_preferences:
                 filters['performance'] = self.user_preferences['performance']
             
-            filtered_laptops = self._filter_laptops(filters)
+            # Get recommendations based on use case and filtered laptops
+            recommendations = self._recommend(filters, self.user_preferences.get('use_case', 'student'), 3)
             
-            if filtered_laptops:
-                # Get recommendations based on use case and filtered laptops
-                recommendations = self._get_recommendations(filtered_laptops, self.user_preferences.get('use_case', 'student'), 3)
-                
-                if recommendations:
-                    response["recommendations"] = recommendations
-                    self.last_recommendations = recommendations
-                    response["message"] += " Here are your personalized recommendations:"
-                else:
-                    response["message"] += " I couldn't find laptops matching all your criteria. Let me show you some alternatives."
-                    # Relax some constraints
-                    relaxed_filters = {k: v for k, v in filters.items() if k not in ['features', 'ports']}
-                    relaxed_laptops = self._filter_laptops(relaxed_filters)
-                    recommendations = self._get_recommendations(relaxed_laptops, self.user_preferences.get('use_case', 'student'), 3)
-                    response["recommendations"] = recommendations
-                    self.last_recommendations = recommendations
+            if recommendations:
+                response["recommendations"] = recommendations
+                response["message"] += " Here are your personalized recommendations:"
             else:
                 response["message"] += " I couldn't find laptops matching all your criteria. Let me show you some alternatives."
-                # Try with minimal filtering
-                minimal_filters = {}
-                if 'budget' in filters:
-                    minimal_filters['budget'] = filters['budget']
-                if 'brand' in filters:
-                    minimal_filters['brand'] = filters['brand']
-                if 'blacklisted_brands' in filters:
-                    minimal_filters['blacklisted_brands'] = filters['blacklisted_brands']
+                # Relax some constraints
+                relaxed_filters = {k: v for k, v in filters.items() if k not in ['features', 'ports']}
+                recommendations = self._recommend(relaxed_filters, self.user_preferences.get('use_case', 'student'), 3)
+                
+                if not recommendations:
+                    # Try with minimal filtering
+                    minimal_filters = {k: v for k, v in filters.items() if k in ['budget', 'brand', 'blacklisted_brands']}
+                    recommendations = self._recommend(minimal_filters, self.user_preferences.get('use_case', 'student'), 3)
                 
-                minimal_laptops = self._filter_laptops(minimal_filters)
-                recommendations = self._get_recommendations(minimal_laptops, self.user_preferences.get('use_case', 'student'), 3)
                 response["recommendations"] = recommendations
-                self.last_recommendations = recommendations
             
             self.conversation_state = "refine"
             response["next_question"] = "Would you like to refine your search or see more options?"
         
         elif self.conversation_state == "refine":
             # First check for explicit blacklist requests
-            if any(term in user_input.lower() for term in ["exclude", "blacklist", "no more", "don't show", "don't want"]):
+            if scan.has('phrase', 'exclude'):
                 blacklisted_brands = self._extract_blacklisted_brands_from_input(user_input)
                 if blacklisted_brands:
                     # Add to blacklist
@@ -2035,58 +3586,41 @@ class LaptopRecommendationBot:
                         if key != 'use_case' and value:
                             filters[key] = value
                     
-                    filtered_laptops = self._filter_laptops(filters)
-                    recommendations = self._get_recommendations(filtered_laptops, self.user_preferences.get('use_case', 'student'), 3)
+                    recommendations = self._recommend(filters, self.user_preferences.get('use_case', 'student'), 3)
                     
                     response["recommendations"] = recommendations
-                    self.last_recommendations = recommendations
                     return response  # Return here to avoid other refine logic
             
             # Check if it's a price-related refinement
-            filtered_laptops, price_message = self._handle_price_refinement(user_input)
+            price_filters, price_message = self._handle_price_refinement(user_input)
             
-            if filtered_laptops is not None and price_message is not None:
+            if price_filters is not None and price_message is not None:
                 # It was a price-related query
-                recommendations = self._get_recommendations(filtered_laptops, self.user_preferences.get('use_case', 'student'), 3)
+                recommendations = self._recommend(price_filters, self.user_preferences.get('use_case', 'student'), 3)
                 response["recommendations"] = recommendations
-                self.last_recommendations = recommendations
                 response["message"] = price_message
                 return response
             
             # Handle requests for more options
-            if any(term in user_input.lower() for term in ["more", "additional", "other", "alternative", "show more"]):
+            if scan.has('phrase', 'more'):
                 # Show more recommendations
-                use_case = self.user_preferences.get('use_case', 'student')
-                filters = {}
-                
-                if 'size' in self.user_preferences:
-                    filters['size'] = self.user_preferences['size']
-                
-                if 'brand' in self.user_preferences:
-                    filters['brand'] = self.user_preferences['brand']
-                
-                if 'blacklisted_brands' in self.user_preferences:
-                    filters['blacklisted_brands'] = self.user_preferences['blacklisted_brands']
-                
-                if 'budget' in self.user_preferences:
-                    filters['budget'] = self.user_preferences['budget']
-                
-                if 'features' in self.user_preferences:
-                    filters['features'] = self.user_preferences['features']
-                
-                if 'ports' in self.user_preferences:
-                    filters['ports'] = self.user_preferences['ports']
-                
-                filtered_laptops = self._filter_laptops(filters)
-                
-                # Use same search criteria to get different random selections
-                recommendations = self._get_recommendations(filtered_laptops, use_case, 3)
+                if len(self.top_similar_rows):
+                    # Draw again from the ranking of the last search to get different random selections
+                    recommendations = self._sample_recommendations(3)
+                else:
+                    # No ranking to draw from (e.g. its laptops left the catalog), so search again
+                    # with every stated preference
+                    filters = {}
+                    for key, value in self.user_preferences.items():
+                        if key != 'use_case' and value:
+                            filters[key] = value
+                    
+                    recommendations = self._recommend(filters, self.user_preferences.get('use_case', 'student'), 3)
                 response["recommendations"] = recommendations
-                self.last_recommendations = recommendations
                 response["message"] = "Here are some alternative options that might interest you:"
             
             # Handle specific refinement requests
-            elif any(term in user_input.lower() for term in ["smaller", "more portable", "lighter", "portable"]):
+            elif scan.has('phrase', 'smaller'):
                 # Find smaller, more portable options
                 smaller_sizes = []
                 if 'size' in self.user_preferences:
@@ -2118,12 +3652,10 @@ class LaptopRecommendationBot:
                 if 'budget' in self.user_preferences:
                     filters['budget'] = self.user_preferences['budget']
                 
-                filtered_laptops = self._filter_laptops(filters)
-                recommendations = self._get_recommendations(filtered_laptops, 'portable', 3)
+                recommendations = self._recommend(filters, 'portable', 3)
                 response["recommendations"] = recommendations
-                self.last_recommendations = recommendations
                     
-            elif any(term in user_input.lower() for term in ["larger", "bigger screen", "larger display"]):
+            elif scan.has('phrase', 'larger'):
                 # Find laptops with larger screens
                 larger_sizes = []
                 if 'size' in self.user_preferences:
@@ -2153,12 +3685,10 @@ class LaptopRecommendationBot:
                 if 'budget' in self.user_preferences:
                     filters['budget'] = self.user_preferences['budget']
                 
-                filtered_laptops = self._filter_laptops(filters)
-                recommendations = self._get_recommendations(filtered_laptops, self.user_preferences.get('use_case', 'student'), 3)
+                recommendations = self._recommend(filters, self.user_preferences.get('use_case', 'student'), 3)
                 response["recommendations"] = recommendations
-                self.last_recommendations = recommendations
             
-            elif any(term in user_input.lower() for term in ["gaming", "games", "play games"]):
+            elif scan.has('phrase', 'gaming'):
                 # Find gaming laptops
                 self.user_preferences['use_case'] = 'gaming'
                 self.user_preferences['performance'] = 'high'
@@ -2175,12 +3705,10 @@ class LaptopRecommendationBot:
                     filters['budget'] = self.user_preferences['budget']
                 filters['performance'] = 'high'
                 
-                filtered_laptops = self._filter_laptops(filters)
-                recommendations = self._get_recommendations(filtered_laptops, 'gaming', 3)
+                recommendations = self._recommend(filters, 'gaming', 3)
                 response["recommendations"] = recommendations
-                self.last_recommendations = recommendations
             
-            elif any(term in user_input.lower() for term in ["business", "work", "office", "professional"]):
+            elif scan.has('phrase', 'business'):
                 # Find business laptops
                 self.user_preferences['use_case'] = 'business'
                 
@@ -2195,10 +3723,8 @@ class LaptopRecommendationBot:
                 if 'budget' in self.user_preferences:
                     filters['budget'] = self.user_preferences['budget']
                 
-                filtered_laptops = self._filter_laptops(filters)
-                recommendations = self._get_recommendations(filtered_laptops, 'business', 3)
+                recommendations = self._recommend(filters, 'business', 3)
                 response["recommendations"] = recommendations
-                self.last_recommendations = recommendations
             
             else:
                 # Process as a new input to refine search
@@ -2230,10 +3756,8 @@ class LaptopRecommendationBot:
                 if 'performance' in self.user_preferences:
                     filters['performance'] = self.user_preferences['performance']
                 
-                filtered_laptops = self._filter_laptops(filters)
-                recommendations = self._get_recommendations(filtered_laptops, self.user_preferences.get('use_case', 'student'), 3)
+                recommendations = self._recommend(filters, self.user_preferences.get('use_case', 'student'), 3)
                 response["recommendations"] = recommendations
-                self.last_recommendations = recommendations
         
         return response
 
@@ -2243,8 +3767,9 @@ class LaptopRecommendationBot:
         """
         self.conversation_state = "initial"
         self.user_preferences = {}
-        self.last_recommendations = []
-        self.top_similar_laptops = []
+        self.last_selection = []
+        self.top_similar_rows = np.empty(0, dtype=np.int64)
+        self.top_similar_scores = np.empty(0, dtype=np.float32)
         self.last_search_criteria = {}
 
 def converse_with_chatbot():
@@ -2,10 +2,16 @@
 
 import os 
 import sys
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Depends, Header 
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import json
 import uuid 
@@ -24,7 +30,9 @@ project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
 # Import our chatbot model 3
-from STPrototype3 import LaptopRecommendationBot
+from STPrototype3 import (LaptopRecommendationBot, LaptopCatalog, get_shared_catalog, peek_shared_catalog,
+                          catalog_manager, check_database_status, preference_cache, recommendation_cache)
+from session_store import SessionRecord, SessionConflict, create_session_store
 
 # This initializes the FASTAPI app
 app = FastAPI(
@@ -54,6 +62,7 @@ class LaptopFeature(BaseModel):
 
 # Enhanced LaptopRecommendation model with more detailed information
 class LaptopRecommendation(BaseModel):
+    laptop_id: Optional[str] = None
     brand: str
     name: str
     specs: str
@@ -101,6 +110,9 @@ class ResetRequest(BaseModel):
     session_id: Optional[str] = None
     user_id: Optional[str] = None
 
+class CatalogChangesRequest(BaseModel):
+    model_ids: List[int]  # Laptop models whose configurations were added or removed
+
 class ResetResponse(BaseModel):
     message: str
     success: bool
@@ -120,26 +132,31 @@ class HealthResponse(BaseModel):
     version: str
     active_sessions: int
     uptime: str
+    preference_cache: Optional[Dict[str, int]] = None
+    recommendation_cache: Optional[Dict[str, int]] = None
+    session_store: Optional[Dict[str, int]] = None
+    chat_in_flight: Optional[int] = None
 
 # Session tracking
 class SessionInfo:
-    def __init__(self, session_id: str, user_id: Optional[str] = None):
-        self.session_id = session_id
-        self.user_id = user_id
-        self.created_at = datetime.now()
-        self.last_activity = datetime.now()
-        self.total_recommendations = 0
+    # Live view of one session: its compact record from the session store and a chatbot restored from it
+    def __init__(self, session_id: str, user_id: Optional[str] = None, record: Optional[SessionRecord] = None):
+        if record is None:
+            record = SessionRecord(session_id, user_id)
+            
+            # Log session creation with user ID if available
+            log_message = f"Creating new session {session_id}"
+            if user_id:
+                log_message += f" for user {user_id}"
+            logger.info(log_message)
         
-        # Log session creation with user ID if available
-        log_message = f"Creating new session {session_id}"
-        if user_id:
-            log_message += f" for user {user_id}"
-        logger.info(log_message)
+        # Serializes messages within this session; different sessions run in parallel
+        self.lock = get_session_lock(record.session_id)
         
-        # Initialize chatbot with lazy loading to improve speed
+        # The chatbot only holds conversation state; the catalog and model are shared.
+        # A session stays on the catalog version it started with while that version is kept.
         try:
-            # Initialize the chatbot immediately to prevent delay in first response
-            self.chatbot = LaptopRecommendationBot()
+            self.chatbot = LaptopRecommendationBot(catalog=catalog_manager.catalog_for(record.bot_state.get('catalog_version')))
             if hasattr(self.chatbot, 'laptops'):
                 logger.info(f"Created chatbot instance with {len(self.chatbot.laptops)} laptops for session {session_id}")
             else:
@@ -149,6 +166,46 @@ class SessionInfo:
             # Initialize with empty laptops as fallback
             self.chatbot = LaptopRecommendationBot([])
             logger.info(f"Initialized fallback chatbot with empty laptop list for session {session_id}")
+        
+        self._apply_record(record)
+
+    def _apply_record(self, record: SessionRecord):
+        self.session_id = record.session_id
+        self.user_id = record.user_id
+        self.created_at = datetime.fromtimestamp(record.created_at)
+        self.last_activity = datetime.fromtimestamp(record.last_activity)
+        self.total_recommendations = record.total_recommendations
+        self.version = record.version
+        self.chatbot.catalog = catalog_manager.catalog_for(record.bot_state.get('catalog_version'))
+        self.chatbot.load_state(record.bot_state)
+
+    def refresh(self):
+        # Reload the stored state, which another request or worker may have changed
+        record = session_store.get(self.session_id)
+        if record is not None:
+            self._apply_record(record)
+
+    def to_record(self) -> SessionRecord:
+        return SessionRecord(
+            self.session_id,
+            self.user_id,
+            created_at=self.created_at.timestamp(),
+            last_activity=self.last_activity.timestamp(),
+            total_recommendations=self.total_recommendations,
+            bot_state=self.chatbot.to_state(),
+            version=self.version
+        )
+
+    def save(self):
+        # Raises SessionConflict if another worker saved the session since it was loaded
+        record = self.to_record()
+        session_store.put(record)
+        self.version = record.version
+
+    def reset(self):
+        # Start the conversation over, moving to the newest catalog version
+        self.chatbot.catalog = catalog_manager.catalog_for(None)
+        self.chatbot.reset_conversation()
 
     def update_activity(self):
         self.last_activity = datetime.now()
@@ -162,10 +219,24 @@ class SessionInfo:
         age_minutes = (datetime.now() - self.created_at).total_seconds() / 60
         return age_minutes
 
-# Store active chatbot sessions
-active_sessions = {}
-# Map user_ids to session_ids for faster lookup
-user_id_to_session_id = {}
+# Sessions are kept as compact records in the configured store (SESSION_STORE=memory or sqlite),
+# so with the SQLite store they survive restarts and any worker can serve any session
+session_store = create_session_store()
+
+# Per-session locks for the sessions this process is serving. A lock lives only as long
+# as a request holds its SessionInfo, so expired or evicted sessions leave nothing behind.
+# Sessions are loaded on the threadpool, so the table itself is guarded by a thread lock.
+session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+session_locks_guard = threading.Lock()
+
+def get_session_lock(session_id: str) -> asyncio.Lock:
+    # Return the lock that serializes messages for a session, creating it on first use
+    with session_locks_guard:
+        lock = session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            session_locks[session_id] = lock
+        return lock
 
 # API startup time for uptime calculations
 start_time = datetime.now()
@@ -174,6 +245,60 @@ logger.info(f"Start time of the API - session: {start_time}")
 # Set laptop limit for performance 
 LAPTOP_LIMIT = 10000  # Maximum number of laptops to load
 SESSION_TIMEOUT_MINUTES = 20  # Timeout for inactive sessions
+SESSION_SAVE_ATTEMPTS = 3  # Times a change is redone when another worker saved the session first
+
+# Chat processing runs on a bounded pool so inference never blocks the event loop.
+# Messages beyond the workers wait in a queue; once that is full requests get a 503.
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "4"))
+CHAT_QUEUE_LIMIT = int(os.getenv("CHAT_QUEUE_LIMIT", "32"))
+chat_executor = ThreadPoolExecutor(max_workers=CHAT_WORKERS, thread_name_prefix="chat")
+chat_in_flight = 0  # Only changed on the event loop, so no lock is needed
+
+# Minutes between scheduled catalog reloads in every worker; 0 reloads only when asked to.
+# Whichever worker reloads or applies changes publishes the new version, and the other
+# workers follow it within CATALOG_SYNC_SECONDS
+CATALOG_RELOAD_MINUTES = float(os.getenv("CATALOG_RELOAD_MINUTES", "0"))
+
+@app.on_event("startup")
+async def load_shared_catalog():
+    # Build the shared catalog up front so the first session does not pay for it
+    try:
+        catalog = await run_in_threadpool(get_shared_catalog)
+        logger.info(f"Shared catalog loaded with {len(catalog.laptops)} laptops from {catalog.data_source}")
+    except Exception as e:
+        logger.error(f"Error loading shared catalog at startup: {e}")
+    catalog_manager.start_schedule(CATALOG_RELOAD_MINUTES * 60)
+
+@app.on_event("shutdown")
+async def stop_chat_executor():
+    # Let running messages finish but drop anything still queued
+    chat_executor.shutdown(wait=False, cancel_futures=True)
+    catalog_manager.stop_schedule()
+
+async def run_chat_task(func, *args):
+    # Run blocking chat work on the chat pool, refusing it when the pool and queue are full
+    global chat_in_flight
+    if chat_in_flight >= CHAT_WORKERS + CHAT_QUEUE_LIMIT:
+        logger.warning(f"Chat queue full with {chat_in_flight} messages in flight, rejecting request")
+        raise HTTPException(status_code=503, detail="The server is busy, please try again shortly",
+                            headers={"Retry-After": "1"})
+    
+    chat_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(chat_executor, func, *args)
+    finally:
+        chat_in_flight -= 1
+
+def require_catalog() -> LaptopCatalog:
+    # The shared catalog. Requests never build it: if startup could not, a background
+    # build is started and requests get a 503 until it is ready
+    catalog = peek_shared_catalog()
+    if catalog is None:
+        catalog_manager.reload_in_background()
+        raise HTTPException(status_code=503, detail="The laptop catalog is still loading, please try again shortly",
+                            headers={"Retry-After": "5"})
+    return catalog
 
 # Helper functions
 def generate_session_id() -> str:
@@ -182,55 +307,73 @@ def generate_session_id() -> str:
     logger.info(f"Generating new session id: {new_id}")
     return new_id
 
+def load_session(session_id: str) -> Optional[SessionInfo]:
+    # Restore a session from the store, or None if it does not exist.
+    # This blocks on the store, so request handlers call it through run_in_threadpool
+    record = session_store.get(session_id)
+    if record is None:
+        return None
+    return SessionInfo(session_id, record=record)
+
 def get_or_create_session(session_id: Optional[str] = None, user_id: Optional[str] = None) -> SessionInfo:
     # First try to find a session by session_id
-    if session_id and session_id in active_sessions:
-        session = active_sessions[session_id]
-        session.update_activity()
-        logger.info(f"Using existing session by session_id: {session_id}, for user: {user_id}")
-        return session
+    if session_id:
+        session = load_session(session_id)
+        if session:
+            session.update_activity()
+            logger.info(f"Using existing session by session_id: {session_id}, for user: {user_id}")
+            return session
 
     # If session_id not found but user_id is provided, try to find a session for this user
-    if user_id and user_id in user_id_to_session_id:
-        existing_session_id = user_id_to_session_id[user_id]
-        if existing_session_id in active_sessions:
-            session = active_sessions[existing_session_id]
+    if user_id:
+        existing_session_id = session_store.session_for_user(user_id)
+        session = load_session(existing_session_id) if existing_session_id else None
+        if session:
             session.update_activity()
             logger.info(f"Found existing session {existing_session_id} for user: {user_id}")
             return session
     
     # If no session found by session_id or user_id, create a new one
+    # The store also maps the user_id to it if one is provided
     new_session_id = session_id or generate_session_id()
-    active_sessions[new_session_id] = SessionInfo(new_session_id, user_id)
-    
-    # Map user_id to session_id if user_id is provided
-    if user_id:
-        user_id_to_session_id[user_id] = new_session_id
+    session = SessionInfo(new_session_id, user_id)
+    try:
+        session.save()
+    except SessionConflict:
+        # Another worker created a session with this id first; use that one
+        session = load_session(new_session_id) or session
         
     logger.info(f"Created new session: {new_session_id} for user: {user_id}")
-    return active_sessions[new_session_id]
+    return session
+
+async def update_session(session: SessionInfo, change):
+    # Apply a change to the latest stored state of a session and save it. The session lock
+    # only covers this process: if another worker saved the session in between, the change
+    # is redone on top of that worker's state, and after SESSION_SAVE_ATTEMPTS it is a 409
+    for attempt in range(1, SESSION_SAVE_ATTEMPTS + 1):
+        await run_in_threadpool(session.refresh)
+        session.update_activity()
+        result = change()
+        if asyncio.iscoroutine(result):
+            result = await result
+        try:
+            await run_in_threadpool(session.save)
+            return result
+        except SessionConflict:
+            logger.warning(f"Session {session.session_id} was saved by another worker "
+                           f"(attempt {attempt} of {SESSION_SAVE_ATTEMPTS})")
+    raise HTTPException(status_code=409, detail="The session was changed by another request, please try again")
 
 def cleanup_inactive_sessions():
-    # Remove sessions that have been inactive for too long
-    current_time = datetime.now()   
-    sessions_to_remove = []
-
-    for session_id, session in active_sessions.items():
-        inactive_time = (current_time - session.last_activity).total_seconds() / 60
-        if inactive_time > SESSION_TIMEOUT_MINUTES:
-            sessions_to_remove.append(session_id)
-            # Also remove user_id mapping if this session has a user_id
-            if session.user_id and session.user_id in user_id_to_session_id:
-                if user_id_to_session_id[session.user_id] == session_id:  # Make sure we're removing the right mapping
-                    del user_id_to_session_id[session.user_id]
-            
-    for session_id in sessions_to_remove:
-        del active_sessions[session_id]
-
-    logger.info(f"Cleaned up {len(sessions_to_remove)} inactive sessions. {len(active_sessions)} sessions remaining. User ID mappings: {len(user_id_to_session_id)}")
+    # Remove sessions that have been inactive for too long. The store keeps sessions
+    # ordered by activity, so this only touches the sessions it actually removes.
+    cutoff = time.time() - SESSION_TIMEOUT_MINUTES * 60
+    removed = session_store.expire(cutoff)
+    if removed:
+        logger.info(f"Cleaned up {len(removed)} inactive sessions")
 
 # This fix focuses on properly extracting RAM information from multiple sources in the data structure
-def extract_detailed_laptop_info(laptop_data: Dict) -> Dict:
+def extract_detailed_laptop_info(laptop_data: Dict, catalog: LaptopCatalog) -> Dict:
     """
     Extract detailed information from the laptop data object
     to provide rich information to the frontend
@@ -294,15 +437,6 @@ def extract_detailed_laptop_info(laptop_data: Dict) -> Dict:
                 # Some laptops might have RAM info in the specs table instead
                 if data.get('RAM') and not detailed_info['ram']:
                     detailed_info['ram'] = data.get('RAM')
-                    
-                # Infer performance level from specs
-                if processor_name and ('i7' in processor_name or 'i9' in processor_name or 
-                                     'Ryzen 7' in processor_name or 'Ryzen 9' in processor_name):
-                    detailed_info['performance_level'] = 'high'
-                elif processor_name and ('i5' in processor_name or 'Ryzen 5' in processor_name):
-                    detailed_info['performance_level'] = 'medium'
-                elif processor_name:
-                    detailed_info['performance_level'] = 'basic'
         
         # Screen
         elif title == 'Screen':
@@ -328,18 +462,23 @@ def extract_detailed_laptop_info(laptop_data: Dict) -> Dict:
                 detailed_info['has_thunderbolt'] = bool(data.get('Thunderbolt'))
                 detailed_info['has_display_port'] = bool(data.get('Display Port'))
     
+    # Performance level comes from the tier the catalog computed for this laptop
+    detailed_info['performance_level'] = catalog.performance_level(laptop_data)
+    
     return detailed_info
 
-def convert_to_recommendation_model(recommendations, raw_laptops=None):
+def convert_to_recommendation_model(recommendations, catalog=None):
     """
     Convert the recommendation data from STPrototype3 format to API response format
     with enhanced information
     """
     result = []
+    catalog = catalog or get_shared_catalog()
     
     for rec in recommendations:
         # Create a base recommendation object
         recommendation = {
+            "laptop_id": rec.get("laptop_id"),
             "brand": rec["brand"],
             "name": rec["name"],
             "specs": rec["specs"],
@@ -362,26 +501,10 @@ def convert_to_recommendation_model(recommendations, raw_laptops=None):
             if "RAM" in rec["key_specs"] and (recommendation.get("ram") is None):
                 recommendation["ram"] = rec["key_specs"]["RAM"]
         
-        # Find the raw laptop data if provided to extract more details
-        if raw_laptops:
-            # Find matching laptop in raw data
-            for laptop in raw_laptops:
-                laptop_brand = ""
-                laptop_name = ""
-                
-                for table in laptop.get('tables', []):
-                    if table.get('title') == 'Product Details' and 'data' in table:
-                        laptop_brand = table['data'].get('Brand', '')
-                        laptop_name = table['data'].get('Name', '')
-                        break
-                
-                # Check if this is the same laptop
-                if laptop_brand.lower() == rec["brand"].lower() and laptop_name.lower() == rec["name"].lower():
-                    # Extract detailed information
-                    detailed_info = extract_detailed_laptop_info(laptop)
-                    # Update recommendation with detailed info
-                    recommendation.update(detailed_info)
-                    break
+        # Look up the raw laptop data by id to extract more details
+        laptop = catalog.by_id(rec["laptop_id"]) if rec.get("laptop_id") else None
+        if laptop is not None:
+            recommendation.update(extract_detailed_laptop_info(laptop, catalog))
         
         # Additional check: try to extract RAM from specs string if it's still not available
         if not recommendation.get("ram") and "specs" in recommendation:
@@ -418,13 +541,52 @@ async def health_check():
     uptime = datetime.now() - start_time 
     uptime_str = str(uptime).split('.')[0]  # Format without microseconds
 
+    session_stats = await run_in_threadpool(session_store.stats)
     return {
         "status": "ok",
         "version": "3.5.0", 
-        "active_sessions": len(active_sessions),
-        "uptime": uptime_str
+        "active_sessions": session_stats["sessions"],
+        "uptime": uptime_str,
+        "preference_cache": preference_cache.stats(),
+        "recommendation_cache": recommendation_cache.stats(),
+        "session_store": session_stats,
+        "chat_in_flight": chat_in_flight
     }
 
+async def answer_message(session: SessionInfo, message: str) -> Dict:
+    # Run one message through the session's chatbot and build the chat response
+    chatbot = session.chatbot
+
+    # Process the user's message on the chat pool so the event loop stays free
+    # and concurrent messages can share one encoder batch
+    response_data = await run_chat_task(chatbot.process_input, message)
+
+    # Update tracking information
+    if 'recommendations' in response_data and response_data['recommendations']:
+        session.track_recommendations(len(response_data['recommendations']))
+    
+        # Convert recommendations to the API response format with enhanced information,
+        # finding each laptop's raw data in the catalog by its id
+        response_data['recommendations'] = convert_to_recommendation_model(
+            response_data['recommendations'], 
+            chatbot.catalog
+        )
+
+    # Add session and conversation state info to the response
+    response_data["session_id"] = session.session_id
+    response_data["conversation_state"] = chatbot.conversation_state 
+
+    # Add detected use case if in the user preferences
+    if hasattr(chatbot, 'user_preferences') and 'use_case' in chatbot.user_preferences:
+        response_data["detected_use_case"] = chatbot.user_preferences['use_case']
+
+    # Add blacklisted brands to the response if present, copied since the
+    # response is serialized after the session lock is released
+    if hasattr(chatbot, 'user_preferences') and 'blacklisted_brands' in chatbot.user_preferences:
+        response_data["blacklisted_brands"] = list(chatbot.user_preferences['blacklisted_brands'])
+    
+    return response_data
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
     # Process a chat message and return recommendations
@@ -432,8 +594,10 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
         # Log the request details
         logger.info(f"Processing chat message for session: {request.session_id}, user: {request.user_id}")
         
-        # Get or create a session - prioritizing existing sessions by user_id
-        session = get_or_create_session(request.session_id, request.user_id)
+        # Get or create a session - prioritizing existing sessions by user_id.
+        # The session store may block on disk, so it is only used from the threadpool
+        require_catalog()
+        session = await run_in_threadpool(get_or_create_session, request.session_id, request.user_id)
         background_tasks.add_task(cleanup_inactive_sessions)
 
         # If the request had a session_id but we got a different one (found by user_id),
@@ -442,47 +606,15 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
         if request.session_id and request.session_id != actual_session_id:
             logger.info(f"Session ID changed from {request.session_id} to {actual_session_id}")
 
-        # Process the user's message
-        chatbot = session.chatbot
-        response_data = chatbot.process_input(request.message)
-
-        # Update tracking information
-        if 'recommendations' in response_data and response_data['recommendations']:
-            session.track_recommendations(len(response_data['recommendations']))
-            
-            # Get filtered laptops to find raw data for detailed information
-            filtered_laptops = None
-            try:
-                filters = {}
-                for key, value in chatbot.user_preferences.items():
-                    if key != 'use_case' and value:
-                        filters[key] = value
-                
-                filtered_laptops = chatbot._filter_laptops(filters)
-                logger.info(f"Found {len(filtered_laptops)} filtered laptops to extract detailed information")
-            except Exception as e:
-                logger.error(f"Error getting filtered laptops: {e}")
-            
-            # Convert recommendations to the API response format with enhanced information
-            response_data['recommendations'] = convert_to_recommendation_model(
-                response_data['recommendations'], 
-                filtered_laptops
-            )
-
-        # Add session and conversation state info to the response
-        response_data["session_id"] = session.session_id
-        response_data["conversation_state"] = chatbot.conversation_state 
-
-        # Add detected use case if in the user preferences
-        if hasattr(chatbot, 'user_preferences') and 'use_case' in chatbot.user_preferences:
-            response_data["detected_use_case"] = chatbot.user_preferences['use_case']
-
-        # Add blacklisted brands to the response if present
-        if hasattr(chatbot, 'user_preferences') and 'blacklisted_brands' in chatbot.user_preferences:
-            response_data["blacklisted_brands"] = chatbot.user_preferences['blacklisted_brands']
+        # Messages for the same session are handled one at a time and in order.
+        # Waiting happens here on the event loop, so it does not hold a chat worker.
+        async with session.lock:
+            response_data = await update_session(session, lambda: answer_message(session, request.message))
 
         return response_data
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing chat message: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
@@ -494,38 +626,43 @@ async def reset_conversation(request: ResetRequest):
     user_id = request.user_id
 
     # First check if session exists by session_id
-    if session_id and session_id in active_sessions:
+    require_catalog()
+    session = await run_in_threadpool(load_session, session_id) if session_id else None
+    if session:
         try: 
             # Reset existing session
             logger.info(f"Resetting existing session by session_id: {session_id}")
-            session = active_sessions[session_id]
-            session.chatbot.reset_conversation()
-            session.update_activity()
+            async with session.lock:
+                await update_session(session, session.reset)
 
             return {
                 "message": "Conversation has been reset.",
                 "success": True,
                 "session_id": session_id
             }
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Could not reset the session: {e}")
             raise HTTPException(status_code=500, detail=f"Error resetting conversation: {str(e)}")
     else:
         # Try to find a session by user_id if provided
-        if user_id and user_id in user_id_to_session_id:
-            existing_session_id = user_id_to_session_id[user_id]
-            if existing_session_id in active_sessions:
+        existing_session_id = await run_in_threadpool(session_store.session_for_user, user_id) if user_id else None
+        if existing_session_id:
+            session = await run_in_threadpool(load_session, existing_session_id)
+            if session:
                 try:
                     # Reset existing session found by user_id
                     logger.info(f"Resetting existing session by user_id: {existing_session_id}")
-                    session = active_sessions[existing_session_id]
-                    session.chatbot.reset_conversation()
-                    session.update_activity()
+                    async with session.lock:
+                        await update_session(session, session.reset)
                     return {
                         "message": "Conversation has been reset.",
                         "success": True,
                         "session_id": existing_session_id
                     }
+                except HTTPException:
+                    raise
                 except Exception as e:
                     logger.error(f"Could not reset the session by user_id: {e}")
                     raise HTTPException(status_code=500, detail=f"Error resetting conversation: {str(e)}")
@@ -533,7 +670,7 @@ async def reset_conversation(request: ResetRequest):
         # Create a new session if none found
         try:
             logger.info(f"Creating a new session for user: {user_id}")
-            new_session = get_or_create_session(user_id=user_id)
+            new_session = await run_in_threadpool(get_or_create_session, None, user_id)
 
             return {
                 "message": "New conversation started",
@@ -547,11 +684,12 @@ async def reset_conversation(request: ResetRequest):
 @app.get("/api/debug/{session_id}", response_model=DebugInfoResponse)
 async def get_debug_info(session_id: str):
     # Debug endpoint to get the current state of a chatbot session
-    if session_id not in active_sessions:
+    require_catalog()
+    session = await run_in_threadpool(load_session, session_id)
+    if session is None:
         logger.warning(f"Session: {session_id} was not found")
         raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
 
-    session = active_sessions[session_id]
     chatbot = session.chatbot
 
     debug_info = {
@@ -577,25 +715,63 @@ async def list_sessions(admin_key: Optional[str] = Header(None)):
         logger.warning(f"Admin key was incorrect: {admin_key}")
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    # Read the stored records directly; no chatbot is needed for a listing
     sessions_info = []
-    for session_id, session in active_sessions.items():
-        # Safely access chatbot attributes
-        conversation_state = "unknown"
-        if session.chatbot:
-            conversation_state = session.chatbot.conversation_state
-            
+    now = time.time()
+    for record in await run_in_threadpool(session_store.records):
         sessions_info.append({
-            "session_id": session_id,
-            "user_id": session.user_id,
-            "created_at": session.created_at.isoformat(),
-            "last_activity": session.last_activity.isoformat(),
-            "age_minutes": session.get_age_minutes(),
-            "conversation_state": conversation_state,
-            "total_recommendations": session.total_recommendations
+            "session_id": record.session_id,
+            "user_id": record.user_id,
+            "created_at": datetime.fromtimestamp(record.created_at).isoformat(),
+            "last_activity": datetime.fromtimestamp(record.last_activity).isoformat(),
+            "age_minutes": (now - record.created_at) / 60,
+            "conversation_state": record.bot_state.get("conversation_state", "unknown"),
+            "catalog_version": record.bot_state.get("catalog_version"),
+            "total_recommendations": record.total_recommendations
         })
     
     return sessions_info
 
+@app.get("/api/admin/catalog")
+async def catalog_info(admin_key: Optional[str] = Header(None)):
+    """Admin endpoint to show the catalog versions this worker serves and its reload history"""
+    if not admin_key or admin_key != "admin-secret-key":
+        logger.warning(f"Admin key was incorrect: {admin_key}")
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return catalog_manager.stats()
+
+@app.post("/api/admin/catalog/reload")
+async def reload_catalog(admin_key: Optional[str] = Header(None)):
+    """Admin endpoint to rebuild the catalog in the background and swap it in when ready"""
+    if not admin_key or admin_key != "admin-secret-key":
+        logger.warning(f"Admin key was incorrect: {admin_key}")
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    # Sessions already running keep their catalog; new and reset sessions get the new one
+    started = catalog_manager.reload_in_background()
+    return {
+        "status": "started" if started else "already_running",
+        **catalog_manager.stats()
+    }
+
+@app.post("/api/admin/catalog/changes")
+async def apply_catalog_changes(request: CatalogChangesRequest, admin_key: Optional[str] = Header(None)):
+    """Admin endpoint the scrape comparison calls so only the changed laptop models are reloaded"""
+    if not admin_key or admin_key != "admin-secret-key":
+        logger.warning(f"Admin key was incorrect: {admin_key}")
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    # Queued behind any reload in progress; the result shows up in /api/admin/catalog.
+    # Only this worker receives the request; it publishes the new version for the others
+    catalog_manager.apply_model_changes_in_background(request.model_ids)
+    logger.info(f"Queued catalog changes for {len(request.model_ids)} laptop models")
+    return {
+        "status": "queued",
+        "model_count": len(request.model_ids),
+        **catalog_manager.stats()
+    }
+
 @app.get("/api/user-to-session/{user_id}")
 async def get_session_by_user_id(user_id: str, admin_key: Optional[str] = Header(None)):
     """Admin endpoint to get session ID for a user ID"""
@@ -604,25 +780,33 @@ async def get_session_by_user_id(user_id: str, admin_key: Optional[str] = Header
         logger.warning(f"Admin key was incorrect: {admin_key}")
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    if user_id in user_id_to_session_id:
-        session_id = user_id_to_session_id[user_id]
-        if session_id in active_sessions:
-            return {"user_id": user_id, "session_id": session_id, "found": True}
+    session_id = await run_in_threadpool(session_store.session_for_user, user_id)
+    if session_id and await run_in_threadpool(session_store.get, session_id) is not None:
+        return {"user_id": user_id, "session_id": session_id, "found": True}
     
     return {"user_id": user_id, "session_id": None, "found": False}
 
 @app.get("/api/database-status")
 async def database_status():
-    """Check the database connection status"""
+    """Check the database connection status and the catalog currently being served"""
     try:
-        # Create a temporary chatbot to test database connection
-        test_bot = LaptopRecommendationBot()
-        laptop_count = len(test_bot.laptops) if hasattr(test_bot, 'laptops') else 0
+        # One pooled query at most every few seconds; never builds the catalog
+        database = await run_in_threadpool(check_database_status)
+        catalog = peek_shared_catalog()
+        
+        if catalog is not None:
+            laptop_count = catalog.live_count
+        else:
+            laptop_count = database.get("laptop_configurations", 0)
         
         db_status = {
             "status": "ok" if laptop_count > 0 else "no_data",
             "laptop_count": laptop_count,
-            "data_source": "database" if hasattr(test_bot, '_db_source') and test_bot._db_source == "database" else "json_fallback"
+            "data_source": catalog.data_source if catalog is not None else None,
+            "catalog_loaded": catalog is not None,
+            "catalog_version": catalog.version if catalog is not None else None,
+            "catalog_age_seconds": round(time.time() - catalog.loaded_at) if catalog is not None else None,
+            "database": database
         }
         return db_status
     except Exception as e:
@@ -633,114 +817,75 @@ async def database_status():
         }
 
 # New endpoint to get full laptop details
+def laptop_details(catalog: LaptopCatalog, row: int) -> Dict:
+    # Detailed information about one catalog row, from the values precomputed at load
+    record = catalog.records[row]
+    detailed_info = extract_detailed_laptop_info(catalog.laptops[row], catalog)
+    
+    # Add basic info
+    detailed_info["laptop_id"] = record.laptop_id
+    detailed_info["brand"] = record.brand
+    detailed_info["name"] = record.name
+    detailed_info["specs"] = record.description
+    detailed_info["price"] = record.price_string if record.price_string else "Price not available"
+    detailed_info["key_specs"] = dict(record.key_specs)
+    
+    return detailed_info
+
+@app.get("/api/laptop/{laptop_id}")
+async def get_laptop_details_by_id(laptop_id: str):
+    """Get detailed information about a specific laptop by its id"""
+    try:
+        catalog = require_catalog()
+        row = catalog.row_for_id(laptop_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"Laptop {laptop_id} not found")
+        return laptop_details(catalog, row)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting laptop details: {e}")
+        raise HTTPException(status_code=500, detail=f"Error getting laptop details: {str(e)}")
+
 @app.get("/api/laptop/{brand}/{name}")
 async def get_laptop_details(brand: str, name: str):
     """Get detailed information about a specific laptop by brand and name"""
     try:
-        # Create a chatbot to access laptop data
-        chatbot = LaptopRecommendationBot()
-        
-        # Search for the laptop
-        found_laptop = None
-        for laptop in chatbot.laptops:
-            laptop_brand = ""
-            laptop_name = ""
-            
-            for table in laptop.get('tables', []):
-                if table.get('title') == 'Product Details' and 'data' in table:
-                    laptop_brand = table['data'].get('Brand', '')
-                    laptop_name = table['data'].get('Name', '')
-                    break
-            
-            if laptop_brand.lower() == brand.lower() and laptop_name.lower() == name.lower():
-                found_laptop = laptop
-                break
-                
-        if not found_laptop:
+        # Look the laptop up in the shared catalog's brand and name index
+        catalog = require_catalog()
+        row = catalog.row_for_name(brand, name)
+        if row is None:
             raise HTTPException(status_code=404, detail=f"Laptop {brand} {name} not found")
-            
-        # Extract detailed information
-        detailed_info = extract_detailed_laptop_info(found_laptop)
-        
-        # Add basic info
-        detailed_info["brand"] = brand
-        detailed_info["name"] = name
-        detailed_info["specs"] = chatbot._format_laptop_description(found_laptop)
-        
-        # Add price
-        price_value, price_string = chatbot._extract_price_range(found_laptop)
-        detailed_info["price"] = price_string if price_string else "Price not available"
-        
-        # Add key specs
-        detailed_info["key_specs"] = chatbot._get_key_specs(found_laptop)
-        
-        return detailed_info
+        return laptop_details(catalog, row)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting laptop details: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting laptop details: {str(e)}")
 
+# Serialized /api/features payload of the catalog version it was built from
+features_payload = {"version": None, "body": None}
+
 @app.get("/api/features")
-async def get_available_features():
-    """Get a list of all available laptop features in the database"""
+async def get_available_features(request: Request):
+    """Get a list of all available laptop features in the database, with how many laptops have each"""
     try:
-        # Create a chatbot to access laptop data
-        chatbot = LaptopRecommendationBot()
-        
-        # Collect all unique features
-        features = {
-            "brands": set(),
-            "screen_sizes": set(),
-            "processors": set(),
-            "graphics_cards": set(),
-            "ram_options": set(),
-            "storage_options": set(),
-            "operating_systems": set(),
-            "special_features": ["touchscreen", "backlit_keyboard", "numeric_keyboard", "bluetooth"],
-            "ports": ["usb_c", "hdmi", "ethernet", "thunderbolt", "display_port"]
-        }
-        
-        # Go through all laptops to collect unique features
-        for laptop in chatbot.laptops:
-            for table in laptop.get('tables', []):
-                title = table.get('title', '')
-                data = table.get('data', {})
-                
-                if title == 'Product Details' and isinstance(data, dict):
-                    brand = data.get('Brand')
-                    if brand:
-                        features["brands"].add(brand)
-                
-                elif title == 'Screen' and isinstance(data, dict):
-                    size = data.get('Size')
-                    if size:
-                        features["screen_sizes"].add(size)
-                
-                elif title == 'Specs' and isinstance(data, dict):
-                    processor = data.get('Processor Name')
-                    if processor:
-                        features["processors"].add(processor)
-                    
-                    graphics = data.get('Graphics Card')
-                    if graphics:
-                        features["graphics_cards"].add(graphics)
-                
-                elif title == 'Misc' and isinstance(data, dict):
-                    ram = data.get('Memory Installed')
-                    if ram:
-                        features["ram_options"].add(ram)
-                    
-                    os = data.get('Operating System')
-                    if os:
-                        features["operating_systems"].add(os)
-        
-        # Convert sets to lists for JSON serialization
-        for key in features:
-            if isinstance(features[key], set):
-                features[key] = sorted(list(features[key]))
+        # Facets are computed when the catalog is built; serialize them once per catalog version
+        catalog = require_catalog()
+        if features_payload["version"] != catalog.version:
+            body = json.dumps({**catalog.facets, "catalog_version": catalog.version}, default=str).encode("utf-8")
+            features_payload.update(version=catalog.version, body=body)
         
-        return features
+        # The catalog version doubles as an ETag, so clients can skip unchanged payloads
+        etag = f'"{features_payload["version"]}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=features_payload["body"], media_type="application/json", headers={"ETag": etag})
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting available features: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting available features: {str(e)}")
@@ -750,9 +895,15 @@ if __name__ == "__main__":
         import uvicorn
         
         port = 8000
-        # Run with auto-reload for development
-        logger.info(f"Starting server on 0.0.0.0:{port}")
-        uvicorn.run("chatBotAPI3:app", host="0.0.0.0", port=port, reload=True)
+        workers = int(os.getenv("API_WORKERS", "1"))
+        if workers > 1:
+            # Worker processes attach to one shared catalog snapshot, so each only adds the model
+            logger.info(f"Starting server on 0.0.0.0:{port} with {workers} workers")
+            uvicorn.run("chatBotAPI3:app", host="0.0.0.0", port=port, workers=workers)
+        else:
+            # Run with auto-reload for development
+            logger.info(f"Starting server on 0.0.0.0:{port}")
+            uvicorn.run("chatBotAPI3:app", host="0.0.0.0", port=port, reload=True)
     except ImportError:
         logger.error("ERROR: uvicorn package is not installed. Please install it with:")
         logger.warning("pip install uvicorn fastapi")
@@ -0,0 +1,325 @@
+# Session persistence for the chatbot API: compact session records behind a
+# store interface, with an in-memory backend and an SQLite backend that
+# survives restarts and can be shared by several worker processes
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from loguru import logger
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Default location of the SQLite session database
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(current_dir, "sessions.sqlite3"))
+
+# Hard limits on stored sessions; the least recently active sessions are evicted first
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_MEMORY_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "64"))
+
+class SessionConflict(Exception):
+    """Raised when a session was saved by someone else since the record being saved was read"""
+
+class SessionRecord:
+    """
+    Compact, JSON-serializable state of one chat session
+
+    The conversation is the chatbot's to_state() output, which refers to laptops
+    only by catalog row, so a record is a few hundred bytes however large the
+    catalog is. The version is kept by the store rather than serialized: it
+    counts the saves of the session, 0 for a record that was never saved.
+    """
+    FIELDS = ('session_id', 'user_id', 'created_at', 'last_activity', 'total_recommendations', 'bot_state')
+    __slots__ = FIELDS + ('version',)
+
+    def __init__(self, session_id: str, user_id: Optional[str] = None, created_at: float = None,
+                 last_activity: float = None, total_recommendations: int = 0, bot_state: Dict = None,
+                 version: int = 0):
+        now = time.time()
+        self.session_id = session_id
+        self.user_id = user_id
+        self.created_at = created_at if created_at is not None else now
+        self.last_activity = last_activity if last_activity is not None else now
+        self.total_recommendations = total_recommendations
+        self.bot_state = bot_state or {}
+        self.version = version
+
+    def to_json(self) -> str:
+        """Serialize the record"""
+        return json.dumps({name: getattr(self, name) for name in self.FIELDS}, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, data: str, version: int = 0) -> 'SessionRecord':
+        """Rebuild a record from to_json() output"""
+        values = json.loads(data)
+        return cls(**{name: values.get(name) for name in cls.FIELDS if name in values}, version=version)
+
+class SessionStore(ABC):
+    """
+    Interface of a session store
+
+    Records are serialized on the way in and out, so callers never share
+    mutable state through the store. A backend must implement every method
+    before it can be created.
+    """
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        """Return the session's record, or None if there is no such session"""
+
+    @abstractmethod
+    def put(self, record: SessionRecord):
+        """
+        Create or replace a session's record and advance record.version
+
+        The write is a compare-and-swap: if the session was saved since the
+        record was read (its stored version differs from record.version),
+        nothing is written and SessionConflict is raised. A session that no
+        longer exists is simply created again.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove a session if it exists"""
+
+    @abstractmethod
+    def session_for_user(self, user_id: str) -> Optional[str]:
+        """Return the session id of a user's current session, if any"""
+
+    @abstractmethod
+    def expire(self, cutoff: float) -> List[str]:
+        """Remove sessions inactive since before the cutoff timestamp and return their ids"""
+
+    @abstractmethod
+    def records(self) -> List[SessionRecord]:
+        """Every stored session"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored sessions"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Session count and how many sessions were evicted for each reason"""
+
+class InMemorySessionStore(SessionStore):
+    """
+    Session store local to one process; sessions are lost on restart
+
+    Records are kept in least recently saved order, so expiry and eviction
+    only ever pop from the front: amortized O(1) per session removed. The
+    store is capped both by session count and by total serialized size.
+    """
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT, memory_budget_mb: float = SESSION_MEMORY_BUDGET_MB):
+        self.max_sessions = max(1, max_sessions)
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.evictions = {"expired": 0, "capacity": 0, "memory": 0}
+        self._records = OrderedDict()  # session_id -> (last_activity, user_id, data, version)
+        self._user_sessions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            entry = self._records.get(session_id)
+        return SessionRecord.from_json(entry[2], entry[3]) if entry is not None else None
+
+    def put(self, record: SessionRecord):
+        data = record.to_json()
+        with self._lock:
+            entry = self._records.get(record.session_id)
+            if entry is not None and entry[3] != record.version:
+                raise SessionConflict(f"Session {record.session_id} was saved since version {record.version}")
+            
+            # Re-inserting moves the session to the most recently active end
+            self._remove(record.session_id)
+            record.version += 1
+            self._records[record.session_id] = (record.last_activity, record.user_id, data, record.version)
+            self._bytes += len(data)
+            if record.user_id:
+                self._user_sessions[record.user_id] = record.session_id
+            
+            while len(self._records) > self.max_sessions:
+                self._evict_oldest("capacity")
+            while self._bytes > self.memory_budget and len(self._records) > 1:
+                self._evict_oldest("memory")
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._remove(session_id)
+
+    def _remove(self, session_id: str):
+        # Caller holds the lock; also drop the user mapping if it points at this session
+        entry = self._records.pop(session_id, None)
+        if entry is None:
+            return
+        _, user_id, data, _ = entry
+        self._bytes -= len(data)
+        if user_id and self._user_sessions.get(user_id) == session_id:
+            del self._user_sessions[user_id]
+
+    def _evict_oldest(self, reason: str) -> str:
+        # Caller holds the lock
+        session_id = next(iter(self._records))
+        self._remove(session_id)
+        self.evictions[reason] += 1
+        return session_id
+
+    def session_for_user(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            return self._user_sessions.get(user_id)
+
+    def expire(self, cutoff: float) -> List[str]:
+        expired = []
+        with self._lock:
+            while self._records:
+                last_activity = next(iter(self._records.values()))[0]
+                if last_activity >= cutoff:
+                    break
+                expired.append(self._evict_oldest("expired"))
+        return expired
+
+    def records(self) -> List[SessionRecord]:
+        with self._lock:
+            entries = list(self._records.values())
+        return [SessionRecord.from_json(entry[2], entry[3]) for entry in entries]
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._records), "bytes": self._bytes,
+                    **{f"evicted_{reason}": count for reason, count in self.evictions.items()}}
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store in an SQLite database file
+
+    Sessions survive restarts, and every worker process opening the same file
+    sees the same sessions. Each thread uses its own connection. Expiry and
+    eviction go through an index on last_activity; the session cap is checked
+    at most every CAP_CHECK_SECONDS since counting rows is a full index scan.
+    The memory budget does not apply, as records live on disk. A version
+    column makes put() a compare-and-swap, so workers saving the same session
+    at once cannot silently overwrite each other.
+    """
+    CAP_CHECK_SECONDS = 10
+
+    def __init__(self, path: str = SESSION_DB_PATH, max_sessions: int = SESSION_MAX_COUNT):
+        self.path = path
+        self.max_sessions = max(1, max_sessions)
+        self.evictions = {"expired": 0, "capacity": 0}
+        self._last_cap_check = 0.0
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                last_activity REAL NOT NULL,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Databases created before sessions were versioned
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+        if 'version' not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_user_id ON sessions (user_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_activity ON sessions (last_activity)")
+        logger.info(f"Using SQLite session store at {path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            # WAL lets workers read while another one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        row = self._connection().execute(
+            "SELECT data, version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return SessionRecord.from_json(row[0], row[1]) if row else None
+
+    def put(self, record: SessionRecord):
+        conn = self._connection()
+        data = record.to_json()
+        updated = conn.execute(
+            "UPDATE sessions SET user_id = ?, last_activity = ?, data = ?, version = version + 1 "
+            "WHERE session_id = ? AND version = ?",
+            (record.user_id, record.last_activity, data, record.session_id, record.version)).rowcount
+        if not updated:
+            # Either the session is new (or expired meanwhile), or someone else saved it
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, user_id, last_activity, data, version) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (record.session_id, record.user_id, record.last_activity, data, record.version + 1)).rowcount
+            if not inserted:
+                raise SessionConflict(f"Session {record.session_id} was saved since version {record.version}")
+        record.version += 1
+        
+        if time.time() - self._last_cap_check >= self.CAP_CHECK_SECONDS:
+            self._last_cap_check = time.time()
+            self._enforce_cap()
+
+    def _enforce_cap(self):
+        # Evict the least recently active sessions beyond the cap
+        conn = self._connection()
+        excess = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if excess > 0:
+            conn.execute("DELETE FROM sessions WHERE session_id IN "
+                         "(SELECT session_id FROM sessions ORDER BY last_activity LIMIT ?)", (excess,))
+            self.evictions["capacity"] += excess
+            logger.info(f"Evicted {excess} sessions over the limit of {self.max_sessions}")
+
+    def delete(self, session_id: str):
+        self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def session_for_user(self, user_id: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT session_id FROM sessions WHERE user_id = ? ORDER BY last_activity DESC LIMIT 1",
+            (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def expire(self, cutoff: float) -> List[str]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in conn.execute(
+                "SELECT session_id FROM sessions WHERE last_activity < ?", (cutoff,))]
+            conn.execute("DELETE FROM sessions WHERE last_activity < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.evictions["expired"] += len(expired)
+        return expired
+
+    def records(self) -> List[SessionRecord]:
+        rows = self._connection().execute("SELECT data, version FROM sessions ORDER BY last_activity DESC").fetchall()
+        return [SessionRecord.from_json(row[0], row[1]) for row in rows]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions": self.count(), **{f"evicted_{reason}": count for reason, count in self.evictions.items()}}
+
+def create_session_store() -> SessionStore:
+    """
+    Build the session store selected by the SESSION_STORE environment variable ("memory" or "sqlite")
+    """
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(SESSION_DB_PATH, SESSION_MAX_COUNT)
+    if backend != "memory":
+        logger.warning(f"Unknown session store '{backend}', keeping sessions in memory")
+    return InMemorySessionStore(SESSION_MAX_COUNT, SESSION_MEMORY_BUDGET_MB)
@@ -1,6 +1,7 @@
 import re
 from concurrent.futures import ThreadPoolExecutor
 
+import requests
 from deepdiff import DeepDiff
 import json
 import pprint
@@ -71,7 +72,7 @@ def compare_new_and_old (old_path, new_path=os.getenv('NEW_JSON')):
         logger.error(f"error in attempting to compare the old and new json data {e}")
 
 
-def process_json_diff(diff_dict, action, json_conn, json_cur):
+def process_json_diff(diff_dict, action, json_conn, json_cur, changed_models=None):
     if action == 'added':
         models = []
 
@@ -186,6 +187,8 @@ def process_json_diff(diff_dict, action, json_conn, json_cur):
                         continue
 
                     if config_id:
+                        if model_id and changed_models is not None:
+                            changed_models.add(model_id)
                         storage_records.append((config_id, storage_type, storage_capacity))
                         feature_records.append((config_id, back_lit, num_pad, bluetooth))
                         ports_records.append((config_id, ethernet, hdmi, usb_type_c, thunderbolt, display_port))
@@ -306,6 +309,9 @@ def process_json_diff(diff_dict, action, json_conn, json_cur):
                 if config_id is not None:
                     delete_from_config_tables(config_id)
                     delete_laptop_config(laptop_to_delete, laptop_model)
+                    model_id = get_model_id(laptop_model)
+                    if model_id and changed_models is not None:
+                        changed_models.add(model_id)
                 else:
                     logger.warning(f"Can not delete configuration for model {laptop_model} as there is no config_id found")
                     continue
@@ -413,16 +419,35 @@ def get_model_id(laptop_name):
         release_db_connection(model_id_conn, model_id_cur)
 
 
+def notify_chatbot_api(model_ids):
+    # tell the chatbot API which models changed so it only reloads those instead of the whole catalog
+    api_url = os.getenv('CHATBOT_API_URL')
+    if not api_url or not model_ids:
+        return
+    try:
+        response = requests.post(f"{api_url.rstrip('/')}/api/admin/catalog/changes",
+                                 json={"model_ids": sorted(model_ids)},
+                                 headers={"admin-key": os.getenv('CHATBOT_ADMIN_KEY', 'admin-secret-key')},
+                                 timeout=10)
+        response.raise_for_status()
+        logger.info(f"notified the chatbot API of {len(model_ids)} changed laptop models")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"could not notify the chatbot API of the catalog changes: {e}")
+
 def update_changes (json_diff_data):
     changes_conn, changes_cur = get_db_connection()
 
     json_diff_added = json_diff_data.get('iterable_item_added')
     json_diff_removed = json_diff_data.get('iterable_item_removed')
 
+    # model ids whose configurations were inserted or deleted
+    changed_models = set()
     if json_diff_added:
-        process_json_diff(json_diff_added, "added", changes_conn, changes_cur)
+        process_json_diff(json_diff_added, "added", changes_conn, changes_cur, changed_models)
     if json_diff_removed:
-        process_json_diff(json_diff_removed, "removed", changes_conn, changes_cur)
+        process_json_diff(json_diff_removed, "removed", changes_conn, changes_cur, changed_models)
+
+    notify_chatbot_api(changed_models)
 
 def main():
     json_diff = None